@@ -0,0 +1,311 @@
+# ai/cleanup.py — before/after comparison for volunteer_works reports
+#
+# A volunteer_works photo is paired with the illegal_dumping / dirty_area
+# reports taken within PV_CLEANUP_RADIUS_M of it during the previous
+# PV_CLEANUP_LOOKBACK_DAYS (KD-tree over the candidates' projected GPS points,
+# one query per ~5 km cell of a batch). Each pair is compared on small
+# grayscale thumbnails:
+#
+#   * alignment: the "after" frame is slid over the "before" frame by up to
+#     MAX_SHIFT thumbnail pixels each way (hand-held photos are never framed
+#     the same), keeping the shift with the best normalised cross-correlation.
+#   * scene:   upper quartile of the per-tile correlation after alignment; the
+#     background (walls, trees, road edges) should still match -> same place.
+#   * changed: share of tiles that no longer match -> something was removed.
+#   * drop:    fall in the verifier's relevance (dirt) score, before - after.
+#   * phash / dhash distance: near-identical images are the same photo sent
+#     twice, not a cleanup.
+#
+# confidence = place * (0.5 * changed + 0.5 * drop), 0..1. Thumbnails and
+# hashes are cached per image digest in the verifier's ScoreCache, so
+# re-running a batch only recomputes the pairs, which take well under 1 ms.
+import base64, math, os
+from datetime import timedelta
+
+import imagehash
+import numpy as np
+from PIL import Image, ImageOps
+
+from ai.score_cache import file_digest
+
+RADIUS_M       = float(os.getenv("PV_CLEANUP_RADIUS_M", "60"))
+LOOKBACK_DAYS  = int(os.getenv("PV_CLEANUP_LOOKBACK_DAYS", "90"))
+MAX_CANDIDATES = int(os.getenv("PV_CLEANUP_MAX_CANDIDATES", "5"))
+MIN_CONFIDENCE = float(os.getenv("PV_CLEANUP_MIN_CONFIDENCE", "0.6"))
+
+AFTER_TYPE   = "volunteer_works"
+BEFORE_TYPES = ("illegal_dumping", "dirty_area")
+METHOD       = "cleanup_v1"   # bump when the features or scoring change
+
+THUMB      = 48     # px, square grayscale thumbnail
+MAX_SHIFT  = 4      # px of THUMB (~8% of the frame) each way
+TILES      = 4      # TILES x TILES grid for scene / change
+MATCH_NCC  = 0.8    # tile correlation below this counts as changed
+SAME_PHOTO = 4      # phash and dhash bits; both at or below = the same photo resubmitted
+EARTH_M    = 6371008.8
+GROUP_DEG  = 0.05   # candidate queries are batched per cell of this size
+
+VERDICTS = ("cleaned", "uncertain", "unchanged", "different_view", "same_photo", "no_prior")
+
+# ---------- per-image features ----------
+def image_features(path):
+    img = ImageOps.exif_transpose(Image.open(path)).convert("RGB")
+    thumb = img.convert("L").resize((THUMB, THUMB), Image.BILINEAR)
+    return {"phash": str(imagehash.phash(img)), "dhash": str(imagehash.dhash(img)),
+            "thumb": base64.b64encode(np.asarray(thumb, dtype=np.uint8).tobytes()).decode("ascii")}
+
+def _cache_key(digest):
+    return f"{digest}|{METHOD}|t{THUMB}"
+
+def features_many(paths, cache=None):
+    """-> [features dict or None (unreadable)] per path; cache hits skip decoding."""
+    out = [None] * len(paths)
+    digests = [None] * len(paths)
+    for i, p in enumerate(paths):
+        try:
+            digests[i] = file_digest(p)
+        except OSError:
+            pass
+    hit = cache.get_many([_cache_key(d) for d in digests if d]) if cache is not None else {}
+    fresh = {}
+    for i, (p, d) in enumerate(zip(paths, digests)):
+        if d is None:
+            continue
+        f = hit.get(_cache_key(d))
+        if f is None:
+            try:
+                f = image_features(p)
+            except Exception as e:
+                print("[CLEANUP] cannot read", p, repr(e))
+                continue
+            fresh[_cache_key(d)] = f
+        out[i] = f
+    if cache is not None and fresh:
+        cache.put_many(fresh)
+    return out
+
+def _thumb(f):
+    a = np.frombuffer(base64.b64decode(f["thumb"]), dtype=np.uint8)
+    return a.reshape(THUMB, THUMB).astype(np.float32) / 255.0
+
+def _zscore(a, axes):
+    a = a - a.mean(axis=axes, keepdims=True)
+    sd = a.std(axis=axes, keepdims=True)
+    return a / np.maximum(sd, 1e-6), sd
+
+def _tiles(a):
+    t = a.shape[0] // TILES
+    a = a[:t * TILES, :t * TILES]
+    return a.reshape(TILES, t, TILES, t).transpose(0, 2, 1, 3).reshape(TILES * TILES, t * t)
+
+# ---------- pair comparison ----------
+def compare(before, after):
+    """Image-only comparison of two feature dicts (see the header for the fields)."""
+    from numpy.lib.stride_tricks import sliding_window_view
+    a, b = _thumb(after), _thumb(before)
+    m, n = MAX_SHIFT, THUMB - 2 * MAX_SHIFT
+    core = a[m:m + n, m:m + n]
+    windows = sliding_window_view(b, (n, n))          # (2m+1, 2m+1, n, n): every shift at once
+    zc, _ = _zscore(core, (0, 1))
+    zw, _ = _zscore(windows, (2, 3))
+    ncc = (zw * zc).mean(axis=(2, 3))
+    iy, ix = np.unravel_index(int(np.argmax(ncc)), ncc.shape)
+    aligned = windows[iy, ix]
+
+    ta, tb = _tiles(core), _tiles(aligned)
+    za, sa = _zscore(ta, 1)
+    zb, sb = _zscore(tb, 1)
+    tile_ncc = (za * zb).mean(axis=1)
+    flat = (sa[:, 0] < 0.02) | (sb[:, 0] < 0.02)       # plain sky / wall: compare brightness instead
+    same_level = np.abs(ta.mean(axis=1) - tb.mean(axis=1)) < 0.06
+    tile_ncc = np.where(flat, np.where(same_level, 1.0, 0.0), tile_ncc)
+
+    return {
+        "alignment": round(float(ncc[iy, ix]), 4),
+        "shift_x": int(ix) - m, "shift_y": int(iy) - m,
+        "scene": round(float(np.quantile(tile_ncc, 0.75)), 4),
+        "change": round(float(np.mean(tile_ncc < MATCH_NCC)), 4),
+        "pixel_diff": round(float(np.abs(core - aligned).mean()), 4),
+        "phash_dist": int(imagehash.hex_to_hash(before["phash"]) - imagehash.hex_to_hash(after["phash"])),
+        "dhash_dist": int(imagehash.hex_to_hash(before["dhash"]) - imagehash.hex_to_hash(after["dhash"])),
+    }
+
+def _clip(x):
+    return min(1.0, max(0.0, x))
+
+def score_pair(cmp, rel_before=None, rel_after=None):
+    """-> (confidence 0..1, verdict, dirt_drop or None) for one compare() result."""
+    drop = None if rel_before is None or rel_after is None else float(rel_before) - float(rel_after)
+    if max(cmp["phash_dist"], cmp["dhash_dist"]) <= SAME_PHOTO:
+        return 0.0, "same_photo", drop
+    place = _clip((cmp["scene"] - 0.2) / 0.5)
+    changed = _clip(cmp["change"] / 0.25)   # a quarter of the frame is plenty
+    drop_s = 0.5 if drop is None else _clip(0.5 + drop)
+    conf = round(place * (0.5 * changed + 0.5 * drop_s), 4)
+    if place < 0.3:
+        verdict = "different_view"
+    elif conf >= MIN_CONFIDENCE:
+        verdict = "cleaned"
+    elif changed < 0.2 and drop_s < 0.65:
+        verdict = "unchanged"
+    else:
+        verdict = "uncertain"
+    return conf, verdict, drop
+
+# ---------- candidate search ----------
+def _project_m(lat, lon, lat0):
+    """Equirectangular projection to metres around lat0 (fine within a city)."""
+    k = math.pi / 180.0 * EARTH_M
+    return np.column_stack((np.asarray(lon, dtype=float) * k * math.cos(math.radians(lat0)),
+                            np.asarray(lat, dtype=float) * k))
+
+def find_candidates(afters, radius_m=RADIUS_M, days=LOOKBACK_DAYS, limit=MAX_CANDIDATES):
+    """
+    afters: Submissions with lat/lon. -> {after_id: [(before_row, distance_m)]},
+    nearest first. Earlier reports only; rejected ones are skipped.
+    """
+    afters = [s for s in afters if s.lat is not None and s.lon is not None and s.created_at]
+    found = {s.id: [] for s in afters}
+    # one bbox query + KD-tree per ~5 km cell, so a country-wide batch doesn't
+    # pull every report in between
+    groups = {}
+    for s in afters:
+        groups.setdefault((math.floor(s.lat / GROUP_DEG), math.floor(s.lon / GROUP_DEG)), []).append(s)
+    for group in groups.values():
+        found.update(_find_in_group(group, radius_m, days, limit))
+    return found
+
+def _find_in_group(afters, radius_m, days, limit):
+    from scipy.spatial import cKDTree
+    from geo.clusters import haversine_m
+    from models import Submission
+
+    found = {s.id: [] for s in afters}
+    pad_lat = radius_m / 111_320.0
+    pad_lon = pad_lat / max(0.2, math.cos(math.radians(max(abs(s.lat) for s in afters))))
+    rows = (Submission.query
+            .with_entities(Submission.id, Submission.lat, Submission.lon, Submission.created_at,
+                           Submission.image_path, Submission.relevance_score, Submission.report_type)
+            .filter(Submission.report_type.in_(BEFORE_TYPES),
+                    Submission.lat.between(min(s.lat for s in afters) - pad_lat, max(s.lat for s in afters) + pad_lat),
+                    Submission.lon.between(min(s.lon for s in afters) - pad_lon, max(s.lon for s in afters) + pad_lon),
+                    Submission.created_at >= min(s.created_at for s in afters) - timedelta(days=days),
+                    Submission.created_at < max(s.created_at for s in afters),
+                    (Submission.human_state.is_(None)) | (Submission.human_state != "rejected"))
+            .all())
+    if not rows:
+        return found
+
+    lat0 = float(np.mean([s.lat for s in afters]))
+    tree = cKDTree(_project_m([r.lat for r in rows], [r.lon for r in rows], lat0))
+    pts = _project_m([s.lat for s in afters], [s.lon for s in afters], lat0)
+    # projection error is well under 1% here; the haversine check below is exact
+    for s, idx in zip(afters, tree.query_ball_point(pts, r=radius_m * 1.01)):
+        near = []
+        for i in idx:
+            r = rows[i]
+            if not (s.created_at - timedelta(days=days) <= r.created_at < s.created_at):
+                continue
+            d = haversine_m(s.lat, s.lon, r.lat, r.lon)
+            if d <= radius_m:
+                near.append((r, d))
+        near.sort(key=lambda x: (x[1], -x[0].created_at.timestamp()))
+        found[s.id] = near[:limit]
+    return found
+
+# ---------- batch pipeline ----------
+def compare_many(afters, root, cache=None, radius_m=RADIUS_M, days=LOOKBACK_DAYS, limit=MAX_CANDIDATES):
+    """
+    -> {after_id: [result dict]} best first, for CleanupComparison rows.
+    Every image is decoded at most once per batch (and only on a cache miss).
+    An after photo without readable candidates gets a single "no_prior" result.
+    """
+    cands = find_candidates(afters, radius_m, days, limit)
+    paths = {}
+    for s in afters:
+        paths[s.image_path] = os.path.join(root, s.image_path)
+        for r, _ in cands.get(s.id, ()):
+            paths[r.image_path] = os.path.join(root, r.image_path)
+    keys = list(paths)
+    feats = dict(zip(keys, features_many([paths[k] for k in keys], cache)))
+
+    out = {}
+    for s in afters:
+        fa = feats.get(s.image_path)
+        results = []
+        for r, dist in cands.get(s.id, ()):
+            fb = feats.get(r.image_path)
+            if fa is None or fb is None:
+                continue
+            cmp = compare(fb, fa)
+            conf, verdict, drop = score_pair(cmp, r.relevance_score, s.relevance_score)
+            results.append({
+                **cmp, "before_id": r.id, "distance_m": round(dist, 1),
+                "days_between": round((s.created_at - r.created_at).total_seconds() / 86400.0, 2),
+                "dirt_drop": None if drop is None else round(drop, 4),
+                "confidence": conf, "verdict": verdict,
+            })
+        # a report of the same spot (even the same photo resent) outranks a closer, different view
+        results.sort(key=lambda x: (x["verdict"] == "different_view", -x["confidence"], x["distance_m"]))
+        out[s.id] = results or [{"before_id": None, "confidence": 0.0, "verdict": "no_prior"}]
+    return out
+
+_FIELDS = ("before_id", "distance_m", "days_between", "alignment", "shift_x", "shift_y", "scene",
+           "change", "pixel_diff", "phash_dist", "dhash_dist", "dirt_drop", "confidence", "verdict")
+
+def store(db, results):
+    """
+    Replace the CleanupComparison rows of each after_id in results (caller
+    commits). Admin decisions on a pair that is still there are kept.
+    """
+    from models import CleanupComparison
+    if not results:
+        return
+    old = CleanupComparison.query.filter(CleanupComparison.after_id.in_(list(results)))
+    reviewed = {(r.after_id, r.before_id): (r.human_state, r.reviewed_by, r.reviewed_at)
+                for r in old if r.human_state not in (None, "unreviewed")}
+    old.delete(synchronize_session=False)
+    for after_id, rows in results.items():
+        for i, res in enumerate(rows):
+            state, by, at = reviewed.get((after_id, res.get("before_id")), ("unreviewed", None, None))
+            db.session.add(CleanupComparison(after_id=after_id, rank=i + 1, method=METHOD,
+                                             human_state=state, reviewed_by=by, reviewed_at=at,
+                                             **{k: res.get(k) for k in _FIELDS}))
+
+def save(db, results):
+    """
+    store() and commit. -> False if another run stored comparisons for the
+    same reports first (uq_cleanup_after_rank); this run is rolled back.
+    """
+    from sqlalchemy.exc import IntegrityError
+    store(db, results)
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+def pending_query(since=None):
+    """volunteer_works reports with GPS and no current-method comparison yet."""
+    from models import db, Submission, CleanupComparison
+    done = db.session.query(CleanupComparison.after_id).filter(CleanupComparison.method == METHOD)
+    q = Submission.query.filter(Submission.report_type == AFTER_TYPE, Submission.lat.isnot(None),
+                                Submission.lon.isnot(None), ~Submission.id.in_(done))
+    if since is not None:
+        q = q.filter(Submission.created_at >= since)
+    return q
+
+def pending(limit=50, since=None):
+    """pending_query(), newest first."""
+    from models import Submission
+    return pending_query(since).order_by(Submission.created_at.desc()).limit(limit).all()
+
+def as_dict(row):
+    return {
+        "id": row.id, "after_id": row.after_id, "rank": row.rank, "method": row.method,
+        **{k: getattr(row, k) for k in _FIELDS},
+        "human_state": row.human_state,
+        "reviewed_at": row.reviewed_at.isoformat() if row.reviewed_at else None,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
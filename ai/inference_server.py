@@ -0,0 +1,219 @@
+# ai/inference_server.py — one local process owns the model; web workers ask it over a Unix socket
+#
+# With N gunicorn workers each building its own Verifier, the model weights and
+# onnxruntime arenas exist N times in RAM. Run this once per box instead and
+# point the workers at it:
+#
+#   PV_INFERENCE_SOCKET=/tmp/thromai-infer/infer.sock python -m ai.inference_server
+#   PV_INFERENCE_SOCKET=/tmp/thromai-infer/infer.sock gunicorn -c gunicorn.conf.py app:app
+#
+# Workers send image *paths* (the upload folder is shared on one box); requests
+# arriving within PV_INFERENCE_MAX_WAIT_MS are merged into one model batch.
+#
+# Messages are pickles, so only the server's own user may connect: the socket
+# is bound inside a directory that only that user can open (0700, created if
+# missing), and clients must know the auth key, PV_INFERENCE_AUTHKEY or else
+# a random key the server writes to "authkey" (0600) in that directory.
+
+import os, sys, time, queue, argparse, secrets, threading
+from concurrent.futures import Future
+from multiprocessing.connection import Listener, Client
+
+SOCKET_PATH  = os.getenv("PV_INFERENCE_SOCKET", "") or "/tmp/thromai-infer/infer.sock"
+AUTHKEY      = os.getenv("PV_INFERENCE_AUTHKEY", "")
+KEY_NAME     = "authkey"
+MAX_BATCH    = int(os.getenv("PV_INFERENCE_MAX_BATCH", "16"))
+MAX_WAIT_MS  = float(os.getenv("PV_INFERENCE_MAX_WAIT_MS", "5"))
+CALL_TIMEOUT = float(os.getenv("PV_INFERENCE_TIMEOUT", "30"))
+
+def private_dir(address: str, create: bool = False) -> str:
+    """The socket's directory; refused unless only the current user can get into it."""
+    d = os.path.dirname(os.path.abspath(address))
+    if create:
+        os.makedirs(d, mode=0o700, exist_ok=True)
+    st = os.stat(d)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{d} must be owned by this user and not accessible to others (chmod 700)")
+    return d
+
+def load_authkey(address: str, create: bool = False) -> bytes:
+    """PV_INFERENCE_AUTHKEY, else the key file next to the socket (the server creates it)."""
+    if AUTHKEY:
+        return AUTHKEY.encode()
+    path = os.path.join(private_dir(address, create), KEY_NAME)
+    if create:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+        except FileExistsError:
+            pass
+    with open(path, encoding="ascii") as f:
+        return f.read().strip().encode()
+
+# ------------ Client (used by Verifier) -------------
+class RemoteInference:
+    """Thin client; keeps one connection per calling thread."""
+
+    def __init__(self, address: str = SOCKET_PATH, authkey: bytes | None = None, timeout: float = CALL_TIMEOUT):
+        self.address = address
+        self.authkey = authkey or load_authkey(address)
+        self.timeout = timeout
+        self._tls = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._tls, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._tls.conn = conn
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._tls, "conn", None)
+        self._tls.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _call(self, msg: dict) -> dict:
+        try:
+            conn = self._conn()
+            conn.send(msg)
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"no reply from inference server within {self.timeout}s")
+            reply = conn.recv()
+        except Exception:
+            self._drop()  # reconnect on the next call
+            raise
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "inference server error"))
+        return reply
+
+    def info(self) -> dict:
+        return self._call({"op": "info"})
+
+    def predict(self, paths):
+        """-> (relevance per path, model_kind, model_version or None from older servers)"""
+        reply = self._call({"op": "predict", "paths": [os.path.abspath(p) for p in paths]})
+        return reply["rels"], reply["model_kind"], reply.get("model_version")
+
+    def reload(self, **params) -> dict:
+        """Ask the server to hot-reload its model (ai/registry.py); waits for the result."""
+        return self._call({"op": "reload", "params": params})["result"]
+
+# ------------ Server -------------
+class _Batcher(threading.Thread):
+    """Single inference thread: merges concurrent requests into one model call."""
+
+    def __init__(self, verifier):
+        super().__init__(name="pv-batcher", daemon=True)
+        self.verifier = verifier
+        self.q = queue.Queue()
+
+    def submit(self, paths) -> Future:
+        fut = Future()
+        self.q.put((list(paths), fut))
+        return fut
+
+    def _gather(self):
+        items = [self.q.get()]
+        n = len(items[0][0])
+        deadline = time.monotonic() + MAX_WAIT_MS / 1000.0
+        while n < MAX_BATCH:
+            wait = deadline - time.monotonic()
+            if wait <= 0:
+                break
+            try:
+                item = self.q.get(timeout=wait)
+            except queue.Empty:
+                break
+            items.append(item)
+            n += len(item[0])
+        return items
+
+    def run(self):
+        v = self.verifier
+        while True:
+            items = self._gather()
+            paths = [p for ps, _ in items for p in ps]
+            try:
+                rels, kind, version = v._predict_local(paths)
+                i = 0
+                for ps, fut in items:
+                    fut.set_result((rels[i:i + len(ps)], kind, version))
+                    i += len(ps)
+            except Exception:
+                # one unreadable image must not fail everybody else's request
+                for ps, fut in items:
+                    try:
+                        fut.set_result(v._predict_local(ps))
+                    except Exception as e:
+                        fut.set_exception(e)
+
+def _handle(conn, batcher, verifier, registry):
+    with conn:
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                op = msg.get("op")
+                if op == "predict":
+                    rels, kind, version = batcher.submit(msg["paths"]).result()
+                    conn.send({"ok": True, "rels": rels, "model_kind": kind, "model_version": version})
+                elif op == "info":
+                    conn.send({"ok": True, "model_kind": verifier.model_kind,
+                               "model_version": verifier.model_version, "pid": os.getpid()})
+                elif op == "reload":
+                    conn.send({"ok": True, "result": registry.reload(reason="client", **msg.get("params", {}))})
+                else:
+                    conn.send({"ok": False, "error": f"unknown op {op!r}"})
+            except (EOFError, OSError):
+                return
+            except Exception as e:
+                conn.send({"ok": False, "error": repr(e)})
+
+def serve(address: str = SOCKET_PATH):
+    # ROOT on sys.path so `python ai/inference_server.py` works too
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    from ai.verifier import Verifier
+    from ai.registry import ModelRegistry
+
+    authkey = load_authkey(address, create=True)   # also checks the directory is private
+    verifier = Verifier(inference_socket="").load()  # never forward to ourselves
+    registry = ModelRegistry(verifier).start()        # hot reload; workers keep their connections
+    batcher = _Batcher(verifier)
+    batcher.start()
+
+    if os.path.exists(address):
+        os.unlink(address)  # stale socket from a previous run
+    old_umask = os.umask(0o177)                    # the socket is 0600 from the moment it exists
+    try:
+        listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    finally:
+        os.umask(old_umask)
+    print(f"[INFER] serving {verifier.model_kind} model on {address} (pid {os.getpid()})")
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:  # bad authkey, client hung up mid-handshake, ...
+                print("[INFER] rejected connection:", repr(e))
+                continue
+            threading.Thread(target=_handle, args=(conn, batcher, verifier, registry), daemon=True).start()
+    finally:
+        listener.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    args = parser.parse_args()
+    serve(args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# ai/keyframes.py — sample keyframes from camera clips (PyAV → ffmpeg → nothing)
+
+import os, glob, shutil, subprocess, tempfile
+
+# --- Optional backends ---
+try:
+    import av  # PyAV: decodes in-process and hands frames to PIL
+except Exception:
+    av = None
+
+FFMPEG_BIN     = os.getenv("PV_FFMPEG_BIN", "") or shutil.which("ffmpeg")
+PV_KEYFRAMES   = int(os.getenv("PV_KEYFRAMES", "6"))           # frames kept per clip
+FFMPEG_TIMEOUT = int(os.getenv("PV_FFMPEG_TIMEOUT", "60"))     # seconds per clip
+
+def _evenly(items, n):
+    """Pick n items spread evenly over the list (keeps first and last)."""
+    if n <= 0 or len(items) <= n:
+        return list(items)
+    if n == 1:
+        return [items[len(items) // 2]]
+    step = (len(items) - 1) / (n - 1)
+    return [items[round(i * step)] for i in range(n)]
+
+def _keyframe_pts(container, stream):
+    """pts of every keyframe, read from the packet headers (nothing is decoded)."""
+    return [p.pts for p in container.demux(stream) if p.is_keyframe and p.pts is not None]
+
+def _sample_pyav(video_path, out_dir, n):
+    """Choose n keyframes first, then seek to and decode only those (memory ~ n frames, not the clip)."""
+    paths = []
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        targets = _evenly(_keyframe_pts(container, stream), n)
+        stream.codec_context.skip_frame = "NONKEY"  # decode I-frames only
+        for pts in targets:
+            container.seek(pts, stream=stream)      # lands on the keyframe at pts
+            frame = next(container.decode(stream), None)
+            if frame is None:
+                continue
+            p = os.path.join(out_dir, f"kf_{len(paths):03d}.jpg")
+            frame.to_image().convert("RGB").save(p, "JPEG", quality=90)
+            paths.append(p)
+    return paths
+
+def _sample_ffmpeg(video_path, out_dir, n):
+    pattern = os.path.join(out_dir, "kf_%04d.jpg")
+    cmd = [FFMPEG_BIN, "-hide_banner", "-loglevel", "error",
+           "-skip_frame", "nokey", "-i", video_path,
+           "-vsync", "vfr", "-q:v", "3", pattern]
+    subprocess.run(cmd, check=True, timeout=FFMPEG_TIMEOUT,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    found = sorted(glob.glob(os.path.join(out_dir, "kf_*.jpg")))
+    keep = set(_evenly(found, n))
+    for p in found:
+        if p not in keep:
+            os.remove(p)
+    return [p for p in found if p in keep]
+
+def decoder_name():
+    if av is not None:
+        return "pyav"
+    if FFMPEG_BIN:
+        return "ffmpeg"
+    return None
+
+def sample_keyframes(video_path: str, out_dir: str | None = None, n: int = PV_KEYFRAMES):
+    """
+    Extract up to n keyframes from a clip as JPEG files.
+
+    Returns (frame_paths, out_dir); the caller owns out_dir and should remove it.
+    Returns an empty list when no decoder is available or the clip can't be read.
+    """
+    out_dir = out_dir or tempfile.mkdtemp(prefix="pv_kf_")
+    if not os.path.isfile(video_path):
+        return [], out_dir
+    try:
+        if av is not None:
+            return _sample_pyav(video_path, out_dir, n), out_dir
+        if FFMPEG_BIN:
+            return _sample_ffmpeg(video_path, out_dir, n), out_dir
+    except Exception as e:
+        print(f"[KEYFRAMES] could not decode {video_path}:", repr(e))
+    return [], out_dir
@@ -0,0 +1,232 @@
+# ai/registry.py — reload the verifier's model without restarting workers
+#
+# The new model is loaded into a separate ModelBackend in the background and
+# warmed up with a dummy batch while the old one keeps serving. It is then
+# swapped into the Verifier in one step. Calls already running finish on the
+# old model, which is released after the last of them. Every result is
+# stamped with the version of the model that actually scored it.
+#
+# Triggers (checked every PV_MODEL_WATCH_S seconds; 0 = admin endpoint only):
+#   * the model file or its class map changes on disk (copy the new file next
+#     to it and rename it over, so a half-written file is never seen). The new
+#     version is "<PV_MODEL_VERSION>-<sha256[:7]>" unless one is given, the
+#     same version any other process loading that file reports (ModelBackend).
+#   * a ".reload" file in the model directory (PV_MODEL_DIR) is created or
+#     changed. It may hold "path=", "version=" and "class_map=" lines to switch
+#     to another model.
+#   * POST /admin/verifier/reload reloads the worker that receives it at once.
+#     It also writes ".reload", so the other workers follow at their next check,
+#     and workers started later (respawns) apply it before serving.
+# With PV_INFERENCE_SOCKET the model lives in ai/inference_server.py, which runs
+# its own registry; the admin endpoint forwards the reload there.
+import os, threading, time
+from collections import deque
+from datetime import datetime
+
+from ai.verifier import MODEL_PATH, MAX_VERSION, ModelBackend, auto_version
+
+WATCH_S     = float(os.getenv("PV_MODEL_WATCH_S", "10"))
+MODEL_DIR   = os.getenv("PV_MODEL_DIR", "") or os.path.dirname(os.path.abspath(MODEL_PATH))
+TOKEN_NAME  = ".reload"
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def _read_token(path):
+    params = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                key, sep, value = line.strip().partition("=")
+                if sep and key.strip() in ("path", "version", "class_map") and value.strip():
+                    params[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return params
+
+class ModelRegistry:
+    def __init__(self, verifier, model_dir=MODEL_DIR, watch_s=WATCH_S):
+        self.verifier = verifier
+        self.model_dir = os.path.abspath(model_dir)
+        self.token_path = os.path.join(self.model_dir, TOKEN_NAME)
+        self.watch_s = watch_s
+        self.history = deque(maxlen=20)
+        self._busy = threading.Lock()      # one reload at a time
+        self._seen = self._fingerprint()
+        self._pending = None
+        self._thread = None
+        self._pid = None
+        self._adopted_pid = None
+
+    # -- watcher --
+    def start(self):
+        """Start the watcher thread (again after a fork; threads don't survive it)."""
+        if self._adopted_pid != os.getpid():
+            self._adopted_pid = os.getpid()
+            try:
+                self.adopt()
+            except Exception as e:
+                print("[REGISTRY] startup check failed:", repr(e))
+        if self.watch_s <= 0:
+            return self
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return self
+        self._pid = os.getpid()
+        self._seen = self._fingerprint()
+        self._thread = threading.Thread(target=self._watch, name="pv-model-watch", daemon=True)
+        self._thread.start()
+        return self
+
+    def _fingerprint(self):
+        b = self.verifier.backend
+        cmap = b.class_map_path or os.path.splitext(b.model_path)[0] + ".json"
+        return (_stat(b.model_path), _stat(cmap), _stat(self.token_path))
+
+    def _watch(self):
+        self.verifier.load()
+        if self.verifier._remote is not None:
+            return             # the inference server watches the model itself
+        while True:
+            time.sleep(self.watch_s)
+            try:
+                self.check()
+            except Exception as e:
+                print("[REGISTRY] watch error:", repr(e))
+
+    def check(self):
+        """One watcher pass: reload if the token changed, or the model files changed and settled."""
+        fp = self._fingerprint()
+        if fp == self._seen:
+            self._pending = None
+            return None
+        if fp[2] != self._seen[2] and fp[2] is not None:
+            self._seen = fp
+            return self.reload(reason="token", **self._token_params())
+        if fp != self._pending:   # wait one more interval for the copy to finish
+            self._pending = fp
+            return None
+        self._pending = None
+        self._seen = fp
+        if fp[0] is None:
+            return None            # model file gone: keep serving the loaded one
+        return self.reload(reason="file changed")
+
+    def adopt(self):
+        """
+        Bring a new or respawned worker in line with the others: follow a
+        .reload token that points at another model or version than the one
+        configured here.
+        """
+        if self.verifier.inference_socket:
+            return None        # the inference server's registry does this for its model
+        params = {k: v for k, v in self._token_params().items() if v}
+        if params:
+            b = self.verifier.load().backend
+            try:
+                path = self.resolve(params["model_path"]) if "model_path" in params else b.model_path
+                cmap = self.resolve(params["class_map_path"]) if "class_map_path" in params else b.class_map_path
+            except ValueError as e:
+                print("[REGISTRY] ignoring .reload token:", e)
+                path = None
+            if path and os.path.isfile(path):
+                version = (params.get("model_version") or auto_version(path))[:MAX_VERSION]
+                if (os.path.abspath(path), version, cmap or "") != \
+                        (os.path.abspath(b.model_path), b.model_version, b.class_map_path or ""):
+                    return self.reload(reason="startup (.reload token)", **params)
+        self._seen = self._fingerprint()
+        return None
+
+    def _token_params(self):
+        p = _read_token(self.token_path)
+        return {"model_path": p.get("path"), "model_version": p.get("version"),
+                "class_map_path": p.get("class_map")}
+
+    def broadcast(self, model_path=None, model_version=None, class_map_path=None):
+        """Write the .reload token so every worker watching this directory reloads."""
+        lines = [f"{k}={v}" for k, v in (("path", model_path), ("version", model_version),
+                                         ("class_map", class_map_path)) if v]
+        lines.append(f"requested_at={datetime.utcnow().isoformat()}")
+        tmp = self.token_path + f".{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.token_path)
+
+    # -- reload --
+    def resolve(self, model_path):
+        """Relative paths are taken from the model directory; paths outside it are refused."""
+        path = os.path.abspath(os.path.join(self.model_dir, model_path))
+        if os.path.commonpath([path, self.model_dir]) != self.model_dir:
+            raise ValueError(f"{model_path} is outside the model directory {self.model_dir}")
+        return path
+
+    def reload(self, model_path=None, model_version=None, class_map_path=None, reason="manual"):
+        """
+        Load, warm up and swap in a model (default: the current path again).
+        Returns a result dict; on any failure the current model stays in place.
+        """
+        if self.verifier._remote is not None:
+            try:
+                result = self.verifier._remote.reload(model_path=model_path, model_version=model_version,
+                                                      class_map_path=class_map_path)
+            except Exception as e:
+                result = {"ok": False, "error": repr(e)}
+            if result.get("ok"):
+                self.verifier._remote_kind = result["model_kind"]
+                self.verifier._remote_version = result["model_version"]
+            return self._log(result, reason)
+        if not self._busy.acquire(blocking=False):
+            return {"ok": False, "error": "a reload is already running"}
+        cur = self.verifier.backend
+        try:
+            t0 = time.perf_counter()
+            path = self.resolve(model_path) if model_path else cur.model_path
+            if not os.path.isfile(path):
+                raise FileNotFoundError(path)
+            if class_map_path:
+                cmap = self.resolve(class_map_path)
+            else:
+                cmap = cur.class_map_path if path == cur.model_path else ""
+            new = ModelBackend(path, model_version[:MAX_VERSION] if model_version else None, cmap)
+            new.load_class_map()
+            new.load()
+            if new.model_kind == "heuristic" and cur.model_kind != "heuristic":
+                raise RuntimeError(f"{path} could not be loaded as a model; keeping {cur.model_version}")
+            new.warm_up()
+            old = self.verifier.swap_backend(new)
+            self._seen = self._fingerprint()
+            result = {"ok": True, "model_version": new.model_version, "model_kind": new.model_kind,
+                      "model_path": new.model_path, "previous": f"{old.model_version}_{old.model_kind}",
+                      "draining": old.inflight, "seconds": round(time.perf_counter() - t0, 2)}
+        except Exception as e:
+            print("[REGISTRY] reload failed, keeping the current model:", repr(e))
+            result = {"ok": False, "error": repr(e), "model_version": cur.model_version}
+        finally:
+            self._busy.release()
+        return self._log(result, reason)
+
+    def reload_all(self, model_path=None, model_version=None, class_map_path=None):
+        """Reload here, then point the other workers at the same model and version (admin endpoint)."""
+        result = self.reload(model_path, model_version, class_map_path, reason="admin")
+        if result.get("ok") and self.verifier._remote is None:
+            self.broadcast(result["model_path"], result["model_version"],
+                           self.verifier.backend.class_map_path or None)
+            self._seen = self._fingerprint()   # our own token: nothing left to do here
+        return result
+
+    def _log(self, result, reason):
+        self.history.appendleft({**result, "reason": reason, "pid": os.getpid(),
+                                 "at": datetime.utcnow().isoformat()})
+        return result
+
+    def status(self):
+        b = self.verifier.backend
+        return {
+            "model_path": b.model_path, "model_version": self.verifier.model_version,
+            "model_kind": self.verifier.model_kind, "loaded_at": b.loaded_at, "inflight": b.inflight,
+            "model_dir": self.model_dir, "watch_s": self.watch_s, "reloading": self._busy.locked(),
+            "history": list(self.history),
+        }
@@ -0,0 +1,144 @@
+# ai/score_cache.py — persistent cache of per-image Verifier features
+#
+# Keyed by sha256(image bytes) + model version + the PV_* knobs that change the
+# features. Stores only what depends on the image itself (phash, EXIF check,
+# relevance); duplicate detection and the action score are recomputed on every
+# call since they depend on other submissions and cheap knobs.
+#
+# Backed by one SQLite file (safe to share between gunicorn workers and tools),
+# bounded by entry count with least-recently-used eviction. Nothing is opened
+# until the first get/put, so constructing one (at import) costs nothing.
+
+import os, json, time, sqlite3, hashlib, threading
+
+MAX_ENTRIES    = int(os.getenv("PV_SCORE_CACHE_MAX_ENTRIES", "200000"))
+EVICT_EVERY    = 200     # puts between size checks
+TOUCH_AFTER_S  = 60.0    # don't rewrite last_access on every hit
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class ScoreCache:
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._tls = threading.local()
+        self._lock = threading.Lock()
+        self._puts_since_check = 0
+        self._schema_pid = None
+        self.hits = self.misses = self.evictions = self.errors = 0
+
+    def _conn(self):
+        # Opened on first use, one per thread and process: a handle inherited
+        # through fork() (gunicorn --preload) is never used, only dropped.
+        pid = os.getpid()
+        conn = getattr(self._tls, "conn", None)
+        if conn is None or getattr(self._tls, "pid", None) != pid:
+            if self._schema_pid != pid:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if self._schema_pid != pid:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    " key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_last_access ON entries (last_access)")
+                self._schema_pid = pid
+            self._tls.conn, self._tls.pid = conn, pid
+        return conn
+
+    def _count(self, **kw):
+        with self._lock:
+            for k, v in kw.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def get_many(self, keys):
+        """-> {key: value} for the keys present; refreshes their LRU position."""
+        keys = list(dict.fromkeys(k for k in keys if k))
+        found = {}
+        if not keys:
+            return found
+        try:
+            conn = self._conn()
+            now = time.time()
+            stale = []
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                q = f"SELECT key, value, last_access FROM entries WHERE key IN ({','.join('?' * len(part))})"
+                for key, value, last in conn.execute(q, part):
+                    found[key] = json.loads(value)
+                    if now - last > TOUCH_AFTER_S:
+                        stale.append((now, key))
+            if stale:
+                conn.executemany("UPDATE entries SET last_access = ? WHERE key = ?", stale)
+        except Exception as e:
+            self._count(errors=1)
+            print("[SCORE_CACHE] read failed:", repr(e))
+            return {}
+        self._count(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def put_many(self, items):
+        """items: {key: json-serialisable value}"""
+        if not items:
+            return
+        now = time.time()
+        try:
+            self._conn().executemany(
+                "INSERT OR REPLACE INTO entries (key, value, last_access) VALUES (?, ?, ?)",
+                [(k, json.dumps(v), now) for k, v in items.items()],
+            )
+        except Exception as e:
+            self._count(errors=1)
+            print("[SCORE_CACHE] write failed:", repr(e))
+            return
+        with self._lock:
+            self._puts_since_check += len(items)
+            check = self._puts_since_check >= EVICT_EVERY
+            if check:
+                self._puts_since_check = 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Drop least-recently-used entries beyond max_entries (+10% slack to batch deletes)."""
+        try:
+            conn = self._conn()
+            n = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            if n <= self.max_entries:
+                return 0
+            drop = n - int(self.max_entries * 0.9)
+            conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY last_access ASC LIMIT ?)", (drop,)
+            )
+        except Exception as e:
+            self._count(errors=1)
+            print("[SCORE_CACHE] eviction failed:", repr(e))
+            return 0
+        self._count(evictions=drop)
+        return drop
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            out = {
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "errors": self.errors,
+                "max_entries": self.max_entries,
+            }
+        try:
+            out["entries"] = self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        except Exception:
+            out["entries"] = None
+        return out
@@ -0,0 +1,170 @@
+# ai/shadow.py — score uploads with a candidate model next to production
+#
+# Set PV_SHADOW_MODEL_PATH (and PV_SHADOW_MODEL_VERSION) to a candidate model,
+# or only PV_SHADOW_ENSEMBLE_HEURISTIC_W to try the production model blended
+# with the heuristic. After each upload is committed, the image is scored
+# again in a small background thread pool, so the upload response never waits.
+# The result goes to ShadowScore and the running ShadowStat totals for the
+# (production, shadow) pair. The submission's status is never changed.
+#
+# The pool is bounded: with more than PV_SHADOW_MAX_PENDING images waiting,
+# new ones are skipped (counted as "dropped") rather than queued forever.
+import os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from ai.verifier import MAX_VERSION, Verifier
+
+SHADOW_MODEL_PATH    = os.getenv("PV_SHADOW_MODEL_PATH", "")
+SHADOW_MODEL_VERSION = os.getenv("PV_SHADOW_MODEL_VERSION", "")
+SHADOW_CLASS_MAP     = os.getenv("PV_SHADOW_CLASS_MAP_PATH", "")
+SHADOW_ENSEMBLE_W    = os.getenv("PV_SHADOW_ENSEMBLE_HEURISTIC_W", "")
+SHADOW_WORKERS       = int(os.getenv("PV_SHADOW_WORKERS", "1"))
+SHADOW_MAX_PENDING   = int(os.getenv("PV_SHADOW_MAX_PENDING", "64"))
+
+class ShadowRunner:
+    def __init__(self, app, db, model_path=SHADOW_MODEL_PATH, model_version=SHADOW_MODEL_VERSION,
+                 ensemble_w=SHADOW_ENSEMBLE_W, workers=SHADOW_WORKERS, max_pending=SHADOW_MAX_PENDING):
+        self.app, self.db = app, db
+        self.enabled = bool(model_path or ensemble_w)
+        self.verifier = None
+        if self.enabled:
+            version = model_version or (
+                os.path.splitext(os.path.basename(model_path))[0] if model_path else None)
+            if version:
+                version = version[:MAX_VERSION]   # + "_onnx+heur" must fit model_version (32)
+            self.verifier = Verifier(
+                inference_socket="", model_path=model_path or None, model_version=version,
+                class_map_path=SHADOW_CLASS_MAP if model_path else None,
+                ensemble_w=float(ensemble_w) if ensemble_w else None,
+            )
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self._pool = None                      # created on first submit (after gunicorn forks)
+        self._lock = threading.Lock()
+        self.pending = self.done = self.dropped = self.errors = 0
+
+    def submit(self, submission_id, path, prod):
+        """Queue one committed upload; prod is the production Verifier.score() result."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                return False
+            self.pending += 1
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pv-shadow")
+        self._pool.submit(self._run, submission_id, path, dict(prod))
+        return True
+
+    def score(self, path, prod):
+        """Shadow result for one image, reusing production's duplicate decision."""
+        ph, exif_ok, rel, kind, version = self.verifier.load()._features([path])[0]
+        return self.verifier._assemble(ph, prod.get("duplicate_of"), exif_ok, rel, kind, version)
+
+    def _run(self, submission_id, path, prod):
+        try:
+            t0 = time.perf_counter()
+            res = self.score(path, prod)
+            latency_ms = (time.perf_counter() - t0) * 1000
+            with self.app.app_context():
+                for attempt in (1, 2):   # 2nd try if another worker created the ShadowStat row first
+                    try:
+                        record(self.db, submission_id, prod, res, latency_ms)
+                        self.db.session.commit()
+                        break
+                    except IntegrityError:
+                        self.db.session.rollback()
+                        if attempt == 2:
+                            raise
+                    except Exception:
+                        self.db.session.rollback()
+                        raise
+            with self._lock:
+                self.done += 1
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print("[SHADOW] scoring failed:", repr(e))
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def wait(self, timeout=30.0):
+        """Block until the queue is empty (tools and tests)."""
+        end = time.time() + timeout
+        while self.pending and time.time() < end:
+            time.sleep(0.01)
+        return self.pending == 0
+
+    def status(self):
+        with self._lock:
+            info = {"enabled": self.enabled, "pending": self.pending, "done": self.done,
+                    "dropped": self.dropped, "errors": self.errors}
+        if self.verifier is not None:
+            info.update(model_path=self.verifier.model_path, model_version=self.verifier.model_version,
+                        model_kind=self.verifier._out_kind() if self.verifier._loaded else None)
+        return info
+
+def record(db, submission_id, prod, res, latency_ms=None):
+    """Add one ShadowScore and fold it into the pair's ShadowStat (caller commits)."""
+    from models import ShadowScore, ShadowStat
+    prod_ok, shadow_ok = prod.get("status") == "AUTO_OK", res["status"] == "AUTO_OK"
+    prod_version, version = prod.get("model_version") or "", res["model_version"]
+    now = datetime.utcnow()
+    db.session.add(ShadowScore(
+        submission_id=submission_id, model_version=version, prod_model_version=prod_version,
+        relevance_score=res["relevance_score"], action_score=res["action_score"], status=res["status"],
+        prod_relevance_score=prod.get("relevance_score"), prod_action_score=prod.get("action_score"),
+        prod_status=prod.get("status"), agree=prod_ok == shadow_ok, latency_ms=latency_ms, created_at=now,
+    ))
+    diff = float(res["action_score"]) - float(prod.get("action_score") or 0.0)
+    with db.session.begin_nested():
+        st = (ShadowStat.query.filter_by(prod_model_version=prod_version, model_version=version)
+              .with_for_update().first())
+        if st is None:
+            st = ShadowStat(prod_model_version=prod_version, model_version=version, n=0, both_ok=0,
+                            prod_only_ok=0, shadow_only_ok=0, both_recheck=0, sum_diff=0.0,
+                            sum_abs_diff=0.0, sum_sq_diff=0.0, sum_latency_ms=0.0, first_at=now)
+            db.session.add(st)
+        st.n += 1
+        if prod_ok and shadow_ok:
+            st.both_ok += 1
+        elif prod_ok:
+            st.prod_only_ok += 1
+        elif shadow_ok:
+            st.shadow_only_ok += 1
+        else:
+            st.both_recheck += 1
+        st.sum_diff += diff
+        st.sum_abs_diff += abs(diff)
+        st.sum_sq_diff += diff * diff
+        st.sum_latency_ms += latency_ms or 0.0
+        st.last_at = now
+
+def summary(st):
+    """Agreement numbers for one ShadowStat row."""
+    n = st.n or 0
+    agree = (st.both_ok or 0) + (st.both_recheck or 0)
+    # Cohen's kappa: agreement beyond what the two AUTO_OK rates give by chance
+    p_prod = ((st.both_ok or 0) + (st.prod_only_ok or 0)) / n if n else 0.0
+    p_shadow = ((st.both_ok or 0) + (st.shadow_only_ok or 0)) / n if n else 0.0
+    p_chance = p_prod * p_shadow + (1 - p_prod) * (1 - p_shadow)
+    p_agree = agree / n if n else 0.0
+    return {
+        "prod_model_version": st.prod_model_version, "model_version": st.model_version, "n": n,
+        "agreement": round(p_agree, 4),
+        "kappa": round((p_agree - p_chance) / (1 - p_chance), 4) if n and p_chance < 1 else None,
+        "confusion": {"both_ok": st.both_ok, "prod_only_ok": st.prod_only_ok,
+                      "shadow_only_ok": st.shadow_only_ok, "both_recheck": st.both_recheck},
+        "prod_ok_rate": round(p_prod, 4), "shadow_ok_rate": round(p_shadow, 4),
+        "mean_diff": round(st.sum_diff / n, 4) if n else None,
+        "mean_abs_diff": round(st.sum_abs_diff / n, 4) if n else None,
+        "rmse": round((st.sum_sq_diff / n) ** 0.5, 4) if n else None,
+        "mean_latency_ms": round(st.sum_latency_ms / n, 1) if n else None,
+        "first_at": st.first_at.isoformat() if st.first_at else None,
+        "last_at": st.last_at.isoformat() if st.last_at else None,
+    }
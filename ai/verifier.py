@@ -1,19 +1,40 @@
 # ai/verifier.py — ONNX → TF → heuristic pipeline (cleaned & fixed)
 
-import os, json, piexif, imagehash
+import os, json, hashlib, threading, time, piexif, imagehash
+from contextlib import contextmanager
 from PIL import Image
 import numpy as np
 
 # --- Optional backends ---
-try:
-    import onnxruntime as ort  # tiny, fast runtime
-except Exception:
-    ort = None
+# Imported on first use, not at module import: tensorflow alone can take
+# seconds, and tools that never score an image shouldn't pay for it.
+ort = None  # onnxruntime, tiny, fast runtime
+tf = None   # optional; only used if available AND no ONNX
+_ort_tried = _tf_tried = False
+
+def _import_ort():
+    global ort, _ort_tried
+    if not _ort_tried:
+        _ort_tried = True
+        try:
+            import onnxruntime as _ort
+            ort = _ort
+        except Exception:
+            ort = None
+    return ort
+
+def _import_tf():
+    global tf, _tf_tried
+    if not _tf_tried:
+        _tf_tried = True
+        try:
+            import tensorflow as _tf
+            tf = _tf
+        except Exception:
+            tf = None
+    return tf
 
-try:
-    import tensorflow as tf   # optional; only used if available AND no ONNX
-except Exception:
-    tf = None
+from ai.score_cache import ScoreCache, file_digest
 
 # --- Env + constants ---
 TARGET_H, TARGET_W = 224, 224
@@ -35,6 +56,29 @@ DISABLE_DUP_PENALTY  = os.getenv("PV_DISABLE_DUP_PENALTY", "0") == "1"
 DUP_DISTANCE         = int(os.getenv("PV_DUP_DISTANCE", "5"))
 DUP_PENALTY_VALUE    = float(os.getenv("PV_DUP_PENALTY", "0.40"))
 
+# Action score = W_REL*relevance + W_AUTH*auth + EXIF_BONUS (if EXIF time) - dup penalty,
+# auth = AUTH_OK unless the EXIF time is known bad (AUTH_BAD).
+# Tune with tools/calibrate_verifier.py.
+ACTION_W_REL         = float(os.getenv("PV_ACTION_W_REL", "0.55"))
+ACTION_W_AUTH        = float(os.getenv("PV_ACTION_W_AUTH", "0.30"))
+ACTION_EXIF_BONUS    = float(os.getenv("PV_ACTION_EXIF_BONUS", "0.08"))
+AUTH_OK, AUTH_BAD    = 0.6, 0.2
+
+# Ensemble: relevance = (1-w)*model + w*heuristic when a model is loaded (0 = model only)
+ENSEMBLE_HEURISTIC_W = float(os.getenv("PV_ENSEMBLE_HEURISTIC_W", "0"))
+
+# Runtime/deployment knobs
+PV_ORT_THREADS       = int(os.getenv("PV_ORT_THREADS", "0"))          # 0 = onnxruntime default; 1 = fork-safe
+PV_ORT_ARENA         = os.getenv("PV_ORT_ARENA", "1") == "1"          # 0 = no per-process CPU arena
+INFERENCE_SOCKET     = os.getenv("PV_INFERENCE_SOCKET", "")          # score via ai/inference_server.py
+INFERENCE_FALLBACK   = os.getenv("PV_INFERENCE_FALLBACK", "1") == "1" # load locally if the server is down
+REMOTE_INFO_TTL_S    = 5.0   # re-ask the server its model version before trusting cached features
+MAX_VERSION          = 22    # + "_onnx+heur" fits Submission.model_version (32)
+
+def auto_version(model_path, base=MODEL_VERSION):
+    """The version a loaded model is stamped with unless one is given: "<base>-<sha256[:7]>"."""
+    return f"{base[:MAX_VERSION - 8]}-{file_digest(model_path)[:7]}"
+
 def _prep(path: str) -> np.ndarray:
     """Load & resize to model input. IMPORTANT: feed 0..255 float to ONNX (preprocessing is inside the exported model)."""
     img = Image.open(path).convert("RGB").resize((TARGET_W, TARGET_H))
@@ -68,7 +112,8 @@ def _image_entropy(arr01: np.ndarray) -> float:
     ent_norm = ent / np.log2(32)
     return float(max(0.0, min(1.0, ent_norm)))
 
-def simple_relevance_heuristic(path: str) -> float:
+def heuristic_raw(path: str) -> float:
+    """Heuristic relevance before PV_HEURISTIC_BIAS and the floor/ceiling clamp."""
     img = Image.open(path).convert("RGB").resize((320, 320))
     arr = np.asarray(img, dtype=np.float32) / 255.0
 
@@ -113,26 +158,73 @@ def simple_relevance_heuristic(path: str) -> float:
         0.12 * ent +
         0.08 * trash_cue
     )
-    base += 0.05 + HEURISTIC_BIAS
+    base += 0.05
     if edge_density > 0.08 and dark_ratio > 0.18:
         base += 0.06
 
-    score = max(HEURISTIC_FLOOR, min(1.0, base - forest_penalty))
-    return float(score)
+    return float(base - forest_penalty)
+
+def heuristic_from_raw(raw, bias=HEURISTIC_BIAS, floor=HEURISTIC_FLOOR):
+    """Clamp raw heuristic scores (float or array) into relevance."""
+    return np.clip(np.asarray(raw, dtype=np.float64) + bias, floor, 1.0)
+
+def simple_relevance_heuristic(path: str) -> float:
+    return float(heuristic_from_raw(heuristic_raw(path)))
+
+def exif_code(exif_ok):
+    """True / None / False -> 1 / 0 / -1 (for action_score over arrays)."""
+    return 1 if exif_ok else (-1 if exif_ok is False else 0)
+
+def action_score(rel, exif, is_dup, w_rel=ACTION_W_REL, w_auth=ACTION_W_AUTH,
+                 exif_bonus=ACTION_EXIF_BONUS, dup_penalty=None):
+    """
+    The action score for one report or, with NumPy arrays (exif as exif_code
+    values), for many at once; weights may be arrays that broadcast.
+    """
+    if dup_penalty is None:
+        dup_penalty = 0.0 if DISABLE_DUP_PENALTY else DUP_PENALTY_VALUE
+    exif = np.asarray(exif)
+    auth = np.where(exif >= 0, AUTH_OK, AUTH_BAD)
+    score = w_rel * np.asarray(rel) + w_auth * auth + exif_bonus * (exif > 0) - dup_penalty * np.asarray(is_dup)
+    return np.clip(score, 0.0, 1.0)
+
+# ------------ Model backend -------------
+class ModelBackend:
+    """
+    One loaded model (ONNX, else TF, else the heuristic) with its class map.
+    A Verifier scores with one backend at a time; ai/registry.py loads a new
+    one beside it and swaps it in. `inflight` counts the calls using this
+    backend, so a replaced one is only closed once they have finished.
+
+    Without a model_version, a model that loads is stamped auto_version() of
+    its file, so every process scoring with the same file (web workers, the
+    inference server, the tools) reports the same version and shares cache
+    entries. The heuristic fallback keeps the plain PV_MODEL_VERSION.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, model_version: str | None = None,
+                 class_map_path: str = CLASS_MAP_PATH_ENV):
+        self.model_path = model_path
+        self.model_version = MODEL_VERSION if model_version is None else model_version
+        self.stamp_version = model_version is None
+        self.class_map_path = class_map_path
 
-# ------------ Verifier -------------
-class Verifier:
-    def __init__(self):
         self.model_kind = "heuristic"
         self.onnx_sess = None
         self.onnx_input_name = None
         self.tf_model = None
+        self.valid_index = PV_VALID_CLASS_INDEX
+
+        self.model_loaded = False
+        self.loaded_at = None
+        self.inflight = 0      # guarded by the owning Verifier's swap lock
+        self.retired = False
 
+    def load_class_map(self):
         # figure out class_map path (env -> model_stem.json -> ai/class_map.json)
-        self.valid_index = PV_VALID_CLASS_INDEX
-        cm_path = CLASS_MAP_PATH_ENV
+        cm_path = self.class_map_path
         if not cm_path:
-            stem_guess = os.path.splitext(MODEL_PATH)[0] + ".json"
+            stem_guess = os.path.splitext(self.model_path)[0] + ".json"
             if os.path.isfile(stem_guess):
                 cm_path = stem_guess
             elif os.path.isfile("ai/class_map.json"):
@@ -158,100 +250,336 @@ class Verifier:
         except Exception as e:
             print("[VERIFIER] class_map read error; using env index:", repr(e))
 
+    def load(self):
+        self.model_loaded = True
+        self.loaded_at = time.time()
+        have_file = os.path.isfile(self.model_path)
+        is_onnx = self.model_path.lower().endswith(".onnx")
+
         # Prefer ONNX if available
-        if ort is not None and os.path.isfile(MODEL_PATH) and MODEL_PATH.lower().endswith(".onnx"):
+        if have_file and is_onnx and _import_ort() is not None:
             try:
                 so = ort.SessionOptions()
-                self.onnx_sess = ort.InferenceSession(MODEL_PATH, sess_options=so, providers=["CPUExecutionProvider"])
+                if PV_ORT_THREADS > 0:
+                    # 1 = no intra/inter-op pool threads, so a session built in a
+                    # preloading gunicorn master is safe to use after fork
+                    so.intra_op_num_threads = PV_ORT_THREADS
+                    so.inter_op_num_threads = PV_ORT_THREADS
+                so.enable_cpu_mem_arena = PV_ORT_ARENA
+                self.onnx_sess = ort.InferenceSession(self.model_path, sess_options=so, providers=["CPUExecutionProvider"])
                 self.onnx_input_name = self.onnx_sess.get_inputs()[0].name
                 self.model_kind = "onnx"
-                print(f"[VERIFIER] ONNX model loaded: {MODEL_PATH}")
-                return
+                self._stamp()
+                print(f"[VERIFIER] ONNX model loaded: {self.model_path} ({self.model_version})")
+                return self
             except Exception as e:
                 print("[VERIFIER] ONNX load error, will try TF then heuristic:", repr(e))
 
         # Fallback: TensorFlow (if present and model path exists)
-        if tf is not None and os.path.isfile(MODEL_PATH) and not MODEL_PATH.lower().endswith(".onnx"):
+        if have_file and not is_onnx and _import_tf() is not None:
             try:
-                self.tf_model = tf.keras.models.load_model(MODEL_PATH, compile=False)
+                self.tf_model = tf.keras.models.load_model(self.model_path, compile=False)
                 self.model_kind = "tf"
-                print(f"[VERIFIER] TF/Keras model loaded: {MODEL_PATH}")
-                return
+                self._stamp()
+                print(f"[VERIFIER] TF/Keras model loaded: {self.model_path} ({self.model_version})")
+                return self
             except Exception as e:
                 print("[VERIFIER] TF load error, falling back to heuristic:", repr(e))
 
         # Last resort: heuristic only
         if self.model_kind == "heuristic":
-            if ort is None and tf is None:
-                print("[VERIFIER] No ONNX or TF available, using heuristic only.")
-            else:
+            if not have_file:
                 print("[VERIFIER] Model not found, using heuristic only.")
+            else:
+                print("[VERIFIER] No usable ONNX or TF runtime for model, using heuristic only.")
+        return self
 
-    def _predict_rel(self, path: str) -> float:
-        """Return relevance score [0..1] using ONNX or TF or heuristic."""
-        # --- ONNX ---
-        if self.model_kind == "onnx" and self.onnx_sess is not None:
-            x = _prep(path)  # 0..255 float
-            out = self.onnx_sess.run(None, {self.onnx_input_name: x})
-            y = np.array(out[0]).reshape(-1)
-
-            if y.size == 1:
-                # binary head (sigmoid/logit); clamp safely
-                val = float(y[0])
-                # if it looks like logits, map via sigmoid
-                if val < 0.0 or val > 1.0:
-                    val = float(1.0 / (1.0 + np.exp(-val)))
-                return float(np.clip(val, 0.0, 1.0))
-
-            # multiclass: use the probability of the valid class directly
-            probs = _softmax_np(y.astype(float))
-            return float(probs[self.valid_index])
-
-        # --- TF ---
-        if self.model_kind == "tf" and self.tf_model is not None:
-            x = _prep(path)
-            y = np.array(self.tf_model.predict(x, verbose=0)).reshape(-1)
-
-            if y.size == 1:
-                val = float(y[0])
-                if val < 0.0 or val > 1.0:
-                    val = float(1.0 / (1.0 + np.exp(-val)))
-                return float(np.clip(val, 0.0, 1.0))
+    def _stamp(self):
+        if self.stamp_version:
+            try:
+                self.model_version = auto_version(self.model_path)
+            except OSError as e:
+                print("[VERIFIER] could not hash the model file, keeping", self.model_version, repr(e))
 
-            probs = _softmax_np(y.astype(float))
-            return float(probs[self.valid_index])
+    def warm_up(self, batch: int = 2):
+        """Run a dummy batch through the model; raises if it fails or gives unusable output."""
+        if self.model_kind == "heuristic":
+            return
+        x = np.zeros((batch, TARGET_H, TARGET_W, 3), dtype=np.float32)
+        try:
+            y = self._run(x)
+        except Exception:
+            x, batch = x[:1], 1   # model exported with a fixed batch dimension of 1
+            y = self._run(x)
+        rels = [self._rel_from_output(row) for row in np.asarray(y).reshape(batch, -1)]
+        if not all(np.isfinite(rels)):
+            raise ValueError(f"warm-up produced non-finite scores: {rels}")
+
+    def close(self):
+        """Drop the session; only called once no call is using this backend."""
+        self.onnx_sess = None
+        self.tf_model = None
 
-        # --- Heuristic ---
+    def _run(self, x):
+        if self.model_kind == "onnx" and self.onnx_sess is not None:
+            return np.array(self.onnx_sess.run(None, {self.onnx_input_name: x})[0])
+        if self.model_kind == "tf" and self.tf_model is not None:
+            return np.array(self.tf_model.predict(x, verbose=0))
+        raise RuntimeError(f"no {self.model_kind} model loaded")
+
+    def _rel_from_output(self, y: np.ndarray) -> float:
+        """Map one raw model output row to a relevance score [0..1]."""
+        y = np.asarray(y).reshape(-1)
+        if y.size == 1:
+            # binary head (sigmoid/logit); clamp safely
+            val = float(y[0])
+            # if it looks like logits, map via sigmoid
+            if val < 0.0 or val > 1.0:
+                val = float(1.0 / (1.0 + np.exp(-val)))
+            return float(np.clip(val, 0.0, 1.0))
+
+        # multiclass: use the probability of the valid class directly
+        probs = _softmax_np(y.astype(float))
+        return float(probs[self.valid_index])
+
+    def predict_rel(self, path: str) -> float:
+        """Return relevance score [0..1] using ONNX or TF or heuristic."""
+        if self.model_kind in ("onnx", "tf"):
+            return self._rel_from_output(self._run(_prep(path)))  # 0..255 float
         return simple_relevance_heuristic(path)
 
-    def score(self, path, existing_phashes=None):
-        # 1) Duplicate check
-        ph = compute_phash(path)
-        dupe_of = None
-        if (not DISABLE_DUP_PENALTY) and existing_phashes:
+    def predict_rel_batch(self, paths) -> list:
+        """Relevance for many images with one model call (falls back to one-by-one)."""
+        paths = list(paths)
+        if not paths:
+            return []
+        if self.model_kind in ("onnx", "tf") and len(paths) > 1:
             try:
-                ph_obj = imagehash.hex_to_hash(ph)
-                for sid, other in existing_phashes:
-                    if other and (ph_obj - imagehash.hex_to_hash(other) <= DUP_DISTANCE):
-                        dupe_of = sid
-                        break
-            except Exception:
-                pass
-
-        # 2) EXIF presence
-        exif_ok = exif_time_okay(path)
-
-        # 3) Relevance/auth
-        rel = self._predict_rel(path)
-        auth = 0.6 if exif_ok in (True, None) else 0.2
+                y = self._run(np.concatenate([_prep(p) for p in paths], axis=0))
+                if y.shape[0] == len(paths):
+                    return [self._rel_from_output(row) for row in y.reshape(len(paths), -1)]
+            except Exception as e:
+                # e.g. model exported with a fixed batch dimension of 1
+                print("[VERIFIER] batch inference failed, scoring one by one:", repr(e))
+        return [self.predict_rel(p) for p in paths]
 
-        dup_penalty = 0.0 if DISABLE_DUP_PENALTY else (DUP_PENALTY_VALUE if dupe_of is not None else 0.0)
-        exif_bonus  = 0.08 if exif_ok else 0.0
+# ------------ Verifier -------------
+class Verifier:
+    """
+    Cheap to construct: the class map, the inference runtime and the model are
+    loaded on first use (or by an explicit load(), e.g. a gunicorn warm-up hook).
+    load() is thread-safe and idempotent; swap_backend() replaces the model
+    while calls already running finish on the old one.
+    """
+
+    def __init__(self, lazy: bool = True, inference_socket: str | None = None,
+                 score_cache: str | None = None, model_path: str | None = None,
+                 model_version: str | None = None, class_map_path: str | None = None,
+                 ensemble_w: float | None = None):
+        # defaults from PV_MODEL_PATH / PV_MODEL_VERSION / PV_CLASS_MAP_PATH;
+        # ai/shadow.py passes its own to run a second model side by side
+        self._backend = ModelBackend(
+            MODEL_PATH if model_path is None else model_path,
+            model_version,
+            CLASS_MAP_PATH_ENV if class_map_path is None else class_map_path,
+        )
+        self.ensemble_w = ENSEMBLE_HEURISTIC_W if ensemble_w is None else ensemble_w
+
+        # "" disables the inference server even if PV_INFERENCE_SOCKET is set
+        self.inference_socket = INFERENCE_SOCKET if inference_socket is None else inference_socket
+        self._remote = None
+        self._remote_kind = self._remote_version = None
+        self._remote_checked = 0.0
+
+        # persistent per-image feature cache ("" disables; read here, not at
+        # import, so app.py's env defaults apply)
+        cache_path = os.getenv("PV_SCORE_CACHE_PATH", "") if score_cache is None else score_cache
+        self.cache = None
+        if cache_path:
+            try:
+                self.cache = ScoreCache(cache_path)
+            except Exception as e:
+                print("[VERIFIER] score cache disabled:", repr(e))
+
+        # optional stage timings / counters (metrics.VerifierObserver)
+        self.observer = None
+
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        if not lazy:
+            self.load()
+
+    # model details come from the current backend (or the inference server)
+    @property
+    def model_kind(self):
+        return self._remote_kind if self._remote is not None else self._backend.model_kind
+
+    @property
+    def model_version(self):
+        if self._remote is not None and self._remote_version:
+            return self._remote_version
+        return self._backend.model_version
+
+    @property
+    def model_path(self):
+        return self._backend.model_path
+
+    @property
+    def valid_index(self):
+        return self._backend.valid_index
+
+    @property
+    def backend(self):
+        return self._backend
+
+    def load(self):
+        if self._loaded:
+            return self
+        with self._load_lock:
+            if not self._loaded:
+                self._backend.load_class_map()
+                if not (self.inference_socket and self._connect_remote()):
+                    self._backend.load()
+                self._loaded = True
+                if self.observer is not None:
+                    self.observer.model(self.model_kind, self.model_version)
+        return self
+
+    def _observe(self, stage, t0):
+        if self.observer is not None:
+            self.observer.stage(stage, time.perf_counter() - t0)
+
+    def _count(self, event, n=1, model_kind=None):
+        if self.observer is not None:
+            self.observer.count(event, n, model_kind or self.model_kind)
+
+    def _connect_remote(self) -> bool:
+        """Use the shared inference process instead of a model in this process."""
+        try:
+            from ai.inference_server import RemoteInference
+            remote = RemoteInference(self.inference_socket)
+            info = remote.info()
+            self._remote = remote
+            self._remote_kind = info["model_kind"]
+            self._remote_version = info.get("model_version")
+            self._remote_checked = time.time()
+            print(f"[VERIFIER] using inference server at {self.inference_socket} ({self._remote_kind})")
+            return True
+        except Exception as e:
+            print("[VERIFIER] inference server not reachable, loading model locally:", repr(e))
+            return False
+
+    def _note_remote(self, kind, version):
+        """The server's model as of its last reply; it may have been reloaded from another worker."""
+        if not version or (kind, version) == (self._remote_kind, self._remote_version):
+            return
+        previous = (self._remote_kind, self._remote_version)
+        self._remote_kind, self._remote_version = kind, version
+        print(f"[VERIFIER] inference server now runs {version}_{kind} (was {previous[1]}_{previous[0]})")
+        if self.observer is not None:
+            self.observer.model(kind, version, previous=previous)
+
+    def _refresh_remote(self):
+        if self._remote is None or time.time() - self._remote_checked < REMOTE_INFO_TTL_S:
+            return
+        self._remote_checked = time.time()
+        try:
+            info = self._remote.info()
+        except Exception:
+            return                 # predict() will fail over (or raise) on its own
+        self._note_remote(info["model_kind"], info.get("model_version"))
+
+    def _ensure_local_model(self):
+        if self._backend.model_loaded:
+            return
+        with self._load_lock:
+            if not self._backend.model_loaded:
+                self._backend.load()
+
+    @contextmanager
+    def _use_backend(self):
+        """Pin the current backend for one call; a swap meanwhile doesn't close it under us."""
+        with self._swap_lock:
+            b = self._backend
+            b.inflight += 1
+        try:
+            yield b
+        finally:
+            with self._swap_lock:
+                b.inflight -= 1
+                close = b.retired and b.inflight == 0
+            if close:
+                b.close()
+
+    def swap_backend(self, new: ModelBackend) -> ModelBackend:
+        """Make `new` (loaded and warmed up) the model for all later calls; returns the old one."""
+        with self._swap_lock:
+            old, self._backend = self._backend, new
+            old.retired = True
+            close = old.inflight == 0
+        if close:
+            old.close()
+        if self.observer is not None:
+            self.observer.model(new.model_kind, new.model_version, previous=(old.model_kind, old.model_version))
+        print(f"[VERIFIER] model swapped: {old.model_version}_{old.model_kind} -> "
+              f"{new.model_version}_{new.model_kind} ({old.inflight} call(s) finishing on the old one)")
+        return old
+
+    def _predict_local(self, paths):
+        """-> (relevance per path, model_kind, model_version) from one pinned backend."""
+        with self._use_backend() as b:
+            return b.predict_rel_batch(paths), b.model_kind, b.model_version
+
+    def _predict_rel_batch(self, paths) -> list:
+        return self._predict_local(paths)[0]
+
+    def _infer(self, paths):
+        """-> (relevance per path, model_kind and model_version that actually produced them)"""
+        if self._remote is not None:
+            try:
+                rels, kind, version = self._remote.predict(paths)
+                self._note_remote(kind, version)
+                return rels, kind, version or self.model_version
+            except Exception as e:
+                if not INFERENCE_FALLBACK:
+                    raise
+                print("[VERIFIER] inference server call failed, scoring locally:", repr(e))
+                self._count("remote_fallback")
+                self._ensure_local_model()
+        return self._predict_local(paths)
+
+    def _out_kind(self, kind=None):
+        """model_kind as stamped on results ("onnx+heur" in ensemble mode)."""
+        kind = kind or self.model_kind
+        return kind + "+heur" if self.ensemble_w > 0 and kind in ("onnx", "tf") else kind
+
+    def _ensemble(self, paths, rels, kind):
+        """Blend model relevance with the heuristic (PV_ENSEMBLE_HEURISTIC_W)."""
+        out = self._out_kind(kind)
+        if out == kind:
+            return rels, kind
+        w = self.ensemble_w
+        return [(1.0 - w) * float(r) + w * simple_relevance_heuristic(p) for p, r in zip(paths, rels)], out
+
+    def _find_duplicate(self, ph, existing_phashes):
+        if DISABLE_DUP_PENALTY or not existing_phashes:
+            return None
+        try:
+            ph_obj = imagehash.hex_to_hash(ph)
+            for sid, other in existing_phashes:
+                if other and (ph_obj - imagehash.hex_to_hash(other) <= DUP_DISTANCE):
+                    return sid
+        except Exception:
+            pass
+        return None
 
-        action_score = max(0.0, min(1.0, 0.55*rel + 0.30*auth + exif_bonus - dup_penalty))
+    def _assemble(self, ph, dupe_of, exif_ok, rel, model_kind=None, model_version=None):
+        auth = AUTH_OK if exif_ok in (True, None) else AUTH_BAD
+        score = float(action_score(rel, exif_code(exif_ok), dupe_of is not None))
 
         # You can rename this to "valid_report" if you prefer
-        label = "valid_report" if action_score >= PV_ACTION_CUTOFF else "invalid"
+        label = "valid_report" if score >= PV_ACTION_CUTOFF else "invalid"
         status = "AUTO_OK" if label == "valid_report" else "RECHECK"
 
         return {
@@ -260,8 +588,94 @@ class Verifier:
             "exif_time_ok": True if exif_ok else (False if exif_ok is False else None),
             "relevance_score": float(rel),
             "auth_score": float(auth),
-            "action_score": float(action_score),
+            "action_score": score,
             "ai_label": label,
             "status": status,
-            "model_version": MODEL_VERSION + f"_{self.model_kind}"
+            "model_version": (model_version or self.model_version) + f"_{model_kind or self._out_kind()}"
         }
+
+    def _cache_key(self, digest, model_kind, model_version):
+        knobs = (f"{model_version}_{model_kind}|vi={self.valid_index}|"
+                 f"hf={HEURISTIC_FLOOR}|hb={HEURISTIC_BIAS}|{TARGET_W}x{TARGET_H}")
+        if model_kind.endswith("+heur"):
+            knobs += f"|ew={self.ensemble_w}"
+        return digest + ":" + hashlib.sha1(knobs.encode()).hexdigest()[:16]
+
+    def _features(self, paths, _retry=True):
+        """-> [(phash, exif_ok, rel, model_kind, model_version)] per path; cache hits skip inference."""
+        paths = list(paths)
+        feats = [None] * len(paths)
+        digests = [None] * len(paths)
+        looked_up = None
+
+        if self.cache is not None:
+            t0 = time.perf_counter()
+            for i, p in enumerate(paths):
+                try:
+                    digests[i] = file_digest(p)
+                except OSError:
+                    pass
+            self._refresh_remote()
+            version = self.model_version
+            looked_up = (self._out_kind(), version)
+            keys = [self._cache_key(d, self._out_kind(), version) if d else None for d in digests]
+            hit = self.cache.get_many(keys)
+            for i, k in enumerate(keys):
+                if k in hit:
+                    c = hit[k]
+                    feats[i] = (c["phash"], c["exif_ok"], c["rel"], c["kind"], version)
+            self._observe("cache_lookup", t0)
+            self._count("cache_hit", len(hit))
+            self._count("cache_miss", len(paths) - len(hit))
+
+        todo = [i for i, f in enumerate(feats) if f is None]
+        if todo:
+            t0 = time.perf_counter()
+            rels, kind, version = self._infer([paths[i] for i in todo])
+            rels, kind = self._ensemble([paths[i] for i in todo], rels, kind)
+            self._observe("inference", t0)
+            t0 = time.perf_counter()
+            fresh = {}
+            for i, rel in zip(todo, rels):
+                ph, exif_ok = compute_phash(paths[i]), exif_time_okay(paths[i])
+                feats[i] = (ph, exif_ok, float(rel), kind, version)
+                if digests[i]:
+                    fresh[self._cache_key(digests[i], kind, version)] = {
+                        "phash": ph, "exif_ok": exif_ok, "rel": float(rel), "kind": kind,
+                    }
+            self._observe("phash_exif", t0)
+            if self.cache is not None:
+                t0 = time.perf_counter()
+                self.cache.put_many(fresh)
+                self._observe("cache_store", t0)
+
+            missed = set(todo)
+            hits = [i for i in range(len(paths)) if i not in missed]
+            if _retry and hits and looked_up is not None and looked_up != (kind, version):
+                # the model was swapped since the lookup (here or on the inference
+                # server): the hits belong to the old one, so look them up again
+                for i, f in zip(hits, self._features([paths[i] for i in hits], _retry=False)):
+                    feats[i] = f
+        return feats
+
+    def score(self, path, existing_phashes=None):
+        return self.score_batch([path], existing_phashes=existing_phashes)[0]
+
+    def score_batch(self, paths, existing_phashes=None):
+        """Same as score() for many images; model inference runs as one batch."""
+        self.load()
+        t_all = time.perf_counter()
+        feats = self._features(paths)
+        t0 = time.perf_counter()
+        out = []
+        for ph, exif_ok, rel, kind, version in feats:
+            # 1) Duplicate check  2) EXIF presence  3) Relevance/auth
+            dupe_of = self._find_duplicate(ph, existing_phashes)
+            out.append(self._assemble(ph, dupe_of, exif_ok, rel, kind, version))
+            self._count("scored", 1, kind)
+        self._observe("assemble", t0)   # duplicate check + scoring
+        self._observe("total", t_all)
+        return out
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
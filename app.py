@@ -5,17 +5,19 @@
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from sqlalchemy import desc, func
+from sqlalchemy.orm import joinedload
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv(), override=True)
 from datetime import timezone
 from zoneinfo import ZoneInfo
 import os
 import uuid
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 import piexif
 
-from flask import Flask, render_template, request, redirect, url_for, flash, abort, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, abort, jsonify, send_file
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import (
@@ -24,8 +26,16 @@ from flask_login import (
 from PIL import Image
 import imagehash
 
-from models import db, User, Submission, Message
+from models import db, User, Submission, Message, ShadowScore, ShadowStat
 from ai.verifier import Verifier
+from ai.shadow import ShadowRunner, summary as shadow_summary
+from ai.registry import ModelRegistry
+from geo.dzongkhags import get_resolver, lookup as lookup_dzongkhag
+from geo import trends
+import db_profile
+import metrics
+import profiling
+from db_profile import read_replica
 
 # -------------------------
 # GPS helpers
@@ -64,15 +74,19 @@ os.environ.setdefault("PV_MODEL_VERSION", "waste_v1_onnx")
 os.environ.setdefault("PV_ACTION_CUTOFF", "0.50")
 os.environ.setdefault("PV_DISABLE_DUP_PENALTY", "1")
 os.environ.setdefault("PV_DUP_DISTANCE", "3")
+os.environ.setdefault("PV_SCORE_CACHE_PATH", _abs("instance/score_cache.sqlite"))
 
 POINTS_PER_APPROVAL = int(os.getenv("POINTS_PER_APPROVAL", "10"))
 
-verifier = Verifier()
+verifier = Verifier()  # lazy: the model loads on first score() or in warm_up()
+registry = ModelRegistry(verifier)  # hot model reload (watcher starts with the first request)
 
 # -------------------------
 # Flask config
 # -------------------------
 app = Flask(__name__)
+# must be set before the Limiter reads the config (tools/bench_uploads.py turns it off)
+app.config["RATELIMIT_ENABLED"] = os.getenv("RATELIMIT_ENABLED", "1") == "1"
 limiter = Limiter(get_remote_address, app=app, default_limits=["60 per hour"])
 
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret")
@@ -82,12 +96,22 @@ app.config["MAX_CONTENT_LENGTH"] = 10 * 1024 * 1024
 DEFAULT_SQLITE_URL = f"sqlite:///{(ROOT / 'site.db').resolve().as_posix()}"
 DB_URL = os.getenv("DATABASE_URL", DEFAULT_SQLITE_URL)
 app.config["SQLALCHEMY_DATABASE_URI"] = DB_URL
+# Pool / PRAGMA profile picked from the URL (PV_DB_PROFILE overrides), see db_profile.py
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = db_profile.engine_options(DB_URL)
+# Optional read replica for dashboards/maps (views marked @read_replica)
+app.config["SQLALCHEMY_BINDS"] = db_profile.replica_binds(os.getenv("DATABASE_READ_URL"))
 app.config["REMEMBER_COOKIE_DURATION"] = timedelta(days=30)
 
 app.config["UPLOAD_FOLDER"] = os.path.join(app.root_path, "static", "uploads")
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
 db.init_app(app)
+db_profile.install(app, db)
+db_profile.install_query_counter(app, db)
+metrics.install(app, db, verifier)
+limiter.exempt(app.view_functions["metrics"])
+profiling.install(app, lambda: current_user.is_authenticated and current_user.role == "admin")
+shadow = ShadowRunner(app, db)   # no-op unless PV_SHADOW_MODEL_PATH / PV_SHADOW_ENSEMBLE_HEURISTIC_W is set
 
 # ---- Local time formatting (Asia/Thimphu) ----
 def _get_thimphu_tz():
@@ -113,11 +137,42 @@ def bt_time(dt, fmt="%Y-%m-%d %I:%M %p"):
 # Register in Jinja
 app.jinja_env.filters["bt_time"] = bt_time
 
-try:
-    with app.app_context():
-        db.create_all()
-except Exception as e:
-    print("[WARN] db.create_all failed:", e)
+# Tables are created on the first request (or in warm_up), not at import time,
+# so tools that only import app/db don't pay for create_all().
+_db_ready = False
+_db_ready_lock = threading.Lock()
+
+def init_db():
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_ready_lock:
+        if _db_ready:
+            return
+        try:
+            with app.app_context():
+                db.create_all()
+        except Exception as e:
+            print("[WARN] db.create_all failed (retried on the next request):", e)
+            return
+        _db_ready = True
+
+@app.before_request
+def _ensure_db():
+    init_db()
+    registry.start()   # no-op once running in this process
+
+def warm_up(start_watcher=True):
+    """
+    Create tables and load the model up front (gunicorn.conf.py). The
+    preloading master passes start_watcher=False: a watcher thread there could
+    hold the verifier's locks at the moment a worker forks, leaving them locked
+    for good in that worker. Workers start their own in post_fork.
+    """
+    init_db()
+    if start_watcher:
+        registry.start()   # first, so a respawned worker follows the last reload
+    verifier.load()
 
 login_manager = LoginManager(app)
 login_manager.login_view = "login"
@@ -165,47 +220,59 @@ def _award_points_once(sub: Submission, approver_id: int | None):
 def _save_and_score(file_storage, report_type, msg, lat, lon, reporter_location=None):
     fname = unique_filename(getattr(file_storage, "filename", "camera.jpg"))
     path = os.path.join(app.config["UPLOAD_FOLDER"], fname)
-    file_storage.save(path)
+    with metrics.stage("save"):
+        file_storage.save(path)
 
-    ex_lat, ex_lon = extract_gps(path)
+    with metrics.stage("extract_gps"):
+        ex_lat, ex_lon = extract_gps(path)
     if ex_lat is not None and ex_lon is not None:
         lat, lon = ex_lat, ex_lon
 
-    try:
-        new_phash = imagehash.phash(Image.open(path))
-    except Exception:
-        new_phash = None
+    with metrics.stage("phash"):
+        try:
+            new_phash = imagehash.phash(Image.open(path))
+        except Exception:
+            new_phash = None
 
     nearest_id = None
     nearest_dist = 999
-    recent = Submission.query.order_by(desc(Submission.created_at)).limit(200).all()
-    if new_phash is not None:
-        for s in recent:
-            if s.phash:
-                try:
-                    dist = abs(new_phash - imagehash.hex_to_hash(s.phash))
-                    if dist < nearest_dist:
-                        nearest_dist = dist
-                        nearest_id = s.id
-                except Exception:
-                    pass
-        dup_thresh = int(os.getenv("PV_DUP_DISTANCE", "3"))
-        duplicate_of = nearest_id if nearest_dist <= dup_thresh else None
-    else:
-        duplicate_of = None
+    with metrics.stage("duplicate_scan"):
+        recent = Submission.query.order_by(desc(Submission.created_at)).limit(200).all()
+        if new_phash is not None:
+            for s in recent:
+                if s.phash:
+                    try:
+                        dist = abs(new_phash - imagehash.hex_to_hash(s.phash))
+                        if dist < nearest_dist:
+                            nearest_dist = dist
+                            nearest_id = s.id
+                    except Exception:
+                        pass
+            dup_thresh = int(os.getenv("PV_DUP_DISTANCE", "3"))
+            duplicate_of = nearest_id if nearest_dist <= dup_thresh else None
+        else:
+            duplicate_of = None
 
     existing = [(s.id, getattr(s, "phash", None)) for s in recent if getattr(s, "phash", None)]
-    scores = verifier.score(path, existing_phashes=existing)
+    with metrics.stage("verifier"):
+        scores = verifier.score(path, existing_phashes=existing)
 
     final_phash = scores.get("phash") or (str(new_phash) if new_phash is not None else None)
     final_duplicate_of = scores.get("duplicate_of") or duplicate_of
 
+    lat = float(lat) if lat not in (None, "", "null") else None
+    lon = float(lon) if lon not in (None, "", "null") else None
+    with metrics.stage("geo_lookup"):
+        dzongkhag, zone = lookup_dzongkhag(lat, lon)
+
     sub = Submission(
         user_id=current_user.id,
         report_type=report_type,
         image_path=os.path.relpath(path, app.root_path).replace("\\", "/"),
-        lat=(float(lat) if lat not in (None, "", "null") else None),
-        lon=(float(lon) if lon not in (None, "", "null") else None),
+        lat=lat,
+        lon=lon,
+        dzongkhag=dzongkhag,
+        zone=zone,
         reporter_location=(reporter_location if reporter_location in ("at_place", "other_place") else None),
         ai_label=scores.get("ai_label"),
         ai_score=scores.get("action_score"),
@@ -219,14 +286,18 @@ def _save_and_score(file_storage, report_type, msg, lat, lon, reporter_location=
         model_version=scores.get("model_version"),
         human_state="unreviewed",
     )
-    db.session.add(sub)
-    db.session.flush()
+    with metrics.stage("db_commit"):
+        db.session.add(sub)
+        db.session.flush()
 
-    # Auto-award if AI says OK immediately
-    if sub.status == "AUTO_OK":
-        _award_points_once(sub, approver_id=current_user.id if current_user.is_authenticated else None)
+        # Auto-award if AI says OK immediately
+        if sub.status == "AUTO_OK":
+            _award_points_once(sub, approver_id=current_user.id if current_user.is_authenticated else None)
+            trends.record(sub.lat, sub.lon, sub.created_at, sub.dzongkhag)
 
-    db.session.commit()
+        db.session.commit()
+    metrics.upload_scored(sub.status)
+    shadow.submit(sub.id, path, scores)   # background; never changes sub
 
     if msg:
         m = Message(submission_id=sub.id, sender_id=current_user.id, body=msg)
@@ -321,6 +392,7 @@ def upload_api():
 
 @app.route("/result/<int:sid>")
 @login_required
+@read_replica
 def result(sid):
     sub = Submission.query.get_or_404(sid)
     if sub.user_id != current_user.id and current_user.role != "admin":
@@ -331,9 +403,14 @@ def result(sid):
     dup_disabled = os.getenv("PV_DISABLE_DUP_PENALTY", "0") == "1"
     dup_penalty = float(os.getenv("PV_DUP_PENALTY", "0.40"))
 
+    # one query for the thread + senders (submission.messages is a dynamic relationship)
+    messages = (sub.messages.options(joinedload(Message.sender))
+                .order_by(Message.id.asc()).all())
+
     return render_template(
         "result.html",
         submission=sub,
+        messages=messages,
         cutoff=cutoff,
         dup_disabled=dup_disabled,
         dup_penalty=dup_penalty,
@@ -360,13 +437,15 @@ def post_message(sid):
 @app.route("/admin")
 @login_required
 @admin_required
+@read_replica
 def admin_home():
     pending_count = Submission.query.filter_by(human_state="unreviewed").count()
     approved_count = Submission.query.filter_by(human_state="approved").count()
     rejected_count = Submission.query.filter_by(human_state="rejected").count()
 
-    auto_ok = Submission.query.filter_by(status="AUTO_OK").order_by(Submission.created_at.desc()).limit(20).all()
-    rechecks = Submission.query.filter_by(status="RECHECK").order_by(Submission.created_at.desc()).limit(20).all()
+    recent = Submission.query.options(joinedload(Submission.user)).order_by(Submission.created_at.desc())
+    auto_ok = recent.filter_by(status="AUTO_OK").limit(20).all()
+    rechecks = recent.filter_by(status="RECHECK").limit(20).all()
 
     return render_template("admin_dashboard.html",
                            auto_ok=auto_ok,
@@ -387,6 +466,9 @@ def admin_mark(sid, new_status):
     sub.status = new_status
     if new_status == "AUTO_OK" and prev != "AUTO_OK":
         _award_points_once(sub, approver_id=current_user.id)
+        trends.record(sub.lat, sub.lon, sub.created_at, sub.dzongkhag)
+    elif prev == "AUTO_OK" and new_status != "AUTO_OK":
+        trends.record(sub.lat, sub.lon, sub.created_at, sub.dzongkhag, weight=-1)
     db.session.commit()
     return redirect(url_for("admin_home"))
 
@@ -435,17 +517,7 @@ def admin_review():
         q = q.filter(Submission.report_type == category)
 
     if dz and dz != "all":
-        DZ_BBOX = {
-            "thimphu": (27.30, 27.60, 89.45, 89.80),
-            "paro":    (27.30, 27.70, 89.20, 89.60),
-            "punakha": (27.50, 27.90, 89.65, 90.10),
-            "wangdue": (27.30, 27.80, 89.70, 90.30),
-            "chukha":  (26.75, 27.35, 89.30, 89.85),
-        }
-        if dz in DZ_BBOX:
-            la0, la1, lo0, lo1 = DZ_BBOX[dz]
-            q = q.filter(Submission.lat >= la0, Submission.lat <= la1,
-                         Submission.lon >= lo0, Submission.lon <= lo1)
+        q = q.filter(Submission.dzongkhag == dz)
 
     q = q.order_by(Submission.created_at.desc())
     total = q.count()
@@ -468,7 +540,7 @@ def admin_review():
         "admin_review.html",
         tab=tab, rows=rows, total=total, page=page, per_page=per_page,
         pending_count=pending_count, approved_count=approved_count, rejected_count=rejected_count,
-        category=category, dz=dz, next_id=next_id
+        category=category, dz=dz, next_id=next_id, dz_names=get_resolver().names()
     )
 
 @app.route("/admin/review/decide/<int:sid>/<string:decision>", methods=["POST"])
@@ -530,7 +602,8 @@ def chat_room():
         return redirect(url_for("chat_room"))
 
     from models import ChatMessage
-    msgs = ChatMessage.query.order_by(ChatMessage.created_at.desc()).limit(100).all()
+    msgs = (ChatMessage.query.options(joinedload(ChatMessage.user))
+            .order_by(ChatMessage.created_at.desc()).limit(100).all())
     msgs = list(reversed(msgs))
     last_id = msgs[-1].id if msgs else 0
     return render_template("chat.html", msgs=msgs, last_id=last_id)
@@ -540,7 +613,7 @@ def chat_room():
 def chat_stream():
     from models import ChatMessage
     since_id = int(request.args.get("since", "0"))
-    q = ChatMessage.query
+    q = ChatMessage.query.options(joinedload(ChatMessage.user))
     if since_id:
         q = q.filter(ChatMessage.id > since_id)
     new_msgs = q.order_by(ChatMessage.id.asc()).limit(100).all()
@@ -554,6 +627,7 @@ def admin_heatmap():
 
 @app.route("/leaderboard")
 @login_required
+@read_replica
 def leaderboard():
     top_users = User.query.order_by(User.points.desc(), User.username.asc()).limit(50).all()
     my_rank = None
@@ -564,6 +638,7 @@ def leaderboard():
 
 @app.route("/u/<int:uid>")
 @login_required
+@read_replica
 def public_profile(uid):
     u = User.query.get_or_404(uid)
     # Aggregate stats for this user
@@ -579,6 +654,7 @@ def public_profile(uid):
 # ---- Profile & history ----
 @app.route("/profile", methods=["GET", "POST"])
 @login_required
+@read_replica
 def profile():
     # Basic stats
     total = Submission.query.filter_by(user_id=current_user.id).count()
@@ -612,6 +688,7 @@ def profile():
 
 @app.route("/history")
 @login_required
+@read_replica
 def my_history():
     tab = (request.args.get("tab") or "all").lower()
     q = Submission.query.filter_by(user_id=current_user.id)
@@ -624,6 +701,77 @@ def my_history():
     rows = q.order_by(Submission.created_at.desc()).limit(200).all()
     return render_template("history.html", rows=rows, tab=tab)
 
+@app.route("/admin/verifier/stats")
+@login_required
+@admin_required
+def admin_verifier_stats():
+    return jsonify({
+        "model_kind": verifier.model_kind,
+        "model_version": verifier.model_version,
+        "ensemble_heuristic_w": verifier.ensemble_w,
+        "loaded": verifier._loaded,
+        "cache": verifier.cache_stats(),
+        "shadow": shadow.status(),
+        "registry": registry.status(),
+    })
+
+@app.route("/admin/verifier/reload", methods=["POST"])
+@login_required
+@admin_required
+def admin_verifier_reload():
+    """
+    Hot-swap the model: this worker now, the others through the .reload token.
+    Optional model_path (inside the model directory), model_version, class_map_path.
+    """
+    data = request.get_json(silent=True) or request.form
+    result = registry.reload_all(
+        model_path=(data.get("model_path") or "").strip() or None,
+        model_version=(data.get("model_version") or "").strip() or None,
+        class_map_path=(data.get("class_map_path") or "").strip() or None,
+    )
+    return jsonify(result), (200 if result.get("ok") else 409)
+
+@app.route("/admin/verifier/shadow")
+@login_required
+@admin_required
+def admin_verifier_shadow():
+    """Shadow vs production agreement per model pair, plus the latest disagreements."""
+    limit = max(1, min(int(request.args.get("limit", 50)), 500))
+    stats = ShadowStat.query.order_by(ShadowStat.last_at.desc()).all()
+    q = ShadowScore.query.filter(ShadowScore.agree.is_(False))
+    if request.args.get("model_version"):
+        q = q.filter(ShadowScore.model_version == request.args["model_version"])
+    rows = q.order_by(ShadowScore.id.desc()).limit(limit).all()
+    return jsonify({
+        "runner": shadow.status(),
+        "pairs": [shadow_summary(st) for st in stats],
+        "disagreements": [{
+            "submission_id": r.submission_id, "model_version": r.model_version,
+            "status": r.status, "action_score": r.action_score,
+            "prod_status": r.prod_status, "prod_action_score": r.prod_action_score,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+        } for r in rows],
+    })
+
+@app.route("/admin/profiles")
+@login_required
+@admin_required
+def admin_profiles():
+    rows = profiling.recent(limit=int(request.args.get("limit", 100)))
+    if request.args.get("format") == "json":
+        return jsonify(rows)
+    return render_template("admin_profiles.html", rows=rows, sample_rate=profiling.SAMPLE_RATE,
+                           slow_ms=profiling.SLOW_MS, profile_dir=str(profiling.PROFILE_DIR))
+
+@app.route("/admin/profiles/<path:name>")
+@login_required
+@admin_required
+def admin_profile_file(name):
+    p = profiling.profile_path(name)
+    if p is None:
+        abort(404)
+    return send_file(p, as_attachment=True, download_name=p.name)
+
 # Admin: manage users quickly
 @app.route("/admin/users")
 @login_required
@@ -673,8 +821,20 @@ try:
 except Exception as e:
     print("[WARN] SUPW blueprint not registered:", repr(e))
 
+try:
+    from routes.events_api import bp_events
+    app.register_blueprint(bp_events)
+except Exception as e:
+    print("[WARN] events blueprint not registered:", repr(e))
+
+try:
+    from routes.cleanup import bp_cleanup
+    app.register_blueprint(bp_cleanup)
+except Exception as e:
+    print("[WARN] cleanup blueprint not registered:", repr(e))
+
 if __name__ == "__main__":
+    warm_up()
     with app.app_context():
-        db.create_all()
         print("[INFO] Using SQLALCHEMY_DATABASE_URI=", app.config.get("SQLALCHEMY_DATABASE_URI"))
     app.run(debug=True, use_reloader=False)
@@ -0,0 +1,67 @@
+# bench/common.py — timing helpers and JSON result files shared by the benchmarks
+import json, os, platform, statistics, subprocess, sys, time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = ROOT / "bench" / "results"
+
+def pct(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+def summarize(seconds):
+    """Per-call timings (seconds) -> stats in milliseconds."""
+    s = sorted(seconds)
+    if not s:
+        return {"n": 0}
+    return {
+        "n": len(s),
+        "min_ms": round(s[0] * 1000, 4),
+        "p50_ms": round(pct(s, 50) * 1000, 4),
+        "p95_ms": round(pct(s, 95) * 1000, 4),
+        "p99_ms": round(pct(s, 99) * 1000, 4),
+        "mean_ms": round(statistics.fmean(s) * 1000, 4),
+        "max_ms": round(s[-1] * 1000, 4),
+    }
+
+def time_calls(fn, repeat=50, warmup=3, min_time_s=0.0):
+    """Call fn() `warmup` times, then at least `repeat` times (and min_time_s); per-call seconds."""
+    for _ in range(warmup):
+        fn()
+    out = []
+    t_end = time.perf_counter() + min_time_s
+    while len(out) < repeat or time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT),
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def environment():
+    return {
+        "git": _git_rev(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+
+def write_results(kind, results, out=None, params=None):
+    """Write {"kind", "env", "params", "results"} to `out` (default bench/results/<kind>-<time>.json)."""
+    doc = {"kind": kind, "env": environment(), "params": params or {}, "results": results}
+    if out is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        out = RESULTS_DIR / f"{kind}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    print(f"[BENCH] results written to {out}")
+    return out
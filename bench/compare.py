@@ -0,0 +1,36 @@
+# bench/compare.py — compare two benchmark result files (p50/p95, old -> new)
+#
+# Usage:
+#   python bench/compare.py bench/results/micro-A.json bench/results/micro-B.json
+import argparse, json
+
+def _flatten(doc):
+    """-> {label: stats} for micro ({name: stats}) and macro ([{rows, endpoints}]) results."""
+    res = doc["results"]
+    if isinstance(res, dict):
+        return res
+    return {f"{name}@{r['rows']}": stats for r in res for name, stats in r["endpoints"].items()}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p50_ms")
+    args = parser.parse_args()
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    a, b = _flatten(old), _flatten(new)
+    print(f"{old['env'].get('git')} -> {new['env'].get('git')} ({args.metric})")
+    for label in sorted(set(a) | set(b)):
+        va, vb = a.get(label, {}).get(args.metric), b.get(label, {}).get(args.metric)
+        if va is None or vb is None:
+            print(f"  {label:32s} {va!s:>10} -> {vb!s:>10}")
+            continue
+        change = (vb - va) / va * 100 if va else 0.0
+        print(f"  {label:32s} {va:10.3f} -> {vb:10.3f}  {change:+6.1f}%")
+
+if __name__ == "__main__":
+    main()
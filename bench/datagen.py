@@ -0,0 +1,221 @@
+# bench/datagen.py — synthetic users, submissions and photos for the benchmarks
+#
+# Submissions are spread like real reports: most around the towns (Thimphu
+# weighted highest), a share piled onto a few dump sites per town, a
+# year of history, ~60% AUTO_OK. Everything is seeded, so the same arguments
+# always give the same database.
+#
+# Usage:
+#   python bench/datagen.py --db sqlite:////tmp/pv_bench_100k.db --users 2000 --submissions 100000
+#   python bench/datagen.py --images /tmp/pv_bench_images --count 50
+import argparse, io, os, random, sys, time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# (name, lat, lon, weight, spread in degrees)
+TOWNS = [
+    ("thimphu",         27.4728, 89.6390, 0.40, 0.020),
+    ("phuentsholing",   26.8516, 89.3883, 0.12, 0.012),
+    ("paro",            27.4305, 89.4133, 0.10, 0.015),
+    ("gelephu",         26.8702, 90.4853, 0.07, 0.012),
+    ("punakha",         27.5921, 89.8797, 0.06, 0.012),
+    ("wangdue",         27.4860, 89.8992, 0.05, 0.010),
+    ("samdrup_jongkhar", 26.8007, 91.5050, 0.05, 0.010),
+    ("bumthang",        27.5492, 90.7525, 0.05, 0.012),
+    ("mongar",          27.2747, 91.2396, 0.05, 0.010),
+    ("trashigang",      27.3333, 91.5528, 0.05, 0.010),
+]
+REPORT_TYPES = [("illegal_dumping", 0.55), ("dirty_area", 0.30), ("volunteer_works", 0.15)]
+DUMP_SITES_PER_TOWN = 6
+DUMP_SHARE = 0.35          # share of reports that land on a known dump site
+BENCH_PASSWORD = "bench-pass"
+
+class PointSampler:
+    def __init__(self, rnd):
+        self.rnd = rnd
+        self.weights = [t[3] for t in TOWNS]
+        self.sites = {t[0]: [(rnd.gauss(t[1], t[4]), rnd.gauss(t[2], t[4])) for _ in range(DUMP_SITES_PER_TOWN)]
+                      for t in TOWNS}
+
+    def point(self):
+        name, lat, lon, _, spread = self.rnd.choices(TOWNS, weights=self.weights)[0]
+        if self.rnd.random() < DUMP_SHARE:
+            slat, slon = self.rnd.choice(self.sites[name])
+            return slat + self.rnd.gauss(0, 0.0003), slon + self.rnd.gauss(0, 0.0003)   # ~30 m
+        return self.rnd.gauss(lat, spread), self.rnd.gauss(lon, spread)
+
+def _weighted(rnd, pairs):
+    return rnd.choices([p[0] for p in pairs], weights=[p[1] for p in pairs])[0]
+
+def _gps_ifd(lat, lon):
+    import piexif
+    def dms(v):
+        v = abs(v)
+        d = int(v)
+        m = int((v - d) * 60)
+        s = round(((v - d) * 60 - m) * 60 * 100)
+        return ((d, 1), (m, 1), (s, 100))
+    return {
+        piexif.GPSIFD.GPSLatitudeRef: b"N" if lat >= 0 else b"S",
+        piexif.GPSIFD.GPSLatitude: dms(lat),
+        piexif.GPSIFD.GPSLongitudeRef: b"E" if lon >= 0 else b"W",
+        piexif.GPSIFD.GPSLongitude: dms(lon),
+    }
+
+def make_jpeg(seed, size=640, lat=None, lon=None, when=None):
+    """A textured JPEG (distinct phash per seed) with EXIF time and, optionally, GPS."""
+    import piexif
+    from PIL import Image, ImageDraw
+    rnd = random.Random(seed)
+    img = Image.new("RGB", (size, size), (rnd.randrange(60, 200),) * 3)
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):   # rubbish-like blobs
+        x, y, r = rnd.randrange(size), rnd.randrange(size), rnd.randrange(8, size // 6)
+        draw.ellipse((x - r, y - r, x + r, y + r),
+                     fill=(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+    when = when or datetime.utcnow()
+    exif = {"Exif": {piexif.ExifIFD.DateTimeOriginal: when.strftime("%Y:%m:%d %H:%M:%S").encode()}}
+    if lat is not None and lon is not None:
+        exif["GPS"] = _gps_ifd(lat, lon)
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=85, exif=piexif.dump(exif))
+    return buf.getvalue()
+
+def write_images(directory, count, seed=0):
+    """count JPEGs in `directory` (kept if already there); returns their paths."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rnd = random.Random(seed)
+    points = PointSampler(rnd)
+    paths = []
+    for i in range(count):
+        p = directory / f"bench_{seed}_{i}.jpg"
+        if not p.exists():
+            lat, lon = points.point()
+            p.write_bytes(make_jpeg(seed * 100_000 + i, lat=lat, lon=lon))
+        paths.append(str(p))
+    return paths
+
+def populate(db, n_users, n_submissions, seed=0, days=365, chunk=10_000, progress=True):
+    """
+    Insert n_users users (plus bench-admin / bench-user, password BENCH_PASSWORD)
+    and n_submissions submissions with bulk INSERTs. Call inside an app context.
+    """
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from models import User, Submission
+    from geo.dzongkhags import get_resolver
+
+    rnd = random.Random(seed)
+    resolver = get_resolver()
+    now = datetime.utcnow()
+    t0 = time.time()
+
+    pw = generate_password_hash(BENCH_PASSWORD)
+    db.session.execute(insert(User), [
+        {"username": "bench-admin", "email": "bench-admin@bench.local", "password_hash": pw, "role": "admin",
+         "points": 0, "created_at": now},
+        {"username": "bench-user", "email": "bench-user@bench.local", "password_hash": pw, "role": "user",
+         "points": 0, "created_at": now},
+    ])
+    for start in range(0, n_users, chunk):
+        db.session.execute(insert(User), [
+            {"username": f"citizen{i}", "email": f"citizen{i}@bench.local", "password_hash": "!",
+             "role": "user", "points": rnd.randrange(0, 500), "created_at": now - timedelta(days=rnd.uniform(0, days))}
+            for i in range(start, min(n_users, start + chunk))
+        ])
+    db.session.commit()
+    first_user = db.session.query(User.id).filter_by(username="bench-admin").scalar()
+    user_ids = list(range(first_user, first_user + n_users + 2))
+
+    points = PointSampler(rnd)
+    for start in range(0, n_submissions, chunk):
+        rows = []
+        for i in range(start, min(n_submissions, start + chunk)):
+            lat, lon = points.point()
+            dz, zone = resolver.lookup(lat, lon)
+            ok = rnd.random() < 0.6
+            score = rnd.uniform(0.5, 0.95) if ok else rnd.uniform(0.1, 0.5)
+            human = _weighted(rnd, [("unreviewed", 0.7), ("approved", 0.2), ("rejected", 0.07), ("flagged", 0.03)])
+            created = now - timedelta(days=days * rnd.random() ** 1.5)   # more recent than old
+            rows.append({
+                "user_id": rnd.choice(user_ids), "report_type": _weighted(rnd, REPORT_TYPES),
+                "image_path": f"static/uploads/bench_{i}.jpg", "lat": lat, "lon": lon,
+                "dzongkhag": dz, "zone": zone, "reporter_location": "at_place",
+                "ai_label": "valid_report" if ok else "invalid", "ai_score": score, "action_score": score,
+                "status": "AUTO_OK" if ok else "RECHECK", "phash": f"{rnd.getrandbits(64):016x}",
+                "exif_time_ok": rnd.random() < 0.8, "auth_score": 0.6, "relevance_score": score,
+                "model_version": "bench", "created_at": created, "human_state": human,
+                "points_awarded": 10 if ok else 0, "approved_at": created if ok else None,
+            })
+        db.session.execute(insert(Submission), rows)
+        db.session.commit()
+        if progress:
+            done = min(n_submissions, start + chunk)
+            print(f"\r[DATAGEN] {done}/{n_submissions} submissions ({time.time() - t0:.1f}s)",
+                  end="", file=sys.stderr, flush=True)
+    if progress and n_submissions:
+        print(file=sys.stderr)
+
+def build_database(db_url, n_users, n_submissions, seed=0, reuse=True):
+    """Create (or reuse) a benchmark database; the app must not be imported yet."""
+    os.environ["DATABASE_URL"] = db_url
+    os.environ.setdefault("RATELIMIT_ENABLED", "0")
+    from app import app, db, init_db
+    from models import Submission
+
+    with app.app_context():
+        if reuse:
+            init_db()
+            try:
+                if db.session.query(Submission.id).count() == n_submissions:
+                    return app, db
+            except Exception:
+                db.session.rollback()
+        db.drop_all()
+        db.create_all()
+        populate(db, n_users, n_submissions, seed=seed)
+    return app, db
+
+def drop_uploads(app, db):
+    """Delete submissions (and their files) added on top of the generated ones, e.g. by benchmark uploads."""
+    from models import Message, Submission
+    with app.app_context():
+        added = Submission.query.filter(Submission.model_version != "bench").all()
+        for s in added:
+            p = Path(app.root_path) / s.image_path
+            if p.is_file():
+                p.unlink()
+        ids = [s.id for s in added]
+        if ids:
+            Message.query.filter(Message.submission_id.in_(ids)).delete(synchronize_session=False)
+            Submission.query.filter(Submission.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+    return len(added)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="DATABASE_URL to (re)create and fill")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--submissions", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--images", help="also write --count JPEGs (EXIF time + GPS) to this directory")
+    parser.add_argument("--count", type=int, default=20)
+    args = parser.parse_args()
+    if not (args.db or args.images):
+        parser.error("give --db and/or --images")
+
+    if args.images:
+        paths = write_images(args.images, args.count, seed=args.seed)
+        print(f"{len(paths)} image(s) in {args.images}")
+    if args.db:
+        t0 = time.time()
+        build_database(args.db, args.users, args.submissions, seed=args.seed, reuse=False)
+        print(f"{args.users} user(s), {args.submissions} submission(s) in {args.db} ({time.time() - t0:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# bench/loadtest.py — mixed-traffic load test: simulated citizens and moderators
+#
+# Each virtual user is a thread with its own session, looping over weighted
+# actions with --think-ms between them:
+#   citizen    upload a photo, poll its result page, open the public map,
+#              poll the chat, post to the chat, look at their history
+#   moderator  open the review queue, approve/reject a report, look at the
+#              tile map   (one user in --moderator-every is a moderator)
+# Concurrency is stepped through --steps, --duration seconds each. Every step
+# reports per-route p50/p95/p99 and error rate. The "knee" is the last step
+# before throughput stops growing (< --knee-gain) or errors pass --max-error-rate.
+#
+# In-process (default): builds a seeded database with bench/datagen.py and
+# drives the app through one test client per user. Use --db for SQLite or
+# Postgres. Everything runs in one process, so the GIL caps throughput here;
+# for real numbers point --url at gunicorn on localhost (started with
+# RATELIMIT_ENABLED=0) and create the accounts first:
+#   python bench/loadtest.py --db sqlite:////tmp/pv_load.db --steps 1,2,4,8,16
+#   python bench/loadtest.py --db postgresql+psycopg://pv:pv@localhost/pv_load
+#   python bench/loadtest.py --url http://127.0.0.1:8000 --user alice --admin-user admin --password secret
+import argparse, io, os, random, re, sys, tempfile, threading, time, uuid
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.common import pct, write_results
+from bench.datagen import BENCH_PASSWORD, PointSampler, write_images
+
+CITIZEN_MIX = [("upload", 10), ("poll_result", 25), ("public_map", 20), ("chat_poll", 30),
+               ("chat_post", 3), ("history", 12)]
+MODERATOR_MIX = [("review_queue", 40), ("decide", 30), ("tiles_map", 30)]
+SID_RE = re.compile(r"/result/(\d+)")
+CHAT_ID_RE = re.compile(r'data-id="(\d+)"')
+
+# ---- sessions ----
+class LocalSession:
+    def __init__(self, app, username, password):
+        self.c = app.test_client()
+        status, _ = self.post("/login", {"identifier": username, "password": password})
+        if status not in (200, 302):
+            raise RuntimeError(f"login as {username} failed: {status}")
+
+    def get(self, path):
+        r = self.c.get(path)
+        return r.status_code, r.get_data(as_text=True)
+
+    def post(self, path, data, files=None):
+        data = dict(data)
+        for k, (fname, blob) in (files or {}).items():
+            data[k] = (io.BytesIO(blob), fname)
+        r = self.c.post(path, data=data, content_type="multipart/form-data" if files else None)
+        return r.status_code, r.get_data(as_text=True)
+
+class HttpSession:
+    """stdlib only; keeps cookies, never follows redirects."""
+
+    def __init__(self, base, username, password):
+        import urllib.request, http.cookiejar
+
+        class _NoRedirect(urllib.request.HTTPRedirectHandler):
+            def redirect_request(self, *a, **kw):
+                return None
+
+        self.base = base.rstrip("/")
+        self.urlreq = urllib.request
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+        status, _ = self.post("/login", {"identifier": username, "password": password})
+        if status not in (200, 302):
+            raise RuntimeError(f"login as {username} failed: {status}")
+
+    def _open(self, req):
+        try:
+            with self.opener.open(req, timeout=60) as r:
+                return r.status, r.read().decode("utf-8", "replace")
+        except self.urlreq.HTTPError as e:
+            return e.code, e.read().decode("utf-8", "replace")
+
+    def get(self, path):
+        return self._open(self.urlreq.Request(self.base + path))
+
+    def post(self, path, data, files=None):
+        boundary = uuid.uuid4().hex
+        parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+                 for k, v in data.items()]
+        for k, (fname, blob) in (files or {}).items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"; filename="{fname}"\r\n'
+                         f"Content-Type: image/jpeg\r\n\r\n".encode() + blob + b"\r\n")
+        parts.append(f"--{boundary}--\r\n".encode())
+        return self._open(self.urlreq.Request(
+            self.base + path, data=b"".join(parts), method="POST",
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}))
+
+# ---- virtual users ----
+class Shared:
+    """State all users see: photos, recent submission ids for moderators."""
+
+    def __init__(self, photos, max_sid):
+        self.photos = photos
+        self.lock = threading.Lock()
+        self.recent = [max_sid] if max_sid else []
+
+    def add_sid(self, sid):
+        with self.lock:
+            self.recent.append(sid)
+            del self.recent[:-500]
+
+    def some_sid(self, rnd):
+        with self.lock:
+            return rnd.choice(self.recent) if self.recent else None
+
+class VirtualUser:
+    def __init__(self, session, moderator, shared, seed):
+        self.s = session
+        self.moderator = moderator
+        self.shared = shared
+        self.rnd = random.Random(seed)
+        self.points = PointSampler(self.rnd)
+        self.my_sid = None
+        self.chat_since = 0
+        mix = MODERATOR_MIX if moderator else CITIZEN_MIX
+        self.actions = [a for a, _ in mix]
+        self.weights = [w for _, w in mix]
+
+    def step(self):
+        """Run one weighted action -> (route, status)."""
+        action = self.rnd.choices(self.actions, weights=self.weights)[0]
+        if action == "poll_result" and self.my_sid is None:
+            action = "upload"
+        return action, getattr(self, "_" + action)()
+
+    def _upload(self):
+        lat, lon = self.points.point()
+        status, body = self.s.post("/upload_api", {
+            "report_type": self.rnd.choice(["illegal_dumping", "dirty_area"]),
+            "reporter_location": "at_place", "lat": f"{lat:.6f}", "lon": f"{lon:.6f}", "message": "",
+        }, files={"photo": ("load.jpg", self.rnd.choice(self.shared.photos))})
+        m = SID_RE.search(body or "")
+        if status == 200 and m:
+            self.my_sid = int(m.group(1))
+            self.shared.add_sid(self.my_sid)
+        return status
+
+    def _poll_result(self):
+        return self.s.get(f"/result/{self.my_sid}")[0]
+
+    def _public_map(self):
+        return self.s.get("/api/v1/public_hotspots")[0]
+
+    def _chat_poll(self):
+        status, body = self.s.get(f"/chat/stream?since={self.chat_since}")
+        ids = CHAT_ID_RE.findall(body or "")
+        if ids:
+            self.chat_since = int(ids[-1])
+        return status
+
+    def _chat_post(self):
+        return self.s.post("/chat", {"body": f"load test {self.rnd.randrange(10**6)}"})[0]
+
+    def _history(self):
+        return self.s.get("/history")[0]
+
+    def _review_queue(self):
+        return self.s.get("/admin/review")[0]
+
+    def _decide(self):
+        sid = self.shared.some_sid(self.rnd)
+        if sid is None:
+            return self._review_queue()
+        decision = self.rnd.choice(["approve", "approve", "reject"])
+        return self.s.post(f"/admin/review/decide/{sid}/{decision}", {})[0]
+
+    def _tiles_map(self):
+        return self.s.get("/api/v1/tiles_buckets?days=14")[0]
+
+# ---- driver ----
+def run_step(users, duration, think_s):
+    samples = []          # (route, seconds, ok)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    start = threading.Barrier(len(users))
+
+    def loop(u):
+        local = []
+        start.wait()
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                route, status = u.step()
+                ok = status is not None and status < 400
+            except Exception:
+                route, ok = "exception", False
+            local.append((route, time.perf_counter() - t0, ok))
+            if think_s:
+                time.sleep(u.rnd.expovariate(1.0 / think_s))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=loop, args=(u,)) for u in users]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    routes = defaultdict(list)
+    errors = defaultdict(int)
+    for route, dt, ok in samples:
+        routes[route].append(dt)
+        errors[route] += 0 if ok else 1
+    all_lat = sorted(dt for _, dt, _ in samples)
+    out = {
+        "users": len(users),
+        "requests": len(samples),
+        "rps": round(len(samples) / wall, 2) if wall else 0.0,
+        "error_rate": round(sum(errors.values()) / len(samples), 4) if samples else 0.0,
+        "p50_ms": round(pct(all_lat, 50) * 1000, 1),
+        "p95_ms": round(pct(all_lat, 95) * 1000, 1),
+        "p99_ms": round(pct(all_lat, 99) * 1000, 1),
+        "routes": {},
+    }
+    for route, lat in sorted(routes.items()):
+        lat.sort()
+        out["routes"][route] = {
+            "n": len(lat), "error_rate": round(errors[route] / len(lat), 4),
+            "p50_ms": round(pct(lat, 50) * 1000, 1), "p95_ms": round(pct(lat, 95) * 1000, 1),
+            "p99_ms": round(pct(lat, 99) * 1000, 1),
+        }
+    return out
+
+def find_knee(steps, min_gain, max_error_rate):
+    """Last step whose throughput still grew by >= min_gain over the previous one, with few errors."""
+    knee = None
+    for prev, cur in zip([None] + steps[:-1], steps):
+        if cur["error_rate"] > max_error_rate:
+            break
+        if prev is not None and cur["rps"] < prev["rps"] * (1 + min_gain):
+            break
+        knee = cur
+    return knee and {k: knee[k] for k in ("users", "rps", "p50_ms", "p95_ms", "p99_ms", "error_rate")}
+
+def _local_setup(args):
+    from bench.datagen import build_database
+    os.environ["RATELIMIT_ENABLED"] = "0"
+    os.environ["PV_SCORE_CACHE_PATH"] = ""
+    app, db = build_database(args.db, max(100, args.rows // 50), args.rows)
+    from models import Submission
+    with app.app_context():
+        max_sid = db.session.query(Submission.id).order_by(Submission.id.desc()).limit(1).scalar()
+    make = lambda moderator: LocalSession(app, "bench-admin" if moderator else "bench-user", BENCH_PASSWORD)
+    return make, max_sid, (app, db)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="load a running server on localhost instead of the in-process app")
+    parser.add_argument("--db", default=f"sqlite:///{Path(tempfile.gettempdir(), 'pv_load.db').as_posix()}",
+                        help="in-process DATABASE_URL (SQLite or Postgres)")
+    parser.add_argument("--rows", type=int, default=10_000, help="in-process: synthetic submissions to start with")
+    parser.add_argument("--user", default="bench-user", help="--url: citizen account")
+    parser.add_argument("--admin-user", default="bench-admin", help="--url: moderator account")
+    parser.add_argument("--password", default=BENCH_PASSWORD)
+    parser.add_argument("--steps", default="1,2,4,8,16,32", help="concurrent users per step")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    parser.add_argument("--think-ms", type=float, default=100.0, help="mean pause between a user's actions")
+    parser.add_argument("--moderator-every", type=int, default=10, help="one moderator per N users")
+    parser.add_argument("--knee-gain", type=float, default=0.10, help="throughput growth that still counts")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--out", help="JSON result file (default bench/results/loadtest-<time>.json)")
+    args = parser.parse_args()
+
+    local = None
+    if args.url:
+        make = lambda moderator: HttpSession(args.url, args.admin_user if moderator else args.user, args.password)
+        max_sid = None
+    else:
+        make, max_sid, local = _local_setup(args)
+
+    photos = [Path(p).read_bytes() for p in write_images(Path(tempfile.gettempdir()) / "pv_bench_images", 10)]
+    shared = Shared(photos, max_sid)
+
+    steps = []
+    try:
+        for n in (int(x) for x in args.steps.split(",") if x.strip()):
+            users = []
+            for i in range(n):
+                moderator = i % args.moderator_every == args.moderator_every - 1
+                users.append(VirtualUser(make(moderator), moderator, shared, seed=i))
+            res = run_step(users, args.duration, args.think_ms / 1000.0)
+            steps.append(res)
+            print(f"{n:4d} users: {res['rps']:8.1f} req/s  p50 {res['p50_ms']:7.1f}  p95 {res['p95_ms']:7.1f}  "
+                  f"p99 {res['p99_ms']:7.1f} ms  errors {res['error_rate'] * 100:.2f}%")
+            for route, r in res["routes"].items():
+                print(f"        {route:14s} n={r['n']:6d}  p50 {r['p50_ms']:7.1f}  p95 {r['p95_ms']:7.1f}  "
+                      f"p99 {r['p99_ms']:7.1f} ms  errors {r['error_rate'] * 100:.2f}%")
+    finally:
+        if local is not None:
+            from bench.datagen import drop_uploads
+            drop_uploads(*local)
+
+    knee = find_knee(steps, args.knee_gain, args.max_error_rate)
+    if knee:
+        print(f"knee: {knee['users']} users at {knee['rps']} req/s (p95 {knee['p95_ms']} ms)")
+    else:
+        print("knee: not reached a stable step (errors at the first step?)")
+    write_results("loadtest", {"steps": steps, "knee": knee}, out=args.out,
+                  params={k: v for k, v in vars(args).items() if k not in ("password", "out")})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# bench/macro.py — endpoint benchmarks through the Flask test client at several data sizes
+#
+# For each --scales N a database with N synthetic submissions is built (and
+# reused on later runs, see bench/datagen.py), then each endpoint is timed as
+# an admin: latency percentiles plus SQL statements per request (X-Query-Count).
+# Every scale runs in its own process, because app.py binds DATABASE_URL at import.
+#
+# Usage:
+#   python bench/macro.py                                  # 10k and 100k
+#   python bench/macro.py --scales 10000,100000,1000000 --repeat 5
+#   python bench/macro.py --db-template postgresql+psycopg://pv:pv@localhost/pv_bench_{n}
+import argparse, io, json, os, subprocess, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.common import summarize, write_results
+
+ENDPOINTS = [
+    ("tiles_buckets", "/api/v1/tiles_buckets?days=30"),
+    ("heat_points", "/api/v1/heat_points?days=30"),
+    ("leaderboard", "/leaderboard"),
+    ("admin_review", "/admin/review"),
+]
+DEFAULT_DB_TEMPLATE = f"sqlite:///{Path(tempfile.gettempdir(), 'pv_bench_{n}.db').as_posix()}"
+
+def _time_get(client, url, repeat):
+    times, queries, status = [], [], None
+    client.get(url)   # warm caches / first-request setup
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        r = client.get(url)
+        times.append(time.perf_counter() - t0)
+        status = r.status_code
+        queries.append(int(r.headers.get("X-Query-Count", 0)))
+    return {**summarize(times), "status": status, "queries": max(queries) if queries else None}
+
+def _time_uploads(client, paths, count):
+    times, queries, statuses = [], [], set()
+    for i in range(count):
+        with open(paths[i % len(paths)], "rb") as f:
+            data = {"photo": (io.BytesIO(f.read()), f"bench_{i}.jpg"), "report_type": "illegal_dumping",
+                    "reporter_location": "at_place", "lat": "27.4728", "lon": "89.6390", "message": ""}
+        t0 = time.perf_counter()
+        r = client.post("/upload_api", data=data, content_type="multipart/form-data")
+        times.append(time.perf_counter() - t0)
+        statuses.add(r.status_code)
+        queries.append(int(r.headers.get("X-Query-Count", 0)))
+    return {**summarize(times), "status": sorted(statuses), "queries": max(queries) if queries else None}
+
+def _login(app, username):
+    from bench.datagen import BENCH_PASSWORD
+    c = app.test_client()
+    r = c.post("/login", data={"identifier": username, "password": BENCH_PASSWORD})
+    if r.status_code not in (200, 302):
+        raise RuntimeError(f"login as {username} failed: {r.status_code}")
+    return c
+
+def run_scale(n, db_url, repeat, uploads):
+    """Child process: build/reuse the DB for n rows and time every endpoint."""
+    os.environ["PV_QUERY_COUNT"] = "1"
+    os.environ["RATELIMIT_ENABLED"] = "0"
+    os.environ["PV_SCORE_CACHE_PATH"] = ""
+    from bench.datagen import build_database, drop_uploads, write_images
+
+    t0 = time.time()
+    app, db = build_database(db_url, max(100, n // 50), n)
+    build_s = time.time() - t0
+
+    admin = _login(app, "bench-admin")
+    out = {"rows": n, "db": db_url.split("@")[-1], "build_s": round(build_s, 1), "endpoints": {}}
+    for name, url in ENDPOINTS:
+        out["endpoints"][name] = _time_get(admin, url, repeat)
+
+    if uploads:
+        paths = write_images(Path(tempfile.gettempdir()) / "pv_bench_images", 10)
+        out["endpoints"]["upload_api"] = _time_uploads(_login(app, "bench-user"), paths, uploads)
+        drop_uploads(app, db)   # so the next run starts from the same N rows
+    return out
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="10000,100000", help="comma separated submission counts")
+    parser.add_argument("--repeat", type=int, default=10, help="timed requests per endpoint")
+    parser.add_argument("--uploads", type=int, default=20, help="timed POST /upload_api (0 to skip)")
+    parser.add_argument("--db-template", default=DEFAULT_DB_TEMPLATE, help="DATABASE_URL with {n} for the size")
+    parser.add_argument("--out", help="JSON result file (default bench/results/macro-<time>.json)")
+    parser.add_argument("--scale", type=int, help=argparse.SUPPRESS)   # child mode
+    args = parser.parse_args()
+
+    if args.scale is not None:
+        print(json.dumps(run_scale(args.scale, args.db_template.format(n=args.scale), args.repeat, args.uploads)))
+        return
+
+    results = []
+    for n in (int(x) for x in args.scales.split(",") if x.strip()):
+        print(f"[BENCH] {n} rows ...", flush=True)
+        proc = subprocess.run(
+            [sys.executable, __file__, "--scale", str(n), "--repeat", str(args.repeat),
+             "--uploads", str(args.uploads), "--db-template", args.db_template],
+            cwd=str(ROOT), capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(proc.stderr[-2000:], file=sys.stderr)
+            raise SystemExit(f"scale {n} failed")
+        res = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(res)
+        for name, r in res["endpoints"].items():
+            print(f"  {name:14s} p50 {r['p50_ms']:9.2f} ms   p95 {r['p95_ms']:9.2f} ms   "
+                  f"{r['queries']} queries   status {r['status']}")
+
+    write_results("macro", results, out=args.out,
+                  params={"scales": args.scales, "repeat": args.repeat, "uploads": args.uploads})
+
+if __name__ == "__main__":
+    main()
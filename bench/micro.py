@@ -0,0 +1,72 @@
+# bench/micro.py — micro-benchmarks for the per-upload hot path and map binning
+#
+#   Verifier.score              full scoring of one photo (score cache off)
+#   simple_relevance_heuristic  the no-model relevance fallback
+#   compute_phash               perceptual hash
+#   extract_gps                 EXIF GPS read (app.py)
+#   _aggregate_round            hotspot binning of --rows points (routes/hotspots.py)
+#
+# Usage:
+#   python bench/micro.py
+#   python bench/micro.py --repeat 200 --rows 100000 --out micro.json
+import argparse, itertools, os, random, sys, tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.common import summarize, time_calls, write_results
+from bench.datagen import PointSampler, write_images
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--images", type=int, default=10, help="distinct photos to cycle through")
+    parser.add_argument("--rows", type=int, default=10_000, help="points for _aggregate_round")
+    parser.add_argument("--only", help="comma separated benchmark names")
+    parser.add_argument("--out", help="JSON result file (default bench/results/micro-<time>.json)")
+    args = parser.parse_args()
+
+    # importing app must never touch a real database
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.gettempdir(), 'pv_bench_micro.db').as_posix()}")
+    os.environ["PV_SCORE_CACHE_PATH"] = ""   # measure the work, not cache hits
+    from ai.verifier import Verifier, simple_relevance_heuristic, compute_phash
+    from app import extract_gps
+    from routes.hotspots import _aggregate_round
+
+    paths = write_images(Path(tempfile.gettempdir()) / "pv_bench_images", args.images)
+    photos = itertools.cycle(paths)
+    nxt = lambda: next(photos)
+
+    verifier = Verifier(score_cache="").load()
+    existing = [(i, f"{random.Random(i).getrandbits(64):016x}") for i in range(200)]
+    rnd = random.Random(0)
+    sampler = PointSampler(rnd)
+    rows = [SimpleNamespace(lat=la, lon=lo) for la, lo in (sampler.point() for _ in range(args.rows))]
+
+    benches = {
+        "verifier_score": lambda: verifier.score(nxt(), existing_phashes=existing),
+        "simple_relevance_heuristic": lambda: simple_relevance_heuristic(nxt()),
+        "compute_phash": lambda: compute_phash(nxt()),
+        "extract_gps": lambda: extract_gps(nxt()),
+        "aggregate_round": lambda: _aggregate_round(rows, decimals=3),
+    }
+    only = set(args.only.split(",")) if args.only else None
+
+    results = {}
+    for name, fn in benches.items():
+        if only and name not in only:
+            continue
+        repeat = max(5, args.repeat // 5) if name == "aggregate_round" else args.repeat
+        results[name] = summarize(time_calls(fn, repeat=repeat))
+        r = results[name]
+        print(f"{name:28s} p50 {r['p50_ms']:9.3f} ms   p95 {r['p95_ms']:9.3f} ms   (n={r['n']})")
+
+    write_results("micro", results, out=args.out,
+                  params={"repeat": args.repeat, "images": args.images, "rows": args.rows,
+                          "model_kind": verifier.model_kind})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# db_profile.py
+# ======================================================
+# SQLAlchemy engine profiles (pool + per-connection settings)
+# ======================================================
+# Selected by PV_DB_PROFILE (default "auto" = pick by DATABASE_URL scheme):
+#   sqlite    WAL journal, busy_timeout, synchronous=NORMAL, mmap + page cache,
+#             so concurrent uploads don't fail with "database is locked"
+#   postgres  sized pool with pre-ping/recycle and a server-side statement_timeout
+#   none      SQLAlchemy defaults (the old behaviour)
+#
+# app.py puts engine_options() into SQLALCHEMY_ENGINE_OPTIONS before
+# db.init_app() and calls install() right after it.
+#
+# Read replica (optional): DATABASE_READ_URL becomes the "replica" bind and
+# views wrapped in @read_replica send their SELECTs there (see RoutingSession).
+import os
+import time
+from functools import wraps
+from flask import g, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session as FlaskSASession
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+def _int(name, default):
+    return int(os.getenv(name, str(default)))
+
+# SQLite
+SQLITE_BUSY_TIMEOUT_MS = _int("PV_SQLITE_BUSY_TIMEOUT_MS", 5000)
+SQLITE_SYNCHRONOUS     = os.getenv("PV_SQLITE_SYNCHRONOUS", "NORMAL")   # safe with WAL
+SQLITE_MMAP_BYTES      = _int("PV_SQLITE_MMAP_BYTES", 256 * 1024 * 1024)
+SQLITE_CACHE_KB        = _int("PV_SQLITE_CACHE_KB", 64 * 1024)
+
+# Postgres (per process: total connections = workers * (pool_size + max_overflow))
+PG_POOL_SIZE            = _int("PV_DB_POOL_SIZE", 5)
+PG_MAX_OVERFLOW         = _int("PV_DB_MAX_OVERFLOW", 10)
+PG_POOL_TIMEOUT_S       = _int("PV_DB_POOL_TIMEOUT", 10)
+PG_POOL_RECYCLE_S       = _int("PV_DB_POOL_RECYCLE", 1800)
+PG_STATEMENT_TIMEOUT_MS = _int("PV_DB_STATEMENT_TIMEOUT_MS", 15000)
+
+def profile_for(url: str) -> str:
+    name = os.getenv("PV_DB_PROFILE", "auto").strip().lower()
+    if name != "auto":
+        return name
+    scheme = (url or "").split(":", 1)[0]
+    if scheme.startswith("sqlite"):
+        return "sqlite"
+    if scheme.startswith("postgres"):
+        return "postgres"
+    return "none"
+
+def engine_options(url: str) -> dict:
+    profile = profile_for(url)
+    if profile == "sqlite":
+        return {
+            # Python-level wait for the file lock; busy_timeout below covers SQLite itself
+            "connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000.0, "check_same_thread": False},
+        }
+    if profile == "postgres":
+        return {
+            "pool_size": PG_POOL_SIZE,
+            "max_overflow": PG_MAX_OVERFLOW,
+            "pool_timeout": PG_POOL_TIMEOUT_S,
+            "pool_recycle": PG_POOL_RECYCLE_S,
+            "pool_pre_ping": True,
+            "connect_args": {
+                "options": f"-c statement_timeout={PG_STATEMENT_TIMEOUT_MS}",
+                "application_name": os.getenv("PV_DB_APP_NAME", "photoverifier"),
+            },
+        }
+    return {}
+
+# After a user writes, their reads stay on the primary this long (replica lag budget)
+READ_YOUR_WRITES_S = float(os.getenv("PV_READ_YOUR_WRITES_S", "10"))
+REPLICA_BIND = "replica"
+_LAST_WRITE_KEY = "_pv_last_write"
+
+def _sqlite_on_connect(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+        cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")   # negative = KiB
+        cur.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cur.close()
+
+def install(app, db):
+    """Attach the per-connection hooks to every engine (default + binds) of `app`."""
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite" and profile_for(str(engine.url)) == "sqlite":
+                event.listen(engine, "connect", _sqlite_on_connect)
+
+def describe(app, db) -> dict:
+    """What each engine ended up with (for /admin/verifier/stats style debugging)."""
+    out = {}
+    with app.app_context():
+        for key, engine in db.engines.items():
+            out[key or "default"] = {
+                "dialect": engine.dialect.name,
+                "profile": profile_for(str(engine.url)),
+                "pool": engine.pool.status(),
+            }
+    return out
+
+# -------------------------
+# Read/write split
+# -------------------------
+class RoutingSession(FlaskSASession):
+    """
+    db.session class: SELECTs go to the replica bind when the current view is
+    marked @read_replica; flushes, DML and anything after this session has
+    written go to the primary. Commits that wrote something stamp the user's
+    Flask session, so their next few requests read from the primary too.
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self._pv_wrote = False
+        event.listen(self, "after_flush", self._pv_mark_write)
+        event.listen(self, "after_commit", self._pv_after_commit)
+
+    def _pv_mark_write(self, *args, **kwargs):
+        self._pv_wrote = True
+
+    def _pv_after_commit(self, _session):
+        if self._pv_wrote and has_request_context():
+            flask_session[_LAST_WRITE_KEY] = time.time()
+
+    def execute(self, statement, *args, **kwargs):
+        if getattr(statement, "is_dml", False):
+            self._pv_wrote = True
+        return super().execute(statement, *args, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and isinstance(clause, Select)
+            and not self._flushing
+            and not self._pv_wrote
+            and has_request_context()
+            and g.get("pv_read_replica")
+        ):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def replica_binds(read_url):
+    """SQLALCHEMY_BINDS entry for DATABASE_READ_URL (empty when unset)."""
+    if not read_url:
+        return {}
+    return {REPLICA_BIND: {"url": read_url, **engine_options(read_url)}}
+
+def read_replica(view):
+    """
+    Let a read-only view query the replica. Non-GET requests, and users who
+    wrote within PV_READ_YOUR_WRITES_S, stay on the primary.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        last_write = flask_session.get(_LAST_WRITE_KEY)
+        fresh = last_write is not None and time.time() - float(last_write) < READ_YOUR_WRITES_S
+        g.pv_read_replica = request.method in ("GET", "HEAD") and not fresh
+        return view(*args, **kwargs)
+    return wrapper
+
+# -------------------------
+# Per-request query counting
+# -------------------------
+# PV_QUERY_BUDGET=N: any request issuing more than N SQL statements is logged,
+# and raises QueryBudgetExceeded when app.testing (so tests fail on N+1 regressions).
+# Counting is on when a budget is set, in debug/testing, or with PV_QUERY_COUNT=1;
+# responses then carry an X-Query-Count header.
+QUERY_BUDGET = int(os.getenv("PV_QUERY_BUDGET", "0"))
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+def query_budget(n):
+    """Per-view override of PV_QUERY_BUDGET (e.g. for pages that legitimately need more)."""
+    def deco(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.pv_query_budget = n
+            return view(*args, **kwargs)
+        return wrapper
+    return deco
+
+def _count_query(*_args):
+    if has_request_context():
+        g.pv_query_count = g.get("pv_query_count", 0) + 1
+
+def install_query_counter(app, db):
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _count_query)
+
+    @app.after_request
+    def _query_count_header(resp):
+        if not (QUERY_BUDGET or app.debug or app.testing or os.getenv("PV_QUERY_COUNT") == "1"):
+            return resp
+        n = g.get("pv_query_count", 0)
+        resp.headers["X-Query-Count"] = str(n)
+        budget = g.get("pv_query_budget", QUERY_BUDGET)
+        if budget and n > budget:
+            msg = f"{request.method} {request.path} ran {n} queries (budget {budget})"
+            print("[QUERY_BUDGET]", msg)
+            if app.testing:
+                raise QueryBudgetExceeded(msg)
+        return resp
@@ -0,0 +1,244 @@
+# geo/clusters.py — density-based hotspot clustering (incremental grid DBSCAN)
+#
+# Hotspots are DBSCAN clusters of report locations: a report with at least
+# `min_pts` reports (itself included) within `eps_m` metres (haversine) is a
+# core point, cores within eps of each other share a cluster, and non-core
+# reports next to a core join it as border points. Clusters follow the shape
+# of a dump site instead of fixed 0.001° tiles, so a site that straddles a tile
+# edge is no longer split.
+#
+# Neighbour search uses a grid of eps-sized cells (a point only looks at its
+# 3x3 block). Inserts are incremental: a new report only updates its
+# neighbours' counts and unions the cores it touches, so refreshing the pins
+# costs O(new reports). Reports that age out of the window are removed the same
+# way (only the clusters that lose a core point are re-linked), so the result
+# always equals a fresh DBSCAN over the window. Engines are cached per filter
+# (ClusterCache) and rebuilt from scratch every PV_CLUSTER_REBUILD_S to drop
+# reports that changed status.
+import heapq, math, os, threading, time
+from collections import Counter, defaultdict
+
+EPS_M = float(os.getenv("PV_CLUSTER_EPS_M", "75"))
+MIN_PTS = int(os.getenv("PV_CLUSTER_MIN_PTS", "3"))
+REBUILD_S = float(os.getenv("PV_CLUSTER_REBUILD_S", "600"))
+MAX_ENGINES = 32
+EARTH_M = 6371008.8
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_M * math.asin(min(1.0, math.sqrt(a)))
+
+class IncrementalDBSCAN:
+    def __init__(self, eps_m=EPS_M, min_pts=MIN_PTS, max_lat=30.0):
+        self.eps_m = eps_m
+        self.min_pts = min_pts
+        self._set_cells(max_lat)
+        self.pts = {}                   # id -> (lat, lon, meta)
+        self.grid = defaultdict(list)   # cell -> [id]
+        self.count = {}                 # id -> reports within eps (incl. itself)
+        self.core = set()
+        self.parent = {}                # union-find over core points
+        self.last_id = 0
+        self._expiry = []               # heap of (created_at, id)
+        self._labels = None
+
+    def __len__(self):
+        return len(self.pts)
+
+    def _set_cells(self, max_lat):
+        # Cells are sized with the metres per degree of longitude at max_lat, so
+        # they are at least eps wide at every latitude up to it and the 3x3 block
+        # can't miss a neighbour. A point further from the equator re-grids.
+        self.max_lat = min(abs(max_lat), 89.0)
+        self._mx = math.pi / 180.0 * EARTH_M * math.cos(math.radians(self.max_lat))
+        self._my = math.pi / 180.0 * EARTH_M
+
+    def _regrid(self, max_lat):
+        self._set_cells(max_lat)
+        self.grid = defaultdict(list)
+        for pid, (lat, lon, _) in self.pts.items():
+            self.grid[self._cell(lat, lon)].append(pid)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lon * self._mx / self.eps_m), math.floor(lat * self._my / self.eps_m))
+
+    def _neighbours(self, pid):
+        lat, lon, _ = self.pts[pid]
+        cx, cy = self._cell(lat, lon)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for q in self.grid.get((cx + dx, cy + dy), ()):
+                    if q != pid:
+                        qlat, qlon, _ = self.pts[q]
+                        if haversine_m(lat, lon, qlat, qlon) <= self.eps_m:
+                            yield q
+
+    def _find(self, x):
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def _union(self, a, b):
+        ra, rb = self._find(a), self._find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def add(self, pid, lat, lon, meta=None):
+        if pid in self.pts or lat is None or lon is None:
+            return
+        if abs(float(lat)) > self.max_lat:
+            self._regrid(abs(float(lat)) + 1.0)
+        self.pts[pid] = (float(lat), float(lon), meta or {})
+        nbrs = list(self._neighbours(pid))
+        self.grid[self._cell(float(lat), float(lon))].append(pid)
+        self.last_id = max(self.last_id, pid)
+        if (meta or {}).get("created_at") is not None:
+            heapq.heappush(self._expiry, (meta["created_at"], pid))
+        self._labels = None
+
+        self.count[pid] = len(nbrs) + 1
+        newly_core = [pid] if self.count[pid] >= self.min_pts else []
+        for q in nbrs:
+            self.count[q] += 1
+            if self.count[q] == self.min_pts:
+                newly_core.append(q)
+        for c in newly_core:
+            self.core.add(c)
+            self.parent[c] = c
+        # core-core connectivity only changes where a point just became core
+        for c in newly_core:
+            for q in (nbrs if c == pid else self._neighbours(c)):
+                if q in self.core:
+                    self._union(c, q)
+
+    def _drop(self, pid):
+        """Remove one point and update its neighbours' counts; -> the core points lost."""
+        nbrs = list(self._neighbours(pid))
+        lat, lon, _ = self.pts.pop(pid)
+        self.grid[self._cell(lat, lon)].remove(pid)
+        del self.count[pid]
+        self._labels = None
+        lost = [pid] if pid in self.core else []
+        for q in nbrs:
+            self.count[q] -= 1
+            if self.count[q] == self.min_pts - 1:
+                lost.append(q)
+        return lost
+
+    def _relink(self, lost):
+        """A cluster that lost core points may have split: re-link the cores left in it."""
+        lost = set(lost)
+        if not lost:
+            return
+        split = {self._find(c) for c in lost}
+        affected = [c for c in self.core if c not in lost and self._find(c) in split]
+        self.core -= lost
+        for c in lost:
+            del self.parent[c]
+        for c in affected:
+            self.parent[c] = c
+        for c in affected:
+            for q in self._neighbours(c):
+                if q in self.core:
+                    self._union(c, q)
+
+    def remove(self, pid):
+        if pid in self.pts:
+            self._relink(self._drop(pid))
+
+    def expire(self, before):
+        """Remove the reports whose meta["created_at"] is older than `before`; returns how many."""
+        lost, n = [], 0
+        while self._expiry and self._expiry[0][0] < before:
+            _, pid = heapq.heappop(self._expiry)
+            if pid in self.pts:
+                lost += self._drop(pid)
+                n += 1
+        self._relink(lost)
+        return n
+
+    def labels(self):
+        """{id: cluster root id} for core and border points; noise is left out."""
+        if self._labels is None:
+            labels = {c: self._find(c) for c in self.core}
+            for pid in self.pts:
+                if pid not in labels:
+                    for q in self._neighbours(pid):
+                        if q in self.core:
+                            labels[pid] = labels[q]
+                            break
+            self._labels = labels
+        return self._labels
+
+    def clusters(self, keep=None):
+        """
+        Summaries of every cluster: centroid, members, unique users, top
+        category, radius. `keep(meta) -> bool` drops members (e.g. aged out).
+        """
+        members = defaultdict(list)
+        for pid, root in self.labels().items():
+            if keep is None or keep(self.pts[pid][2]):
+                members[root].append(pid)
+        out = []
+        for root, ids in members.items():
+            lats = [self.pts[i][0] for i in ids]
+            lons = [self.pts[i][1] for i in ids]
+            clat, clon = sum(lats) / len(ids), sum(lons) / len(ids)
+            metas = [self.pts[i][2] for i in ids]
+            users = {m.get("user_id") for m in metas if m.get("user_id")}
+            cats = Counter(m.get("report_type") or "unknown" for m in metas)
+            out.append({
+                "cluster_id": root,
+                "lat": clat,
+                "lon": clon,
+                "count": len(ids),
+                "users": len(users),
+                "top_category": cats.most_common(1)[0][0],
+                "radius_m": round(max(haversine_m(clat, clon, la, lo) for la, lo in zip(lats, lons)), 1),
+                "ids": ids,
+            })
+        out.sort(key=lambda c: -c["count"])
+        return out
+
+class ClusterCache:
+    """
+    One IncrementalDBSCAN per filter key, kept between requests. get() feeds
+    it the reports added since its last refresh and, with `since`, removes the
+    ones created before it; it rebuilds the engine when older than rebuild_s.
+    fetch(after_id) -> iterable of (id, lat, lon, meta), meta with "created_at"
+    """
+
+    def __init__(self, rebuild_s=REBUILD_S, max_engines=MAX_ENGINES):
+        self.rebuild_s = rebuild_s
+        self.max_engines = max_engines
+        self._engines = {}   # key -> (engine, built_at, lock)
+        self._lock = threading.Lock()
+
+    def get(self, key, fetch, eps_m=EPS_M, min_pts=MIN_PTS, since=None):
+        now = time.time()
+        with self._lock:
+            entry = self._engines.get(key)
+            if entry is None or now - entry[1] > self.rebuild_s:
+                if entry is None and len(self._engines) >= self.max_engines:
+                    oldest = min(self._engines, key=lambda k: self._engines[k][1])
+                    del self._engines[oldest]
+                entry = (IncrementalDBSCAN(eps_m, min_pts), now, threading.Lock())
+                self._engines[key] = entry
+        engine, _, lock = entry
+        with lock:
+            if since is not None:
+                engine.expire(since)
+            for pid, lat, lon, meta in fetch(engine.last_id):
+                engine.add(pid, lat, lon, meta)
+        return engine
+
+    def clear(self):
+        with self._lock:
+            self._engines.clear()
+
+cache = ClusterCache()
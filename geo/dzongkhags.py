@@ -0,0 +1,168 @@
+# geo/dzongkhags.py — which dzongkhag (and gewog/thromde zone) a GPS point is in
+#
+# Polygons come from local GeoJSON files (lon/lat, Polygon or MultiPolygon):
+#   PV_DZONGKHAG_GEOJSON  default geo/data/dzongkhags.geojson
+#                         name from properties dzongkhag | name | ADM1_EN | NAME_1
+#   PV_ZONES_GEOJSON      default geo/data/zones.geojson (optional)
+#                         name from properties zone | name | ADM2_EN | NAME_2
+# Without a dzongkhag file the old rectangles (FALLBACK_BBOX) are used.
+#
+# Lookups go through a coarse lat/lon grid: each cell lists the areas whose
+# bounding box touches it, so a point is only ray-cast against 1-2 polygons.
+# A point inside several areas (overlapping boxes, sloppy borders) goes to the
+# one whose centre is nearest, so every report counts toward one district only.
+import json, math, os, threading
+from pathlib import Path
+
+GEO_DIR = Path(__file__).resolve().parent
+DZONGKHAG_GEOJSON = os.getenv("PV_DZONGKHAG_GEOJSON", str(GEO_DIR / "data" / "dzongkhags.geojson"))
+ZONES_GEOJSON = os.getenv("PV_ZONES_GEOJSON", str(GEO_DIR / "data" / "zones.geojson"))
+GRID_DEG = float(os.getenv("PV_GEO_GRID_DEG", "0.05"))   # ~5 km cells
+
+# rough rectangles the app used before polygons: (lat0, lat1, lon0, lon1)
+FALLBACK_BBOX = {
+    "thimphu": (27.30, 27.60, 89.45, 89.80),
+    "paro":    (27.30, 27.70, 89.20, 89.60),
+    "punakha": (27.50, 27.90, 89.65, 90.10),
+    "wangdue": (27.30, 27.80, 89.70, 90.30),
+    "chukha":  (26.75, 27.35, 89.30, 89.85),
+}
+
+# keep the short keys already used in URLs/filters for the official spellings
+ALIASES = {
+    "wangduephodrang": "wangdue",
+    "wangduephrodrang": "wangdue",
+    "chhukha": "chukha",
+}
+
+def normalise(name):
+    key = (name or "").strip().lower().replace(" dzongkhag", "").replace(" ", "").replace("-", "")
+    return ALIASES.get(key, key)
+
+def _in_ring(x, y, ring):
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+class _Area:
+    __slots__ = ("name", "polygons", "bbox", "centre")
+
+    def __init__(self, name, polygons):
+        self.name = name
+        self.polygons = polygons        # [[outer, hole, ...], ...], rings of (lon, lat)
+        xs = [p[0] for poly in polygons for p in poly[0]]
+        ys = [p[1] for poly in polygons for p in poly[0]]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+        self.centre = ((self.bbox[0] + self.bbox[2]) / 2.0, (self.bbox[1] + self.bbox[3]) / 2.0)
+
+    def contains(self, x, y):
+        x0, y0, x1, y1 = self.bbox
+        if not (x0 <= x <= x1 and y0 <= y <= y1):
+            return False
+        for rings in self.polygons:
+            if _in_ring(x, y, rings[0]) and not any(_in_ring(x, y, h) for h in rings[1:]):
+                return True
+        return False
+
+class PolygonIndex:
+    def __init__(self, areas, cell=GRID_DEG):
+        self.areas = areas
+        self.cell = cell
+        self.grid = {}
+        for i, a in enumerate(areas):
+            x0, y0, x1, y1 = a.bbox
+            for gx in range(math.floor(x0 / cell), math.floor(x1 / cell) + 1):
+                for gy in range(math.floor(y0 / cell), math.floor(y1 / cell) + 1):
+                    self.grid.setdefault((gx, gy), []).append(i)
+
+    def lookup(self, lat, lon):
+        if lat is None or lon is None:
+            return None
+        x, y = float(lon), float(lat)
+        hits = [self.areas[i] for i in self.grid.get((math.floor(x / self.cell), math.floor(y / self.cell)), ())
+                if self.areas[i].contains(x, y)]
+        if not hits:
+            return None
+        if len(hits) > 1:
+            hits.sort(key=lambda a: (a.centre[0] - x) ** 2 + (a.centre[1] - y) ** 2)
+        return hits[0].name
+
+    def names(self):
+        return sorted({a.name for a in self.areas})
+
+def _feature_name(props, keys):
+    for k in keys:
+        if props.get(k):
+            return str(props[k])
+    return None
+
+def load_geojson(path, keys, norm=normalise):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    merged = {}
+    for feat in data.get("features", []):
+        geom = feat.get("geometry") or {}
+        name = _feature_name(feat.get("properties") or {}, keys)
+        if not name:
+            continue
+        if geom.get("type") == "Polygon":
+            polys = [geom["coordinates"]]
+        elif geom.get("type") == "MultiPolygon":
+            polys = geom["coordinates"]
+        else:
+            continue
+        merged.setdefault(norm(name), []).extend(polys)
+    return [_Area(name, polys) for name, polys in merged.items()]
+
+def _bbox_areas():
+    areas = []
+    for name, (la0, la1, lo0, lo1) in FALLBACK_BBOX.items():
+        ring = [(lo0, la0), (lo1, la0), (lo1, la1), (lo0, la1), (lo0, la0)]
+        areas.append(_Area(name, [[ring]]))
+    return areas
+
+class Resolver:
+    """Dzongkhag + zone lookup; build once with get_resolver()."""
+
+    def __init__(self, dz_path=DZONGKHAG_GEOJSON, zones_path=ZONES_GEOJSON):
+        if dz_path and os.path.exists(dz_path):
+            self.source = dz_path
+            self.dzongkhags = PolygonIndex(load_geojson(dz_path, ("dzongkhag", "name", "ADM1_EN", "NAME_1")))
+        else:
+            self.source = "fallback-bbox"
+            self.dzongkhags = PolygonIndex(_bbox_areas())
+        self.zones = None
+        if zones_path and os.path.exists(zones_path):
+            self.zones = PolygonIndex(load_geojson(zones_path, ("zone", "name", "ADM2_EN", "NAME_2"),
+                                                   norm=lambda n: n.strip()))
+
+    def lookup(self, lat, lon):
+        """-> (dzongkhag | None, zone | None)"""
+        dz = self.dzongkhags.lookup(lat, lon)
+        zone = self.zones.lookup(lat, lon) if self.zones is not None else None
+        return dz, zone
+
+    def names(self):
+        return self.dzongkhags.names()
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+def get_resolver():
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = Resolver()
+                print(f"[GEO] dzongkhags from {_resolver.source}"
+                      f"{' + zones' if _resolver.zones is not None else ''}")
+    return _resolver
+
+def lookup(lat, lon):
+    return get_resolver().lookup(lat, lon)
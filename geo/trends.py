@@ -0,0 +1,142 @@
+# geo/trends.py — streaming hotspot trend scores (which sites are getting worse)
+#
+# Every AUTO_OK report updates its tile's HotspotTrend row in O(1):
+#   - two exponentially decayed counts (half-lives PV_TREND_FAST_HL_DAYS and
+#     PV_TREND_SLOW_HL_DAYS); each is "events per day" once scaled by ln2/half-life,
+#     so fast/slow > 1 means the recent rate is above the long-run rate
+#   - this week's and last week's counts (weeks = 7-day blocks since the epoch)
+# Emerging hotspots rank tiles by a Poisson z-score of this week's count against
+# last week's, pro-rated for how far into the week we are. The endpoint reads
+# only tiles seen in the last two weeks, so it costs the same whatever the history.
+import math, os, time
+from datetime import datetime, timedelta
+
+FAST_HL_DAYS = float(os.getenv("PV_TREND_FAST_HL_DAYS", "3"))
+SLOW_HL_DAYS = float(os.getenv("PV_TREND_SLOW_HL_DAYS", "21"))
+MIN_Z = float(os.getenv("PV_TREND_MIN_Z", "2"))   # ~2 sigma above last week's pace
+TILE_DECIMALS = 3   # same tiles as the admin bucket map
+DAY_S = 86400.0
+WEEK_S = 7 * DAY_S
+
+def tile_of(lat, lon):
+    m = 10 ** TILE_DECIMALS
+    return math.floor(lat * m) / m, math.floor(lon * m) / m
+
+def week_of(ts):
+    return int(ts // WEEK_S)
+
+def _decay(dt_s, hl_days):
+    return 0.5 ** (dt_s / (hl_days * DAY_S))
+
+def _epoch(dt):
+    # DB datetimes are naive UTC (datetime.utcnow())
+    return (dt - datetime(1970, 1, 1)).total_seconds()
+
+def apply_event(t, ts, weight=1):
+    """Fold one event at epoch `ts` into trend row `t` (any order; weight -1 undoes one)."""
+    if t.ref_ts is None:   # first event for this tile
+        t.ref_ts = ts
+        t.score_fast = t.score_slow = 0.0
+        t.week_no, t.week_count, t.prev_week_count, t.total = week_of(ts), 0, 0, 0
+
+    if ts >= t.ref_ts:
+        dt = ts - t.ref_ts
+        t.score_fast = t.score_fast * _decay(dt, FAST_HL_DAYS) + weight
+        t.score_slow = t.score_slow * _decay(dt, SLOW_HL_DAYS) + weight
+        t.ref_ts = ts
+    else:   # late event: add it already decayed to ref_ts
+        dt = t.ref_ts - ts
+        t.score_fast += weight * _decay(dt, FAST_HL_DAYS)
+        t.score_slow += weight * _decay(dt, SLOW_HL_DAYS)
+
+    w = week_of(ts)
+    if w == t.week_no:
+        t.week_count = max(0, t.week_count + weight)
+    elif w == t.week_no - 1:
+        t.prev_week_count = max(0, t.prev_week_count + weight)
+    elif w > t.week_no:
+        t.prev_week_count = t.week_count if w == t.week_no + 1 else 0
+        t.week_count = max(0, weight)
+        t.week_no = w
+    t.total = max(0, (t.total or 0) + weight)
+
+def record(lat, lon, when=None, dzongkhag=None, weight=1):
+    """
+    Update the tile of one AUTO_OK report inside the caller's transaction
+    (weight=-1 when a report loses AUTO_OK). Never raises: trends are advisory.
+    """
+    from models import db, HotspotTrend
+    if lat is None or lon is None:
+        return
+    from sqlalchemy.exc import IntegrityError
+    when = when or datetime.utcnow()
+    tlat, tlon = tile_of(float(lat), float(lon))
+    for attempt in (1, 2):   # 2nd try if another upload created the tile's row first
+        try:
+            with db.session.begin_nested():
+                t = (HotspotTrend.query.filter_by(tile_lat=tlat, tile_lon=tlon)
+                     .with_for_update().first())
+                if t is None:
+                    if weight < 0:
+                        return
+                    t = HotspotTrend(tile_lat=tlat, tile_lon=tlon, dzongkhag=dzongkhag,
+                                     score_fast=0.0, score_slow=0.0, ref_ts=None, total=0,
+                                     week_no=0, week_count=0, prev_week_count=0, first_seen_at=when)
+                    db.session.add(t)
+                    db.session.flush()   # hit uq_trend_tile here, inside the savepoint
+                apply_event(t, _epoch(when), weight)
+                if weight > 0:
+                    t.last_seen_at = max(t.last_seen_at or when, when)
+                t.dzongkhag = t.dzongkhag or dzongkhag
+            return
+        except IntegrityError as e:
+            if attempt == 2:
+                print("[TRENDS] update failed:", repr(e))
+        except Exception as e:
+            print("[TRENDS] update failed:", repr(e))
+            return
+
+def metrics(t, now_ts=None):
+    """Trend numbers for one row, decayed to now."""
+    now_ts = now_ts or time.time()
+    dt = max(0.0, now_ts - (t.ref_ts or now_ts))
+    rate_fast = t.score_fast * _decay(dt, FAST_HL_DAYS) * math.log(2) / FAST_HL_DAYS
+    rate_slow = t.score_slow * _decay(dt, SLOW_HL_DAYS) * math.log(2) / SLOW_HL_DAYS
+
+    w_now = week_of(now_ts)
+    if t.week_no == w_now:
+        this_week, last_week = t.week_count, t.prev_week_count
+    elif t.week_no == w_now - 1:
+        this_week, last_week = 0, t.week_count
+    else:
+        this_week, last_week = 0, 0
+
+    frac = max(1.0 / 7.0, (now_ts - w_now * WEEK_S) / WEEK_S)   # share of this week elapsed
+    expected = last_week * frac
+    z = (this_week - expected) / math.sqrt(expected + 1.0)
+    return {
+        "rate_fast": round(rate_fast, 4),
+        "rate_slow": round(rate_slow, 4),
+        "acceleration": round(rate_fast / rate_slow, 3) if rate_slow > 1e-9 else None,
+        "this_week": this_week,
+        "last_week": last_week,
+        "growth": round((this_week + 1) / (expected + 1), 3),
+        "z": round(z, 3),
+    }
+
+def emerging(rows, limit=20, min_count=3, min_z=MIN_Z, now_ts=None):
+    """Rank trend rows: rising this week (z >= min_z, this_week >= min_count), biggest z first."""
+    now_ts = now_ts or time.time()
+    out = []
+    for t in rows:
+        m = metrics(t, now_ts)
+        if m["this_week"] < min_count or m["z"] < min_z:
+            continue
+        out.append({"lat": t.tile_lat, "lon": t.tile_lon, "dzongkhag": t.dzongkhag,
+                    "total": t.total, "last_seen_at": t.last_seen_at, **m})
+    out.sort(key=lambda r: (-r["z"], -r["rate_fast"]))
+    return out[:limit]
+
+def recent_cutoff(now=None):
+    """Only tiles seen in the last two weeks can be emerging."""
+    return (now or datetime.utcnow()) - timedelta(days=14)
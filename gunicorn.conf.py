@@ -0,0 +1,64 @@
+# gunicorn.conf.py — picked up automatically by `gunicorn app:app` (see Procfile)
+#
+# Deployment modes for the model (see README "Deployment"):
+#   default          every worker loads its own copy of the model after fork
+#   PV_PRELOAD=1     the master imports the app and loads the model once; workers
+#                    share those pages copy-on-write (worker RAM stays flat)
+#   PV_INFERENCE_SOCKET=/path.sock
+#                    workers load no model at all and call ai/inference_server.py
+import gc, os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+preload_app = os.getenv("PV_PRELOAD", "0") == "1"
+if preload_app:
+    # onnxruntime thread pools don't survive fork(); with one thread per
+    # session there is no pool, so the master's session is safe in workers.
+    os.environ.setdefault("PV_ORT_THREADS", "1")
+
+# Load the model in each worker before it takes traffic, instead of making the
+# first upload after a (re)start wait for it. Set PV_WARMUP=0 to skip.
+PV_WARMUP = os.getenv("PV_WARMUP", "1") == "1"
+
+def when_ready(server):
+    if not (preload_app and PV_WARMUP):
+        return
+    from app import app, db, warm_up
+    warm_up(start_watcher=False)   # no threads in the master: workers would inherit their locks
+    # DB connections must not be shared across forks; workers open their own.
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    # Keep the GC from touching (and so copying) the preloaded objects in workers.
+    gc.freeze()
+    server.log.info("model preloaded in master (pid %s)", os.getpid())
+
+def post_fork(server, worker):
+    if not PV_WARMUP:
+        return
+    from app import warm_up
+    warm_up()  # starts this worker's model watcher; no-op for anything the master already loaded
+    server.log.info("worker %s warmed up", worker.pid)
+
+# Prometheus multiprocess mode (metrics.py): with PROMETHEUS_MULTIPROC_DIR set,
+# workers write their samples there and /metrics merges them. Start from an
+# empty directory, and drop a worker's live gauges when it exits.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+def on_starting(server):
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+    for name in os.listdir(PROMETHEUS_MULTIPROC_DIR):
+        if name.endswith(".db"):
+            os.remove(os.path.join(PROMETHEUS_MULTIPROC_DIR, name))
+
+def child_exit(server, worker):
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return
+    try:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+    except ImportError:
+        pass
@@ -0,0 +1,149 @@
+# metrics.py — Prometheus metrics: request/endpoint timings, upload stages,
+# DB queries and verifier stats, served on a local-only /metrics.
+#
+# prometheus_client is optional; without it (or with PV_METRICS=0) every hook
+# here is a no-op and /metrics answers 503.
+#
+# Under gunicorn set PROMETHEUS_MULTIPROC_DIR (an empty, writable directory)
+# before the app is imported: each worker then writes its samples to files
+# there and /metrics merges all workers. gunicorn.conf.py wipes the directory
+# at start and marks exited workers dead.
+#
+# /metrics is served to 127.0.0.1/::1 only, plus any address listed in
+# PV_METRICS_ALLOW (comma separated), e.g. the Prometheus host.
+import os, time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, request
+from sqlalchemy import event
+
+try:
+    import prometheus_client as prom
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:  # optional dependency
+    prom = None
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+ENABLED = prom is not None and os.getenv("PV_METRICS", "1") == "1"
+ALLOW = {"127.0.0.1", "::1"} | {a.strip() for a in os.getenv("PV_METRICS_ALLOW", "").split(",") if a.strip()}
+
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERIES = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+if ENABLED:
+    REQUEST_SECONDS = Histogram("pv_request_seconds", "HTTP request latency by endpoint",
+                                ["endpoint", "method", "status"], buckets=SECONDS)
+    REQUEST_QUERIES = Histogram("pv_request_db_queries", "SQL statements issued per request",
+                                ["endpoint"], buckets=QUERIES)
+    DB_QUERY_SECONDS = Histogram("pv_db_query_seconds", "SQL statement latency", ["kind"], buckets=SECONDS)
+    DB_ERRORS = Counter("pv_db_errors_total", "SQL statements that raised", ["kind"])
+    UPLOAD_STAGE_SECONDS = Histogram("pv_upload_stage_seconds", "Time per stage of _save_and_score",
+                                     ["stage"], buckets=SECONDS)
+    UPLOAD_STATUS = Counter("pv_uploads_total", "Scored uploads by resulting status", ["status"])
+    VERIFIER_STAGE_SECONDS = Histogram("pv_verifier_stage_seconds", "Time per stage of Verifier.score",
+                                       ["stage"], buckets=SECONDS)
+    VERIFIER_EVENTS = Counter("pv_verifier_events_total",
+                              "Verifier events: images scored, score-cache hits/misses, fallbacks",
+                              ["event", "model_kind"])
+    VERIFIER_MODEL = Gauge("pv_verifier_model_info", "Model backend loaded by the verifier (value 1)",
+                           ["model_kind", "model_version"], multiprocess_mode="max")
+
+@contextmanager
+def stage(name):
+    """Time one stage of the upload pipeline: `with metrics.stage("phash"): ...`"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if ENABLED:
+            UPLOAD_STAGE_SECONDS.labels(name).observe(time.perf_counter() - t0)
+
+def upload_scored(status):
+    if ENABLED:
+        UPLOAD_STATUS.labels(status or "unknown").inc()
+
+class VerifierObserver:
+    """Attached as Verifier.observer; the verifier itself does not import this module."""
+
+    def stage(self, name, seconds):
+        if ENABLED:
+            VERIFIER_STAGE_SECONDS.labels(name).observe(seconds)
+
+    def count(self, name, n=1, model_kind=""):
+        if ENABLED and n:
+            VERIFIER_EVENTS.labels(name, model_kind or "").inc(n)
+
+    def model(self, model_kind, model_version, previous=None):
+        if ENABLED:
+            if previous is not None:   # after a hot reload (ai/registry.py)
+                VERIFIER_MODEL.labels(*previous).set(0)
+            VERIFIER_MODEL.labels(model_kind, model_version).set(1)
+
+# -------------------------
+# Flask / SQLAlchemy hooks
+# -------------------------
+def _statement_kind(statement):
+    word = (statement or "").lstrip().split(None, 1)[:1]
+    kind = word[0].lower() if word else ""
+    return kind if kind in ("select", "insert", "update", "delete", "with") else "other"
+
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("pv_query_t0", []).append(time.perf_counter())
+
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("pv_query_t0")
+    if starts:
+        DB_QUERY_SECONDS.labels(_statement_kind(statement)).observe(time.perf_counter() - starts.pop())
+
+def _on_error(ctx):
+    starts = ctx.connection.info.get("pv_query_t0") if ctx.connection is not None else None
+    if starts:
+        starts.pop()
+    DB_ERRORS.labels(_statement_kind(ctx.statement)).inc()
+
+def metrics_view():
+    if request.remote_addr not in ALLOW:
+        abort(404)
+    if not ENABLED:
+        return Response("metrics disabled (prometheus_client not installed or PV_METRICS=0)\n",
+                        status=503, mimetype="text/plain")
+    if MULTIPROC_DIR:
+        from prometheus_client import CollectorRegistry, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prom.REGISTRY
+    return Response(prom.generate_latest(registry), mimetype=prom.CONTENT_TYPE_LATEST)
+
+def install(app, db, verifier=None):
+    """Request timing + per-request query counts (db_profile counts them), DB timings, /metrics."""
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+    if not ENABLED:
+        print("[METRICS] disabled (prometheus_client not installed or PV_METRICS=0)")
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor)
+            event.listen(engine, "after_cursor_execute", _after_cursor)
+            event.listen(engine, "handle_error", _on_error)
+
+    if verifier is not None:
+        verifier.observer = VerifierObserver()
+
+    @app.before_request
+    def _metrics_start():
+        g.pv_metrics_t0 = time.perf_counter()
+
+    @app.after_request
+    def _metrics_observe(resp):
+        t0 = g.get("pv_metrics_t0")
+        if t0 is None or request.endpoint == "metrics":
+            return resp
+        endpoint = request.endpoint or "unmatched"
+        status = f"{resp.status_code // 100}xx"
+        REQUEST_SECONDS.labels(endpoint, request.method, status).observe(time.perf_counter() - t0)
+        REQUEST_QUERIES.labels(endpoint).observe(g.get("pv_query_count", 0))
+        return resp
+
+    print(f"[METRICS] enabled{' (multiprocess: ' + MULTIPROC_DIR + ')' if MULTIPROC_DIR else ''}")
@@ -2,8 +2,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+from db_profile import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 class User(db.Model, UserMixin):
     __tablename__ = "user"
@@ -74,6 +75,10 @@ class Submission(db.Model):
     # Reporter location self-declared: 'at_place' | 'other_place'
     reporter_location = db.Column(db.String(16))
 
+    # Resolved once at ingest from lat/lon (geo/dzongkhags.py); map/queue filters match on these
+    dzongkhag = db.Column(db.String(32), index=True)
+    zone = db.Column(db.String(64), index=True)   # gewog / thromde zone, when zone polygons are configured
+
     # AI fields (machine side)
     ai_label = db.Column(db.String(32))
     ai_score = db.Column(db.Float)
@@ -119,6 +124,10 @@ class Submission(db.Model):
         lazy="dynamic",
     )
 
+    __table_args__ = (
+        db.Index("ix_submission_lat_lon", "lat", "lon"),   # bbox lookups (ai/cleanup.py)
+    )
+
 class Message(db.Model):
     __tablename__ = "message"
 
@@ -150,6 +159,12 @@ class SupwPlace(db.Model):
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # site location + how many students it can take (None = no limit);
+    # used by the nearest-place assignment in supw_assign.py
+    lat = db.Column(db.Float)
+    lon = db.Column(db.Float)
+    capacity = db.Column(db.Integer)
+
     assignments = db.relationship(
         "SupwAssignment",
         back_populates="place",
@@ -170,4 +185,177 @@ class SupwAssignment(db.Model):
     __table_args__ = (
         db.UniqueConstraint("place_id", "user_id", name="uq_place_user"),
     )
-#checked
\ No newline at end of file
+#checked
+# -------------------------
+# Camera fleet incidents
+# -------------------------
+class Incident(db.Model):
+    __tablename__ = "incident"
+
+    id = db.Column(db.Integer, primary_key=True)
+    camera_id = db.Column(db.String(64), index=True)
+    event_type = db.Column(db.String(32))
+    confidence = db.Column(db.String(16))  # as reported by the camera, kept verbatim
+    image_path = db.Column(db.String(256))
+    video_path = db.Column(db.String(256))
+    meta_json = db.Column(db.Text)
+    status = db.Column(db.String(16), default="pending", index=True)
+
+    # "<camera_id>:<key>" supplied by the camera so retried uploads don't duplicate
+    idempotency_key = db.Column(db.String(160), unique=True)
+
+    # AI triage (filled in by tools/analyse_incidents.py from sampled keyframes)
+    ai_score = db.Column(db.Float, index=True)   # best frame's action_score
+    ai_label = db.Column(db.String(32))
+    relevance_score = db.Column(db.Float)
+    thumb_path = db.Column(db.String(256))       # best frame, downsized
+    frames_scored = db.Column(db.Integer)
+    model_version = db.Column(db.String(32))
+    analysed_at = db.Column(db.DateTime, index=True)   # NULL until every frame could be read and scored
+    analysis_attempts = db.Column(db.Integer, default=0)
+    analysis_error = db.Column(db.String(200))
+    next_analysis_at = db.Column(db.DateTime, index=True)   # retry backoff after a failed attempt
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# -------------------------
+# Hotspot history rollups
+# -------------------------
+class HotspotRollup(db.Model):
+    """
+    Per-day AUTO_OK counts on a 4-decimal lat/lon tile, written by
+    tools/purge_submissions.py just before it deletes the submissions,
+    so the hotspot maps keep their history after retention runs.
+    """
+    __tablename__ = "hotspot_rollup"
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    tile_lat = db.Column(db.Float, nullable=False)   # floor(lat, 4)
+    tile_lon = db.Column(db.Float, nullable=False)   # floor(lon, 4)
+    report_type = db.Column(db.String(32), nullable=False, default="")
+    count = db.Column(db.Integer, nullable=False, default=0)
+    dzongkhag = db.Column(db.String(32), index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint("day", "tile_lat", "tile_lon", "report_type", name="uq_rollup_tile"),
+    )
+
+# -------------------------
+# Hotspot trends (decayed scores)
+# -------------------------
+class HotspotTrend(db.Model):
+    """
+    Running state per 0.001° tile, updated in O(1) whenever a report becomes
+    AUTO_OK (geo/trends.py): exponentially decayed counts at two half-lives
+    plus this/previous week's counts. Rebuild with tools/rebuild_hotspot_trends.py.
+    """
+    __tablename__ = "hotspot_trend"
+    id = db.Column(db.Integer, primary_key=True)
+    tile_lat = db.Column(db.Float, nullable=False)
+    tile_lon = db.Column(db.Float, nullable=False)
+    dzongkhag = db.Column(db.String(32), index=True)
+
+    score_fast = db.Column(db.Float, nullable=False, default=0.0)   # decayed to ref_ts
+    score_slow = db.Column(db.Float, nullable=False, default=0.0)
+    ref_ts = db.Column(db.Float, nullable=False, default=0.0)       # epoch seconds
+
+    week_no = db.Column(db.Integer, nullable=False, default=0)      # days since epoch // 7
+    week_count = db.Column(db.Integer, nullable=False, default=0)
+    prev_week_count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    first_seen_at = db.Column(db.DateTime)
+    last_seen_at = db.Column(db.DateTime, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint("tile_lat", "tile_lon", name="uq_trend_tile"),
+    )
+
+# -------------------------
+# Shadow model evaluation
+# -------------------------
+class ShadowScore(db.Model):
+    """
+    One submission re-scored by the shadow model (ai/shadow.py), next to what
+    production decided. Never affects the submission itself.
+    """
+    __tablename__ = "shadow_score"
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, nullable=False, index=True)   # no FK: purges keep working
+
+    model_version = db.Column(db.String(32), nullable=False)        # shadow, e.g. waste_v2_onnx
+    prod_model_version = db.Column(db.String(32), nullable=False)
+    relevance_score = db.Column(db.Float)
+    action_score = db.Column(db.Float)
+    status = db.Column(db.String(16))
+    prod_relevance_score = db.Column(db.Float)
+    prod_action_score = db.Column(db.Float)
+    prod_status = db.Column(db.String(16))
+    agree = db.Column(db.Boolean, index=True)
+    latency_ms = db.Column(db.Float)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class ShadowStat(db.Model):
+    """Running agreement totals per (production, shadow) model pair, updated with every ShadowScore."""
+    __tablename__ = "shadow_stat"
+    id = db.Column(db.Integer, primary_key=True)
+    prod_model_version = db.Column(db.String(32), nullable=False)
+    model_version = db.Column(db.String(32), nullable=False)
+
+    n = db.Column(db.Integer, nullable=False, default=0)
+    both_ok = db.Column(db.Integer, nullable=False, default=0)         # AUTO_OK in both
+    prod_only_ok = db.Column(db.Integer, nullable=False, default=0)
+    shadow_only_ok = db.Column(db.Integer, nullable=False, default=0)
+    both_recheck = db.Column(db.Integer, nullable=False, default=0)
+    sum_diff = db.Column(db.Float, nullable=False, default=0.0)        # shadow - prod action_score
+    sum_abs_diff = db.Column(db.Float, nullable=False, default=0.0)
+    sum_sq_diff = db.Column(db.Float, nullable=False, default=0.0)
+    sum_latency_ms = db.Column(db.Float, nullable=False, default=0.0)
+
+    first_at = db.Column(db.DateTime)
+    last_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint("prod_model_version", "model_version", name="uq_shadow_pair"),
+    )
+
+# -------------------------
+# Before/after cleanup checks
+# -------------------------
+class CleanupComparison(db.Model):
+    """
+    A volunteer_works report ("after") compared with one earlier dumping report
+    nearby ("before"), written by ai/cleanup.py. rank 1 is the best match; an
+    after photo with no earlier report in range has one "no_prior" row.
+    """
+    __tablename__ = "cleanup_comparison"
+    id = db.Column(db.Integer, primary_key=True)
+    after_id = db.Column(db.Integer, nullable=False, index=True)    # no FK: purges keep working
+    before_id = db.Column(db.Integer, index=True)
+    rank = db.Column(db.Integer, nullable=False, default=1)
+    method = db.Column(db.String(32))
+
+    distance_m = db.Column(db.Float)
+    days_between = db.Column(db.Float)
+    alignment = db.Column(db.Float)      # best shifted correlation of the thumbnails
+    shift_x = db.Column(db.Integer)
+    shift_y = db.Column(db.Integer)
+    scene = db.Column(db.Float)          # background still matching -> same place
+    change = db.Column(db.Float)         # share of tiles that changed
+    pixel_diff = db.Column(db.Float)
+    phash_dist = db.Column(db.Integer)
+    dhash_dist = db.Column(db.Integer)
+    dirt_drop = db.Column(db.Float)      # before - after relevance_score
+    confidence = db.Column(db.Float, index=True)
+    verdict = db.Column(db.String(16), index=True)   # cleaned|uncertain|unchanged|different_view|same_photo|no_prior
+
+    human_state = db.Column(db.String(16), default="unreviewed", index=True)  # unreviewed|confirmed|rejected
+    reviewed_by = db.Column(db.Integer, db.ForeignKey("user.id"))
+    reviewed_at = db.Column(db.DateTime)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint("after_id", "method", "rank", name="uq_cleanup_after_rank"),
+    )
@@ -0,0 +1,236 @@
+# profiling.py — opt-in per-request profiles, written to PV_PROFILE_DIR
+#
+# A request is profiled when
+#   - an admin sends header `X-PV-Profile: 1` (or `cprofile` / `sample`), or
+#     adds `?_profile=1` to the URL, or
+#   - it is picked by PV_PROFILE_SAMPLE_RATE (0..1, default 0); these are only
+#     kept when slower than PV_PROFILE_SLOW_MS, so the list shows slow requests.
+#
+# Two profilers:
+#   sample    a thread snapshots the request thread's stack every
+#             PV_PROFILE_INTERVAL_MS; cheap enough for production; writes
+#             speedscope JSON (open at https://www.speedscope.app)
+#   cprofile  deterministic cProfile; exact call counts, slower; writes .pstats
+#             (python -m pstats file). One at a time per process: a second
+#             concurrent request falls back to the sampler.
+# PV_PROFILE_MODE picks the default (sample). Each profile gets a .meta.json
+# with the request and its top frames, listed on /admin/profiles; only the
+# newest PV_PROFILE_KEEP profiles are kept.
+import json, os, random, sys, threading, time, uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from flask import g, request
+
+ROOT = Path(__file__).resolve().parent
+PROFILE_DIR = Path(os.getenv("PV_PROFILE_DIR", str(ROOT / "instance" / "profiles")))
+SAMPLE_RATE = float(os.getenv("PV_PROFILE_SAMPLE_RATE", "0"))
+SLOW_MS = float(os.getenv("PV_PROFILE_SLOW_MS", "500"))
+INTERVAL_MS = float(os.getenv("PV_PROFILE_INTERVAL_MS", "5"))
+DEFAULT_MODE = os.getenv("PV_PROFILE_MODE", "sample")
+KEEP = int(os.getenv("PV_PROFILE_KEEP", "200"))
+TOP_N = 15
+
+_cprofile_lock = threading.Lock()   # cProfile can't run twice at once (3.12+)
+
+def _frame_key(code):
+    return (code.co_name, code.co_filename, code.co_firstlineno)
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread."""
+
+    def __init__(self, thread_id, interval_s):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.samples = []                  # [(frame key, ...) root -> leaf]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="pv-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_key(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples.append(tuple(reversed(stack)))
+
+    def speedscope(self, name, duration_ms):
+        index, frames, samples = {}, [], []
+        for stack in self.samples:
+            ids = []
+            for key in stack:
+                if key not in index:
+                    index[key] = len(frames)
+                    frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                ids.append(index[key])
+            samples.append(ids)
+        interval_ms = self.interval_s * 1000.0
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled", "name": name, "unit": "milliseconds",
+                "startValue": 0, "endValue": max(duration_ms, interval_ms * len(samples)),
+                "samples": samples, "weights": [interval_ms] * len(samples),
+            }],
+            "name": name,
+            "activeProfileIndex": 0,
+            "exporter": "thromai-profiling",
+        }
+
+    def top_frames(self, n=TOP_N):
+        total = len(self.samples) or 1
+        own = Counter(stack[-1] for stack in self.samples)
+        inclusive = Counter(key for stack in self.samples for key in set(stack))
+        return [{"frame": f"{k[0]} ({_short(k[1])}:{k[2]})",
+                 "self_pct": round(100.0 * c / total, 1),
+                 "total_pct": round(100.0 * inclusive[k] / total, 1)}
+                for k, c in own.most_common(n)]
+
+def _short(path):
+    try:
+        return str(Path(path).resolve().relative_to(ROOT))
+    except ValueError:
+        return Path(path).name
+
+def _cprofile_top(prof, n=TOP_N):
+    import pstats
+    stats = pstats.Stats(prof)
+    total = stats.total_tt or 1e-9
+    rows = sorted(stats.stats.items(), key=lambda kv: -kv[1][2])[:n]   # by own time
+    return [{"frame": f"{func} ({_short(file)}:{line})",
+             "self_pct": round(100.0 * tt / total, 1),
+             "total_pct": round(100.0 * ct / total, 1),
+             "calls": nc}
+            for (file, line, func), (_cc, nc, tt, ct, _callers) in rows]
+
+# -------------------------
+# Request hooks
+# -------------------------
+def _requested_mode(is_admin):
+    flag = request.headers.get("X-PV-Profile") or request.args.get("_profile")
+    if flag and is_admin():
+        return flag if flag in ("cprofile", "sample") else DEFAULT_MODE, True
+    if SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE:
+        return DEFAULT_MODE, False
+    return None, False
+
+def _start(mode):
+    if mode == "cprofile" and _cprofile_lock.acquire(blocking=False):
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+        return "cprofile", prof
+    sampler = StackSampler(threading.get_ident(), INTERVAL_MS / 1000.0)
+    sampler.start()
+    return "sample", sampler
+
+def _stop(mode, prof):
+    if mode == "cprofile":
+        prof.disable()
+        _cprofile_lock.release()
+    else:
+        prof.stop()
+
+def _write(mode, prof, meta):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    pid = meta["id"]
+    if mode == "cprofile":
+        fname = f"{pid}.pstats"
+        prof.dump_stats(str(PROFILE_DIR / fname))
+        meta["top"] = _cprofile_top(prof)
+    else:
+        fname = f"{pid}.speedscope.json"
+        with open(PROFILE_DIR / fname, "w", encoding="utf-8") as f:
+            json.dump(prof.speedscope(f"{meta['method']} {meta['path']}", meta["duration_ms"]), f)
+        meta["top"] = prof.top_frames()
+        meta["samples"] = len(prof.samples)
+    meta["file"] = fname
+    with open(PROFILE_DIR / f"{pid}.meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    _prune()
+
+def _prune():
+    metas = sorted(PROFILE_DIR.glob("*.meta.json"), key=lambda p: p.name, reverse=True)
+    for old in metas[KEEP:]:
+        pid = old.name[:-len(".meta.json")]
+        for p in PROFILE_DIR.glob(pid + ".*"):
+            p.unlink(missing_ok=True)
+
+def recent(limit=100):
+    """Newest profile metadata first (ids start with a timestamp)."""
+    if not PROFILE_DIR.exists():
+        return []
+    out = []
+    for p in sorted(PROFILE_DIR.glob("*.meta.json"), key=lambda p: p.name, reverse=True)[:limit]:
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return out
+
+def profile_path(name):
+    """Resolve a profile file name from the list, refusing anything outside PROFILE_DIR."""
+    p = (PROFILE_DIR / name).resolve()
+    if p.parent != PROFILE_DIR.resolve() or not p.is_file():
+        return None
+    return p
+
+def install(app, is_admin):
+    """is_admin() -> bool for the current request (admins may force a profile)."""
+
+    @app.before_request
+    def _profile_start():
+        mode, forced = _requested_mode(is_admin)
+        if mode is None:
+            return
+        mode, prof = _start(mode)
+        g.pv_profile = (mode, prof, forced, time.perf_counter())
+
+    @app.after_request
+    def _profile_finish(resp):
+        state = g.pop("pv_profile", None)
+        if state is None:
+            return resp
+        mode, prof, forced, t0 = state
+        _stop(mode, prof)
+        duration_ms = (time.perf_counter() - t0) * 1000.0
+        if not forced and duration_ms < SLOW_MS:
+            return resp
+        now = datetime.utcnow()
+        meta = {
+            "id": now.strftime("%Y%m%dT%H%M%S%f") + "-" + uuid.uuid4().hex[:6],
+            "created_at": now.isoformat(timespec="seconds"),
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": request.endpoint,
+            "status": resp.status_code,
+            "duration_ms": round(duration_ms, 1),
+            "mode": mode,
+            "trigger": "admin" if forced else "sampled",
+            "pid": os.getpid(),
+        }
+        try:
+            _write(mode, prof, meta)
+            resp.headers["X-PV-Profile-Id"] = meta["id"]
+        except Exception as e:
+            print("[PROFILE] could not write profile:", repr(e))
+        return resp
+
+    @app.teardown_request
+    def _profile_cleanup(_exc):
+        # a request that never reached after_request must not leave a profiler running
+        state = g.pop("pv_profile", None)
+        if state is not None:
+            _stop(state[0], state[1])
@@ -0,0 +1,121 @@
+# routes/cleanup.py — admin review of before/after cleanup comparisons (ai/cleanup.py)
+#
+# The GET views only read CleanupComparison rows. Comparisons are computed by
+# tools/compare_cleanups.py, or a batch at a time by the POST actions below.
+from datetime import datetime
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, abort
+from flask_login import login_required, current_user
+
+from models import db, Submission, CleanupComparison
+from ai import cleanup
+from app import verifier   # its ScoreCache also holds the cleanup thumbnails
+
+bp_cleanup = Blueprint("bp_cleanup", __name__)
+
+BATCH = 50   # reports compared per "Compare next" click
+
+def admin_required():
+    return current_user.is_authenticated and getattr(current_user, "role", "") == "admin"
+
+def _run(afters):
+    """-> False if another admin (or the tool) stored the same reports first."""
+    results = cleanup.compare_many(afters, current_app.root_path, cache=verifier.cache)
+    return cleanup.save(db, results)
+
+@bp_cleanup.route("/admin/cleanup")
+@login_required
+def cleanup_admin():
+    if not admin_required():
+        flash("Admin only")
+        return redirect(url_for("index"))
+
+    verdict = request.args.get("verdict", "cleaned")
+    state = request.args.get("state", "unreviewed")
+    waiting = cleanup.pending_query().count()
+
+    q = CleanupComparison.query.filter(CleanupComparison.rank == 1,
+                                       CleanupComparison.method == cleanup.METHOD)
+    if verdict in cleanup.VERDICTS:
+        q = q.filter(CleanupComparison.verdict == verdict)
+    if state in ("unreviewed", "confirmed", "rejected"):
+        q = q.filter(CleanupComparison.human_state == state)
+    rows = q.order_by(CleanupComparison.confidence.desc(), CleanupComparison.id.desc()).limit(100).all()
+
+    # other candidates and both submissions for every card, one query each
+    after_ids = [r.after_id for r in rows]
+    others = {}
+    if after_ids:
+        for o in (CleanupComparison.query
+                  .filter(CleanupComparison.after_id.in_(after_ids), CleanupComparison.rank > 1)
+                  .order_by(CleanupComparison.rank).all()):
+            others.setdefault(o.after_id, []).append(o)
+    sub_ids = set(after_ids) | {r.before_id for r in rows if r.before_id}
+    subs = {s.id: s for s in Submission.query.filter(Submission.id.in_(sub_ids)).all()} if sub_ids else {}
+
+    counts = dict(db.session.query(CleanupComparison.verdict, db.func.count(CleanupComparison.id))
+                  .filter(CleanupComparison.rank == 1, CleanupComparison.method == cleanup.METHOD)
+                  .group_by(CleanupComparison.verdict).all())
+    return render_template("admin_cleanup.html", rows=rows, others=others, subs=subs, counts=counts,
+                           verdicts=cleanup.VERDICTS, verdict=verdict, state=state, waiting=waiting, batch=BATCH,
+                           radius_m=cleanup.RADIUS_M, lookback_days=cleanup.LOOKBACK_DAYS,
+                           min_confidence=cleanup.MIN_CONFIDENCE)
+
+@bp_cleanup.route("/admin/cleanup/compute", methods=["POST"])
+@login_required
+def cleanup_compute():
+    if not admin_required():
+        flash("Admin only")
+        return redirect(url_for("index"))
+    afters = cleanup.pending(limit=BATCH)
+    if not afters:
+        flash("Every volunteer works report is already compared.")
+    elif _run(afters):
+        flash(f"Compared {len(afters)} new report(s).")
+    else:
+        flash("These reports were compared meanwhile by another run; showing those results.")
+    return redirect(request.referrer or url_for("bp_cleanup.cleanup_admin"))
+
+@bp_cleanup.route("/admin/cleanup/<int:cid>/<decision>", methods=["POST"])
+@login_required
+def cleanup_decide(cid, decision):
+    if not admin_required():
+        flash("Admin only")
+        return redirect(url_for("index"))
+    if decision not in ("confirm", "reject", "reset"):
+        abort(400)
+    row = CleanupComparison.query.get_or_404(cid)
+    row.human_state = {"confirm": "confirmed", "reject": "rejected", "reset": "unreviewed"}[decision]
+    row.reviewed_by = current_user.id if decision != "reset" else None
+    row.reviewed_at = datetime.utcnow() if decision != "reset" else None
+    db.session.commit()
+    flash(f"Comparison #{row.id}: {row.human_state}")
+    return redirect(request.referrer or url_for("bp_cleanup.cleanup_admin"))
+
+@bp_cleanup.route("/api/v1/cleanup/<int:sid>", methods=["GET", "POST"])
+@login_required
+def cleanup_api(sid):
+    """
+    Comparisons for one volunteer_works report. GET returns what is stored
+    ("pending": true if not compared yet); POST (re)computes them first.
+    """
+    if not admin_required():
+        return jsonify({"error": "admin only"}), 403
+    sub = Submission.query.get_or_404(sid)
+    if sub.report_type != cleanup.AFTER_TYPE:
+        return jsonify({"error": f"submission {sid} is not a {cleanup.AFTER_TYPE} report"}), 400
+    if request.method == "POST":
+        if sub.lat is None or sub.lon is None:
+            return jsonify({"submission_id": sid, "error": "no GPS location", "comparisons": []}), 422
+        if not _run([sub]):
+            return jsonify({"submission_id": sid, "error": "being compared by another run, try again"}), 409
+    rows = (CleanupComparison.query.filter_by(after_id=sid, method=cleanup.METHOD)
+            .order_by(CleanupComparison.rank).all())
+    best = rows[0] if rows else None
+    return jsonify({
+        "submission_id": sid,
+        "pending": best is None,
+        "cleaned_confidence": best.confidence if best else None,
+        "verdict": best.verdict if best else None,
+        "comparisons": [cleanup.as_dict(r) for r in rows],
+    })
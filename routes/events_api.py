@@ -1,14 +1,23 @@
 # routes/events_api.py
 import os, json, uuid, datetime
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, abort
+from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from models import db, Incident  # we'll add Incident to models.py in step 2
+from sqlalchemy.exc import IntegrityError
+from models import db, Incident
 
 bp_events = Blueprint("bp_events", __name__)
 
+# Batch limits (cameras buffer events while offline and flush them in one go)
+EVENTS_BATCH_MAX = int(os.getenv("EVENTS_BATCH_MAX", "100"))
+EVENTS_BATCH_MAX_BYTES = int(os.getenv("EVENTS_BATCH_MAX_BYTES", str(200 * 1024 * 1024)))
+
 # Simple token check (recommended)
-def check_auth(req):
-    token = req.headers.get("X-API-TOKEN") or req.form.get("api_token")
+def check_auth(req, allow_form=True):
+    # allow_form=False: header only, so the body is not read before the check
+    token = req.headers.get("X-API-TOKEN")
+    if not token and allow_form:
+        token = req.form.get("api_token")
     expected = os.getenv("API_TOKEN", "")
     return (expected != "") and (token == expected)
 
@@ -16,6 +25,68 @@ def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
     return path
 
+def _events_dir():
+    return ensure_dir(os.path.join(current_app.root_path, "static", "uploads", "events"))
+
+def _new_uid():
+    ts = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    return f"{ts}_{uuid.uuid4().hex[:8]}"
+
+def _idempotency_key(meta: dict, camera_id: str, header_key: str | None = None):
+    """Scope the camera-supplied key to the camera so two cameras can't collide."""
+    key = header_key or meta.get("idempotency_key") or meta.get("event_id")
+    if not key:
+        return None
+    return f"{camera_id}:{str(key).strip()}"[:160]
+
+def _save_event_files(uid, clip_file, image_file):
+    """Save clip/image under static/uploads/events; returns (rel_clip, rel_img)."""
+    base_dir = _events_dir()
+    rel_clip, rel_img = "", ""
+
+    if clip_file:
+        clip_name = secure_filename(f"{uid}.mp4")
+        clip_file.save(os.path.join(base_dir, clip_name))
+        rel_clip = f"/static/uploads/events/{clip_name}"
+
+    if image_file:
+        img_name = secure_filename(f"{uid}.jpg")
+        image_file.save(os.path.join(base_dir, img_name))
+        rel_img = f"/static/uploads/events/{img_name}"
+
+    return rel_clip, rel_img
+
+def _remove_event_files(*rel_paths):
+    for rel in rel_paths:
+        if not rel:
+            continue
+        try:
+            os.remove(os.path.join(current_app.root_path, rel.lstrip("/")))
+        except OSError:
+            pass
+
+def _existing_keys(keys):
+    """Map idempotency_key -> incident id for keys already stored (one query)."""
+    keys = [k for k in keys if k]
+    if not keys:
+        return {}
+    rows = (db.session.query(Incident.idempotency_key, Incident.id)
+            .filter(Incident.idempotency_key.in_(keys))
+            .all())
+    return {k: i for k, i in rows}
+
+def _build_incident(meta, rel_clip, rel_img, key):
+    return Incident(
+        camera_id=meta.get("camera_id", "unknown_cam"),
+        event_type=meta.get("event_type", "litter_event"),
+        confidence=str(meta.get("confidence", "")),
+        image_path=rel_img,
+        video_path=rel_clip,
+        meta_json=json.dumps(meta),
+        status="pending",
+        idempotency_key=key,
+    )
+
 @bp_events.route("/events", methods=["POST"])
 def ingest_event():
     if not check_auth(request):
@@ -29,42 +100,32 @@ def ingest_event():
 
     camera_id  = meta.get("camera_id", "unknown_cam")
     event_type = meta.get("event_type", "litter_event")
-    confidence = str(meta.get("confidence", ""))
 
     clip_file  = request.files.get("clip")
     image_file = request.files.get("image")
     if not (clip_file or image_file):
         return jsonify({"ok": False, "error": "no files provided"}), 400
 
-    ts = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    uid = f"{ts}_{uuid.uuid4().hex[:8]}"
-
-    base_dir = ensure_dir(os.path.join(current_app.root_path, "static", "uploads", "events"))
-    rel_clip, rel_img = "", ""
+    # Retried upload? answer with the incident we already have.
+    key = _idempotency_key(meta, camera_id, request.headers.get("Idempotency-Key"))
+    seen = _existing_keys([key])
+    if key in seen:
+        return jsonify({"ok": True, "id": seen[key], "duplicate": True}), 200
 
-    if clip_file:
-        clip_name = secure_filename(f"{uid}.mp4")
-        clip_path = os.path.join(base_dir, clip_name)
-        clip_file.save(clip_path)
-        rel_clip = f"/static/uploads/events/{clip_name}"
+    rel_clip, rel_img = _save_event_files(_new_uid(), clip_file, image_file)
 
-    if image_file:
-        img_name = secure_filename(f"{uid}.jpg")
-        img_path = os.path.join(base_dir, img_name)
-        image_file.save(img_path)
-        rel_img = f"/static/uploads/events/{img_name}"
-
-    incident = Incident(
-        camera_id=camera_id,
-        event_type=event_type,
-        confidence=confidence,
-        image_path=rel_img,
-        video_path=rel_clip,
-        meta_json=json.dumps(meta),
-        status="pending",
-    )
+    incident = _build_incident(meta, rel_clip, rel_img, key)
     db.session.add(incident)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # lost a race with a concurrent retry of the same event
+        db.session.rollback()
+        _remove_event_files(rel_clip, rel_img)
+        seen = _existing_keys([key])
+        if key in seen:
+            return jsonify({"ok": True, "id": seen[key], "duplicate": True}), 200
+        raise
 
     return jsonify({
         "ok": True,
@@ -74,3 +135,163 @@ def ingest_event():
         "image_url": rel_img,
         "video_url": rel_clip
     }), 201
+
+def _read_ndjson():
+    """
+    Batch metadata comes as NDJSON, either in the `events` form field or as an
+    `events` file part. One JSON object per line.
+    """
+    raw = request.form.get("events")
+    if raw is None and "events" in request.files:
+        raw = request.files["events"].read().decode("utf-8", errors="replace")
+    lines = []
+    for line in (raw or "").splitlines():
+        line = line.strip()
+        if line:
+            lines.append(line)
+    return lines
+
+@bp_events.route("/events/batch", methods=["POST"])
+def ingest_events_batch():
+    """
+    Many events in one multipart request.
+
+      events  NDJSON, one object per event, e.g.
+              {"camera_id": "cam-07", "idempotency_key": "1718000000-3",
+               "event_type": "litter_event", "confidence": 0.91,
+               "clip": "clip_3", "image": "img_3"}
+      clip_3, img_3, ...  file parts referenced by each line's clip/image
+
+    All new incidents are inserted with a single flush/commit. Events whose
+    idempotency key was already ingested are reported as duplicates and their
+    files are not written again.
+
+    The token must come in the X-API-TOKEN header: the body is up to
+    EVENTS_BATCH_MAX_BYTES and is not parsed for an unauthenticated caller.
+    """
+    if not check_auth(request, allow_form=False):
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+
+    # clips add up quickly; lift the global 10 MB cap for this endpoint only
+    request.max_content_length = EVENTS_BATCH_MAX_BYTES
+
+    lines = _read_ndjson()
+    if not lines:
+        return jsonify({"ok": False, "error": "no events provided"}), 400
+    if len(lines) > EVENTS_BATCH_MAX:
+        return jsonify({"ok": False, "error": f"too many events (max {EVENTS_BATCH_MAX})"}), 413
+
+    results = [None] * len(lines)
+    parsed = []  # (index, meta, key, clip_file, image_file)
+    for i, line in enumerate(lines):
+        try:
+            meta = json.loads(line)
+            if not isinstance(meta, dict):
+                raise ValueError("event must be a JSON object")
+        except Exception as e:
+            results[i] = {"index": i, "ok": False, "error": f"bad json: {e}"}
+            continue
+
+        clip_file = request.files.get(meta.pop("clip", "") or "")
+        image_file = request.files.get(meta.pop("image", "") or "")
+        if not (clip_file or image_file):
+            results[i] = {"index": i, "ok": False, "error": "no files provided"}
+            continue
+
+        key = _idempotency_key(meta, meta.get("camera_id", "unknown_cam"))
+        parsed.append((i, meta, key, clip_file, image_file))
+
+    # duplicates: already stored, or repeated inside this very batch
+    seen = _existing_keys([p[2] for p in parsed])
+    fresh, batch_keys = [], {}
+    for i, meta, key, clip_file, image_file in parsed:
+        if key and key in seen:
+            results[i] = {"index": i, "ok": True, "id": seen[key], "duplicate": True}
+        elif key and key in batch_keys:
+            results[i] = {"index": i, "ok": True, "duplicate_of_index": batch_keys[key], "duplicate": True}
+        else:
+            if key:
+                batch_keys[key] = i
+            fresh.append((i, meta, key, clip_file, image_file))
+
+    pending = []  # (index, incident)
+    for i, meta, key, clip_file, image_file in fresh:
+        rel_clip, rel_img = _save_event_files(_new_uid(), clip_file, image_file)
+        pending.append((i, _build_incident(meta, rel_clip, rel_img, key)))
+
+    if pending:
+        db.session.add_all([inc for _, inc in pending])
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent retry stored some of these keys first: drop those and
+            # insert the rest in one more round.
+            db.session.rollback()
+            raced = _existing_keys([inc.idempotency_key for _, inc in pending])
+            keep = []
+            for i, inc in pending:
+                if inc.idempotency_key in raced:
+                    _remove_event_files(inc.video_path, inc.image_path)
+                    results[i] = {"index": i, "ok": True, "id": raced[inc.idempotency_key], "duplicate": True}
+                else:
+                    keep.append((i, _build_incident(json.loads(inc.meta_json), inc.video_path,
+                                                    inc.image_path, inc.idempotency_key)))
+            pending = keep
+            db.session.add_all([inc for _, inc in pending])
+            db.session.commit()
+
+    for i, inc in pending:
+        results[i] = {"index": i, "ok": True, "id": inc.id, "duplicate": False,
+                      "image_url": inc.image_path, "video_url": inc.video_path}
+
+    # resolve in-batch repeats to the id that was just created
+    for r in results:
+        if r and "duplicate_of_index" in r:
+            r["id"] = results[r.pop("duplicate_of_index")].get("id")
+
+    created = len(pending)
+    return jsonify({
+        "ok": True,
+        "created": created,
+        "duplicates": sum(1 for r in results if r and r.get("duplicate")),
+        "failed": sum(1 for r in results if r and not r.get("ok")),
+        "results": results,
+    }), (201 if created else 200)
+
+# -------------------------------------------------
+# Moderator triage: incidents ranked by AI score
+# -------------------------------------------------
+@bp_events.route("/events/incidents")
+@login_required
+def incidents_triage():
+    if getattr(current_user, "role", None) != "admin":
+        abort(403)
+
+    status = request.args.get("status", "pending")
+    limit = min(500, int(request.args.get("limit", 100)))
+    min_score = request.args.get("min_score", type=float)
+
+    q = Incident.query
+    if status != "all":
+        q = q.filter(Incident.status == status)
+    if min_score is not None:
+        q = q.filter(Incident.ai_score >= min_score)
+    # analysed incidents by score first, then the ones still waiting for analysis
+    q = q.order_by(Incident.ai_score.is_(None), Incident.ai_score.desc(), Incident.created_at.desc())
+
+    rows = q.limit(limit).all()
+    return jsonify({"incidents": [{
+        "id": r.id,
+        "camera_id": r.camera_id,
+        "event_type": r.event_type,
+        "status": r.status,
+        "ai_score": r.ai_score,
+        "ai_label": r.ai_label,
+        "frames_scored": r.frames_scored,
+        "analysed": r.analysed_at is not None,
+        "analysis_error": r.analysis_error,
+        "thumb_url": r.thumb_path or r.image_path or "",
+        "image_url": r.image_path,
+        "video_url": r.video_path,
+        "created_at": r.created_at.isoformat() if r.created_at else None,
+    } for r in rows]})
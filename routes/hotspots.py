@@ -3,14 +3,20 @@ from flask import Blueprint, request, jsonify, Response, abort
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo  # Python 3.9+; on Windows you may need: pip install tzdata
-from models import Submission
+from models import Submission, HotspotRollup, HotspotTrend
+from sqlalchemy.orm import joinedload
 from math import floor
 import random, csv, io
 from app import limiter  # import limiter instance
+from db_profile import read_replica
+from geo.dzongkhags import get_resolver
+from geo import clusters, trends
 from collections import defaultdict
 
 bp_hotspots = Blueprint("bp_hotspots", __name__, url_prefix="/api/v1")
 
+REPORT_TYPES = ("illegal_dumping", "volunteer_works", "dirty_area")   # ?type= values that filter
+
 # ----------------
 # Helpers / policy
 # ----------------
@@ -36,28 +42,51 @@ def _apply_common_filters(q, since, until=None, report_type="all", dzongkhag="al
     q = q.filter(Submission.status == "AUTO_OK")
 
     # category
-    if report_type in ("illegal_dumping", "volunteer_works"):
+    if report_type in REPORT_TYPES:
         q = q.filter(Submission.report_type == report_type)
 
-    # dzongkhag simple bounding boxes (rough & fast)
-    DZ_BBOX = {
-        "thimphu": (27.30, 27.60, 89.45, 89.80),
-        "paro":    (27.30, 27.70, 89.20, 89.60),
-        "punakha": (27.50, 27.90, 89.65, 90.10),
-        "wangdue": (27.30, 27.80, 89.70, 90.30),
-        "chukha":  (26.75, 27.35, 89.30, 89.85),
-    }
-    dz = (dzongkhag or "all").strip().lower()
-    if dz != "all" and dz in DZ_BBOX:
-        la0, la1, lo0, lo1 = DZ_BBOX[dz]
-        q = q.filter(Submission.lat >= la0, Submission.lat <= la1,
-                     Submission.lon >= lo0, Submission.lon <= lo1)
+    return _dz_filter(q, Submission.dzongkhag, dzongkhag)
 
+def _dz_filter(q, column, dzongkhag="all"):
+    # dzongkhag is resolved at ingest (geo/dzongkhags.py), so this is an indexed equality match
+    dz = (dzongkhag or "all").strip().lower()
+    if dz != "all":
+        q = q.filter(column == dz)
     return q
 
-def _aggregate_round(rows, decimals=3):
-    """Round lat/lon to small tiles and count."""
-    bins = {}
+def _parse_bbox(raw):
+    """"west,south,east,north" -> tuple of floats, or None if missing or malformed."""
+    try:
+        west, south, east, north = map(float, raw.split(","))
+        return west, south, east, north
+    except Exception:
+        return None
+
+def _rollup_bins(since, until=None, report_type="all", dzongkhag="all", decimals=3, bbox=None):
+    """
+    {(lat, lon): count} from HotspotRollup, i.e. approved reports that the
+    retention job has already deleted. Day-granular, same filters as above.
+    """
+    q = HotspotRollup.query.filter(HotspotRollup.day >= since.date())
+    if until is not None:
+        q = q.filter(HotspotRollup.day <= until.date())
+    if report_type in REPORT_TYPES:
+        q = q.filter(HotspotRollup.report_type == report_type)
+    if bbox is not None:
+        west, south, east, north = bbox
+        # tiles are floored to 4 decimals, so one starting just outside may hold points inside
+        q = q.filter(HotspotRollup.tile_lon.between(_round_coord(west, 4), east),
+                     HotspotRollup.tile_lat.between(_round_coord(south, 4), north))
+    q = _dz_filter(q, HotspotRollup.dzongkhag, dzongkhag)
+
+    bins = defaultdict(int)
+    for r in q.all():
+        bins[(_round_coord(r.tile_lat, decimals), _round_coord(r.tile_lon, decimals))] += r.count
+    return bins
+
+def _aggregate_round(rows, decimals=3, extra=None):
+    """Round lat/lon to small tiles and count (plus any rolled-up `extra` bins)."""
+    bins = dict(extra or {})
     for r in rows:
         if r.lat is None or r.lon is None:
             continue
@@ -86,6 +115,7 @@ def _get_thimphu_tz():
 # A) HEAT POINTS (admin)
 @bp_hotspots.route("/heat_points")
 @login_required
+@read_replica
 def heat_points_admin():
     if not _is_admin():
         abort(403)
@@ -95,18 +125,15 @@ def heat_points_admin():
     dzongkhag = request.args.get("dzongkhag", "all")
 
     # optional map bbox for performance
-    bbox = request.args.get("bbox")  # west,south,east,north
+    bbox = _parse_bbox(request.args.get("bbox", ""))  # west,south,east,north
     since = datetime.utcnow() - timedelta(days=days)
     q = Submission.query
     q = _apply_common_filters(q, since, report_type=report_type, dzongkhag=dzongkhag)
 
-    if bbox:
-        try:
-            west, south, east, north = map(float, bbox.split(","))
-            q = q.filter(Submission.lon.between(west, east),
-                         Submission.lat.between(south, north))
-        except Exception:
-            pass
+    if bbox is not None:
+        west, south, east, north = bbox
+        q = q.filter(Submission.lon.between(west, east),
+                     Submission.lat.between(south, north))
 
     rows = q.all()
     points = []
@@ -115,11 +142,16 @@ def heat_points_admin():
             continue
         w = 1.0 if (r.ai_label == "valid_report") else 0.6
         points.append([float(r.lat), float(r.lon), float(w)])
+    # purged history: one weighted point per rolled-up tile
+    for (lat, lon), cnt in _rollup_bins(since, report_type=report_type, dzongkhag=dzongkhag,
+                                        decimals=4, bbox=bbox).items():
+        points.append([float(lat), float(lon), float(cnt)])
     return jsonify({"points": points, "total": len(points), "since_days": days})
 
 # B) COLOR BUCKETS (admin)
 @bp_hotspots.route("/tiles_buckets")
 @login_required
+@read_replica
 def tiles_buckets_admin():
     if not _is_admin():
         abort(403)
@@ -133,8 +165,9 @@ def tiles_buckets_admin():
     q = _apply_common_filters(q, since, report_type=report_type, dzongkhag=dzongkhag)
 
     rows = q.all()
-    total = len(rows)
-    bins = _aggregate_round(rows, decimals=3)
+    history = _rollup_bins(since, report_type=report_type, dzongkhag=dzongkhag, decimals=3)
+    total = len(rows) + sum(history.values())
+    bins = _aggregate_round(rows, decimals=3, extra=history)
 
     out = []
     if total < 100:
@@ -182,6 +215,7 @@ def tiles_buckets_admin():
 # C) HOTSPOT PINS (admin)
 @bp_hotspots.route("/hotspot_pins")
 @login_required
+@read_replica
 def hotspot_pins_admin():
     if not _is_admin():
         abort(403)
@@ -192,13 +226,59 @@ def hotspot_pins_admin():
     min_count = int(request.args.get("min_count", 4))
     min_users = int(request.args.get("min_users", 2))
 
+    if request.args.get("mode", "clusters") == "tiles":
+        return _tile_pins(days, report_type, dzongkhag, min_count, min_users)
+
+    try:
+        eps_m = float(request.args.get("eps_m", clusters.EPS_M))
+        min_pts = int(request.args.get("min_pts", clusters.MIN_PTS))
+    except ValueError:
+        return jsonify({"error": "eps_m and min_pts must be numbers"}), 400
+    if not (0 < eps_m < float("inf")) or min_pts < 1:
+        return jsonify({"error": "eps_m must be > 0 and min_pts >= 1"}), 400
+
+    since = datetime.utcnow() - timedelta(days=days)
+
+    def fetch(after_id):
+        q = Submission.query.with_entities(Submission.id, Submission.lat, Submission.lon, Submission.user_id,
+                                           Submission.report_type, Submission.created_at)
+        q = _apply_common_filters(q, since, report_type=report_type, dzongkhag=dzongkhag)
+        q = q.filter(Submission.id > after_id, Submission.lat.isnot(None), Submission.lon.isnot(None))
+        for r in q.order_by(Submission.id.asc()).all():
+            yield r.id, r.lat, r.lon, {"user_id": r.user_id, "report_type": r.report_type,
+                                       "created_at": r.created_at}
+
+    key = (days, report_type, (dzongkhag or "all").lower(), eps_m, min_pts)
+    engine = clusters.cache.get(key, fetch, eps_m=eps_m, min_pts=min_pts, since=since)
+
+    feats = []
+    for c in engine.clusters():
+        if c["count"] < min_count or c["users"] < min_users:
+            continue
+        feats.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [float(c["lon"]), float(c["lat"])]},
+            "properties": {
+                "label": "HOTSPOT",
+                "count_7d": int(c["count"]),
+                "users_7d": int(c["users"]),
+                "top_category": report_type if report_type in REPORT_TYPES else c["top_category"],
+                "radius_m": c["radius_m"],
+                "cluster_id": c["cluster_id"],
+            }
+        })
+
+    return jsonify({"type": "FeatureCollection", "features": feats, "since_days": days,
+                    "mode": "clusters", "eps_m": eps_m, "min_pts": min_pts, "points": len(engine)})
+
+def _tile_pins(days, report_type, dzongkhag, min_count, min_users):
+    """Legacy pins: fixed 0.001° tiles (?mode=tiles)."""
     since = datetime.utcnow() - timedelta(days=days)
     q = Submission.query
     q = _apply_common_filters(q, since, report_type=report_type, dzongkhag=dzongkhag)
 
     rows = q.all()
 
-    from collections import defaultdict
     tile_counts = defaultdict(int)
     tile_users  = defaultdict(set)
     tile_centroid = defaultdict(lambda: [0.0, 0.0, 0])  # sum_lat, sum_lon, n
@@ -229,11 +309,43 @@ def hotspot_pins_admin():
                     "label": "HOTSPOT",
                     "count_7d": int(cnt),
                     "users_7d": int(users),
-                    "top_category": report_type if report_type in ("illegal_dumping","volunteer_works") else "mixed"
+                    "top_category": report_type if report_type in REPORT_TYPES else "mixed"
                 }
             })
 
-    return jsonify({"type": "FeatureCollection", "features": feats, "since_days": days})
+    return jsonify({"type": "FeatureCollection", "features": feats, "since_days": days, "mode": "tiles"})
+
+# D) EMERGING HOTSPOTS (admin) — tiles getting worse week over week
+@bp_hotspots.route("/emerging_hotspots")
+@login_required
+@read_replica
+def emerging_hotspots_admin():
+    if not _is_admin():
+        abort(403)
+
+    limit = min(int(request.args.get("limit", 20)), 200)
+    min_count = int(request.args.get("min_count", 3))
+    min_z = float(request.args.get("min_z", trends.MIN_Z))
+    dzongkhag = request.args.get("dzongkhag", "all")
+
+    # scores are kept up to date on every AUTO_OK (geo/trends.py); only read recent tiles
+    q = HotspotTrend.query.filter(HotspotTrend.last_seen_at >= trends.recent_cutoff())
+    q = _dz_filter(q, HotspotTrend.dzongkhag, dzongkhag)
+    ranked = trends.emerging(q.all(), limit=limit, min_count=min_count, min_z=min_z)
+
+    feats = []
+    for r in ranked:
+        props = {k: v for k, v in r.items() if k not in ("lat", "lon")}
+        props["label"] = "EMERGING"
+        props["last_seen_at"] = r["last_seen_at"].isoformat() if r["last_seen_at"] else None
+        feats.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [float(r["lon"]), float(r["lat"])]},
+            "properties": props,
+        })
+
+    return jsonify({"type": "FeatureCollection", "features": feats,
+                    "half_life_days": {"fast": trends.FAST_HL_DAYS, "slow": trends.SLOW_HL_DAYS}})
 
 # ----------------------------
 # Keep your existing endpoints
@@ -243,11 +355,12 @@ def hotspot_pins_admin():
 def dzongkhags():
     if not _is_admin():
         abort(403)
-    names = ["all", "thimphu", "paro", "punakha", "wangdue", "chukha"]
+    names = ["all"] + get_resolver().names()
     return jsonify({"dzongkhags": names})
 
 @bp_hotspots.route("/hotspots")
 @login_required
+@read_replica
 def hotspots_admin_legacy():
     if not _is_admin():
         abort(403)
@@ -261,11 +374,13 @@ def hotspots_admin_legacy():
     q = _apply_common_filters(q, since, report_type=report_type, dzongkhag=dzongkhag)
 
     rows = q.all()
-    bins = _aggregate_round(rows, decimals=4)  # finer bins for admins
-    return jsonify({"bins": bins, "total": len(rows), "since_days": days})
+    history = _rollup_bins(since, report_type=report_type, dzongkhag=dzongkhag, decimals=4)
+    bins = _aggregate_round(rows, decimals=4, extra=history)  # finer bins for admins
+    return jsonify({"bins": bins, "total": len(rows) + sum(history.values()), "since_days": days})
 
 @bp_hotspots.route("/public_hotspots")
 @limiter.limit("10 per minute")
+@read_replica
 def hotspots_public():
     days = int(request.args.get("days", 30))
     report_type = request.args.get("type", "all")
@@ -279,7 +394,8 @@ def hotspots_public():
     q = _apply_common_filters(q, since, until=until, report_type=report_type, dzongkhag=dzongkhag)
 
     rows = q.all()
-    bins = _aggregate_round(rows, decimals=3)
+    history = _rollup_bins(since, until=until, report_type=report_type, dzongkhag=dzongkhag, decimals=3)
+    bins = _aggregate_round(rows, decimals=3, extra=history)
     out = []
     for b in bins:
         out.append({
@@ -287,13 +403,14 @@ def hotspots_public():
             "lon": _jitter(b["lon"]),
             "count": b["count"]
         })
-    return jsonify({"bins": out, "total": len(rows), "since_days": days, "delayed": True})
+    return jsonify({"bins": out, "total": len(rows) + sum(history.values()), "since_days": days, "delayed": True})
 
 # -----------------------------
 # Admin CSV (investor-friendly)
 # -----------------------------
 @bp_hotspots.route("/export_csv")
 @login_required
+@read_replica
 def export_csv():
     """
     Investor-safe CSV:
@@ -310,7 +427,7 @@ def export_csv():
     dzongkhag = request.args.get("dzongkhag", "all")
 
     since = datetime.utcnow() - timedelta(days=since_days)
-    q = Submission.query
+    q = Submission.query.options(joinedload(Submission.user))  # r.user.username per row
     q = _apply_common_filters(q, since, report_type=report_type, dzongkhag=dzongkhag)
 
     rows = q.all()
@@ -372,6 +489,7 @@ def export_csv():
 # -------------------------------------------------
 @bp_hotspots.route("/tile_details")
 @login_required
+@read_replica
 def tile_details_admin():
     if not _is_admin():
         abort(403)
@@ -431,6 +549,7 @@ def tile_details_admin():
 # ----------------------------------------------------
 @bp_hotspots.route("/public_tile_details")
 @limiter.limit("10 per minute")
+@read_replica
 def public_tile_details():
     try:
         lat = float(request.args.get("lat"))
@@ -2,9 +2,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from sqlalchemy import asc
-import random
+from sqlalchemy.orm import joinedload
 
 from models import db, User, SupwPlace, SupwAssignment
+from supw_assign import assign_manual, assign_balanced, assign_nearest
 
 bp_supw = Blueprint("bp_supw", __name__)
 
@@ -12,6 +13,24 @@ bp_supw = Blueprint("bp_supw", __name__)
 def admin_required():
     return current_user.is_authenticated and getattr(current_user, "role", "") == "admin"
 
+def _num_or_none(raw, cast=float):
+    raw = (raw or "").strip()
+    if not raw:
+        return None
+    try:
+        return cast(raw)
+    except ValueError:
+        return None
+
+def _apply_geo_fields(p, form):
+    # only touch fields the form actually sent (blank clears them)
+    if "lat" in form:
+        p.lat = _num_or_none(form.get("lat"))
+    if "lon" in form:
+        p.lon = _num_or_none(form.get("lon"))
+    if "capacity" in form:
+        p.capacity = _num_or_none(form.get("capacity"), int)
+
 # -------------------
 # USER: My assignments
 # -------------------
@@ -20,6 +39,7 @@ def admin_required():
 def supw_my():
     assigns = (SupwAssignment
                .query
+               .options(joinedload(SupwAssignment.place))
                .filter_by(user_id=current_user.id)
                .join(SupwPlace, SupwAssignment.place_id == SupwPlace.id)
                .order_by(asc(SupwPlace.name))
@@ -39,13 +59,16 @@ def supw_admin():
     users = User.query.order_by(asc(User.username)).all()
     places = SupwPlace.query.order_by(asc(SupwPlace.name)).all()
 
-    # current assignments grouped by place
-    by_place = {}
-    for p in places:
-        by_place[p.id] = {
-            "place": p,
-            "users": [a.user for a in p.assignments]
-        }
+    # current assignments grouped by place (one query, users joined in)
+    by_place = {p.id: {"place": p, "users": [], "assignments": []} for p in places}
+    assigns = (SupwAssignment.query
+               .options(joinedload(SupwAssignment.user))
+               .order_by(asc(SupwAssignment.id))
+               .all())
+    for a in assigns:
+        if a.place_id in by_place:
+            by_place[a.place_id]["users"].append(a.user)
+            by_place[a.place_id]["assignments"].append(a)
 
     return render_template("supw_admin.html",
                            users=users,
@@ -71,6 +94,7 @@ def supw_place_create():
         return redirect(url_for("bp_supw.supw_admin"))
 
     p = SupwPlace(name=name, description=desc, active=True)
+    _apply_geo_fields(p, request.form)
     db.session.add(p); db.session.commit()
     flash("Place created.")
     return redirect(url_for("bp_supw.supw_admin"))
@@ -86,6 +110,7 @@ def supw_place_update(pid):
     p.name = (request.form.get("name") or p.name).strip()
     p.description = (request.form.get("description") or p.description).strip()
     p.active = True if request.form.get("active", "1") == "1" else False
+    _apply_geo_fields(p, request.form)
     db.session.commit()
     flash("Place updated.")
     return redirect(url_for("bp_supw.supw_admin"))
@@ -117,20 +142,18 @@ def supw_assign_manual():
         return redirect(url_for("bp_supw.supw_admin"))
 
     p = SupwPlace.query.get_or_404(place_id)
-    inserted = 0
+    ids = []
     for uid in user_ids:
         try:
-            uid = int(uid)
-            if not SupwAssignment.query.filter_by(place_id=p.id, user_id=uid).first():
-                db.session.add(SupwAssignment(place_id=p.id, user_id=uid))
-                inserted += 1
-        except Exception:
+            ids.append(int(uid))
+        except ValueError:
             pass
+    inserted = assign_manual(p.id, ids)
     db.session.commit()
     flash(f"Assigned {inserted} user(s) to {p.name}.")
     return redirect(url_for("bp_supw.supw_admin"))
 
-# ---- Random distribute: spread selected (or all) users across SELECTED places ----
+# ---- Random distribute: spread selected (or all) users across SELECTED places, balancing load ----
 @bp_supw.route("/admin/supw/assign/random", methods=["POST"])
 @login_required
 def supw_assign_random():
@@ -142,7 +165,7 @@ def supw_assign_random():
     user_ids = []
     if mode_all:
         # all non-admin users
-        user_ids = [u.id for u in User.query.filter(User.role != "admin").all()]
+        user_ids = [uid for (uid,) in db.session.query(User.id).filter(User.role != "admin")]
     else:
         user_ids = [int(x) for x in request.form.getlist("user_ids")]
 
@@ -152,19 +175,39 @@ def supw_assign_random():
         flash("Pick at least one user and one place (or select 'All users').")
         return redirect(url_for("bp_supw.supw_admin"))
 
-    random.shuffle(user_ids)
-    placed = 0
-    i = 0
-    for uid in user_ids:
-        pid = place_ids[i % len(place_ids)]
-        if not SupwAssignment.query.filter_by(place_id=pid, user_id=uid).first():
-            db.session.add(SupwAssignment(place_id=pid, user_id=uid))
-            placed += 1
-        i += 1
+    # least-loaded place first (counting existing assignments), random tie-breaks
+    placed = assign_balanced(user_ids, place_ids)
     db.session.commit()
     flash(f"Randomly assigned {placed} user(s) across {len(place_ids)} place(s).")
     return redirect(url_for("bp_supw.supw_admin"))
 
+# ---- Nearest: each user to the closest selected (or any) place with room, by report GPS ----
+@bp_supw.route("/admin/supw/assign/nearest", methods=["POST"])
+@login_required
+def supw_assign_nearest():
+    if not admin_required():
+        flash("Admin only")
+        return redirect(url_for("index"))
+
+    if request.form.get("all_users") == "1":
+        user_ids = [uid for (uid,) in db.session.query(User.id).filter(User.role != "admin")]
+    else:
+        user_ids = [int(x) for x in request.form.getlist("user_ids")]
+    place_ids = [int(x) for x in request.form.getlist("place_ids")]
+
+    if not user_ids:
+        flash("Pick at least one user (or select 'All users').")
+        return redirect(url_for("bp_supw.supw_admin"))
+
+    res = assign_nearest(user_ids, place_ids or None)
+    db.session.commit()
+    msg = f"Assigned {res['inserted']} user(s) to their nearest place"
+    if res["mean_km"] is not None:
+        msg += f" (avg {res['mean_km']} km)"
+    msg += f". {res['unlocated']} without recent GPS, {res['unplaced']} left over (places full)."
+    flash(msg)
+    return redirect(url_for("bp_supw.supw_admin"))
+
 # ---- Unassign a user from a place ----
 @bp_supw.route("/admin/supw/unassign/<int:aid>", methods=["POST"])
 @login_required
@@ -0,0 +1,206 @@
+# supw_assign.py
+# ======================================================
+# Bulk SUPW assignment (used by routes/supw.py)
+# ======================================================
+# Set-based: existing (place, user) pairs and per-place load come from one query
+# each, new rows go in with multi-row INSERTs that skip duplicates on
+# uq_place_user (ON CONFLICT DO NOTHING on SQLite/Postgres), so assigning a
+# whole school is a handful of statements instead of one query per student.
+#
+# Nearest-place mode matches students to the closest site with room left,
+# using a KD-tree over place coordinates (scipy, imported on first use).
+import heapq
+import math
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+
+from models import db, SupwAssignment, SupwPlace, Submission
+
+INSERT_CHUNK = 2000   # rows per INSERT (keeps SQLite under its bound-parameter limit)
+
+def existing_pairs(user_ids, place_ids=None):
+    """{(place_id, user_id)} already assigned, for the given users."""
+    if not user_ids:
+        return set()
+    pairs = set()
+    ids = list(user_ids)
+    for i in range(0, len(ids), INSERT_CHUNK):
+        q = db.session.query(SupwAssignment.place_id, SupwAssignment.user_id) \
+            .filter(SupwAssignment.user_id.in_(ids[i:i + INSERT_CHUNK]))
+        if place_ids is not None:
+            q = q.filter(SupwAssignment.place_id.in_(list(place_ids)))
+        pairs.update((p, u) for p, u in q.all())
+    return pairs
+
+def place_loads(place_ids):
+    """{place_id: number of assigned users} (0 for empty places)."""
+    loads = {pid: 0 for pid in place_ids}
+    rows = (db.session.query(SupwAssignment.place_id, func.count(SupwAssignment.id))
+            .filter(SupwAssignment.place_id.in_(list(place_ids)))
+            .group_by(SupwAssignment.place_id)
+            .all())
+    for pid, n in rows:
+        loads[pid] = n
+    return loads
+
+def _insert_ignore(rows):
+    dialect = db.session.get_bind(mapper=SupwAssignment).dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        dialect_insert = None
+
+    if dialect_insert is not None:
+        stmt = dialect_insert(SupwAssignment).values(rows) \
+            .on_conflict_do_nothing(index_elements=["place_id", "user_id"])
+    else:
+        stmt = insert(SupwAssignment).values(rows)   # caller already dropped known pairs
+    return db.session.execute(stmt).rowcount or 0
+
+def insert_assignments(pairs, known=None):
+    """
+    Insert (place_id, user_id) pairs, skipping ones that already exist.
+    Returns the number of rows inserted; the caller commits.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    if not pairs:
+        return 0
+    if known is None:
+        known = existing_pairs({u for _, u in pairs}, {p for p, _ in pairs})
+    now = datetime.utcnow()
+    rows = [{"place_id": p, "user_id": u, "assigned_at": now} for p, u in pairs if (p, u) not in known]
+    inserted = 0
+    for i in range(0, len(rows), INSERT_CHUNK):
+        inserted += _insert_ignore(rows[i:i + INSERT_CHUNK])
+    return inserted
+
+def assign_manual(place_id, user_ids):
+    return insert_assignments([(place_id, uid) for uid in user_ids])
+
+def plan_balanced(user_ids, place_ids, loads, already, rng=None):
+    """
+    One place per user, always the currently least-loaded one (ties broken at
+    random). Users already in any of `place_ids` are left where they are.
+    -> [(place_id, user_id)]
+    """
+    rng = rng or random.Random()
+    wanted = set(place_ids)
+    placed = {u for p, u in already if p in wanted}
+    users = [u for u in dict.fromkeys(user_ids) if u not in placed]
+    rng.shuffle(users)
+    heap = [(loads.get(pid, 0), rng.random(), pid) for pid in dict.fromkeys(place_ids)]
+    heapq.heapify(heap)
+    plan = []
+    for uid in users:
+        load, _, pid = heapq.heappop(heap)
+        plan.append((pid, uid))
+        heapq.heappush(heap, (load + 1, rng.random(), pid))
+    return plan
+
+def assign_balanced(user_ids, place_ids, rng=None):
+    """Spread users over places, evening out per-place load. Returns rows inserted."""
+    if not user_ids or not place_ids:
+        return 0
+    already = existing_pairs(user_ids, place_ids)
+    plan = plan_balanced(user_ids, place_ids, place_loads(place_ids), already, rng=rng)
+    return insert_assignments(plan, known=already)
+
+# -------------------------
+# Nearest place (geo)
+# -------------------------
+LOCATION_DAYS = 180   # how far back a student's report GPS counts as "where they are"
+EARTH_KM = 6371.0
+
+def user_locations(user_ids, days=LOCATION_DAYS):
+    """
+    {user_id: (lat, lon)}: mean GPS of each user's recent submissions
+    (there is no home/school address on User, so reports stand in for it).
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    out = {}
+    ids = list(user_ids)
+    for i in range(0, len(ids), INSERT_CHUNK):
+        rows = (db.session.query(Submission.user_id, func.avg(Submission.lat), func.avg(Submission.lon))
+                .filter(Submission.user_id.in_(ids[i:i + INSERT_CHUNK]),
+                        Submission.lat.isnot(None), Submission.lon.isnot(None),
+                        Submission.created_at >= since)
+                .group_by(Submission.user_id)
+                .all())
+        out.update((uid, (float(la), float(lo))) for uid, la, lo in rows)
+    return out
+
+def _project(latlon, lat0):
+    """Equirectangular projection to km around lat0 (fine at city/country scale)."""
+    import numpy as np
+    a = np.asarray(latlon, dtype=float).reshape(-1, 2)
+    k = math.pi / 180.0 * EARTH_KM
+    return np.column_stack((a[:, 1] * k * math.cos(math.radians(lat0)), a[:, 0] * k))
+
+def plan_nearest(user_points, places, loads, already=(), k=8):
+    """
+    user_points: {user_id: (lat, lon)}; places: [(place_id, lat, lon, capacity|None)];
+    loads: {place_id: current count}. Users closest to a site are served first and
+    take their nearest place with room left (widening the search as places fill).
+    -> ([(place_id, user_id, km)], [user_id that could not be placed])
+    """
+    import numpy as np
+    from scipy.spatial import cKDTree
+
+    placed = {u for _, u in already}
+    users = [u for u in user_points if u not in placed]
+    if not users or not places:
+        return [], users
+
+    lat0 = float(np.mean([p[1] for p in places]))
+    tree = cKDTree(_project([(p[1], p[2]) for p in places], lat0))
+    pts = _project([user_points[u] for u in users], lat0)
+    room = {pid: (math.inf if cap is None else cap - loads.get(pid, 0)) for pid, _, _, cap in places}
+
+    plan, left = [], list(range(len(users)))
+    k = min(k, len(places))
+    while left and any(r > 0 for r in room.values()):
+        dist, idx = tree.query(pts[left], k=k)
+        dist, idx = dist.reshape(len(left), -1), idx.reshape(len(left), -1)
+        still = []
+        for row in np.argsort(dist[:, 0], kind="stable"):
+            ui = left[row]
+            for d, pi in zip(dist[row], idx[row]):
+                pid = places[pi][0]
+                if room[pid] > 0:
+                    room[pid] -= 1
+                    plan.append((pid, users[ui], float(d)))
+                    break
+            else:
+                still.append(ui)
+        if len(still) == len(left) and k == len(places):
+            break
+        left, k = still, min(len(places), k * 4)
+    return plan, [users[i] for i in left]
+
+def assign_nearest(user_ids, place_ids=None, days=LOCATION_DAYS):
+    """
+    Put each located user at the nearest active place with coordinates and room.
+    Returns {"inserted", "unlocated", "unplaced", "mean_km"}.
+    """
+    q = SupwPlace.query.filter(SupwPlace.active.is_(True), SupwPlace.lat.isnot(None), SupwPlace.lon.isnot(None))
+    if place_ids:
+        q = q.filter(SupwPlace.id.in_(list(place_ids)))
+    places = [(p.id, p.lat, p.lon, p.capacity) for p in q.all()]
+    if not user_ids or not places:
+        return {"inserted": 0, "unlocated": len(user_ids or []), "unplaced": 0, "mean_km": None}
+
+    pids = [p[0] for p in places]
+    points = user_locations(user_ids, days=days)
+    already = existing_pairs(user_ids, pids)
+    plan, unplaced = plan_nearest(points, places, place_loads(pids), already)
+    inserted = insert_assignments([(pid, uid) for pid, uid, _ in plan], known=already)
+    return {
+        "inserted": inserted,
+        "unlocated": len(set(user_ids) - set(points)),
+        "unplaced": len(unplaced),
+        "mean_km": round(sum(d for _, _, d in plan) / len(plan), 2) if plan else None,
+    }
@@ -0,0 +1,23 @@
+# tests/conftest.py — a throwaway SQLite app, configured before app.py is imported
+import os, sys, tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+_TMP = tempfile.mkdtemp(prefix="thromai-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/test.db"
+os.environ.setdefault("PV_QUERY_BUDGET", "10")   # the fixed views need 3-6
+os.environ["PV_SCORE_CACHE_PATH"] = ""
+os.environ["PV_MODEL_WATCH_S"] = "0"
+os.environ["PV_INFERENCE_SOCKET"] = ""
+os.environ["RATELIMIT_ENABLED"] = "0"
+
+@pytest.fixture(scope="session")
+def app():
+    import app as app_module
+    app_module.app.testing = True
+    return app_module.app
@@ -0,0 +1,89 @@
+# tests/test_cleanup.py — /admin/cleanup reads only; comparisons are stored by explicit POSTs
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from PIL import Image
+from sqlalchemy.exc import IntegrityError
+
+from ai import cleanup
+
+LAT, LON = 26.90, 91.00   # away from the other modules' seed data
+
+def _photo(path, dumped):
+    rng = np.random.default_rng(7)
+    img = (rng.random((120, 160)) * 80 + 100).astype(np.uint8)
+    img[:, ::16] = 30                      # a fence: the background both photos share
+    if dumped:
+        img[50:100, 40:120] = rng.integers(0, 60, (50, 80))
+    Image.fromarray(img).convert("RGB").save(path)
+    return str(path)
+
+@pytest.fixture(scope="module")
+def seeded(app, tmp_path_factory):
+    from werkzeug.security import generate_password_hash
+    from models import db, User, Submission
+
+    tmp = tmp_path_factory.mktemp("cleanup")
+    now = datetime.utcnow()
+    with app.app_context():
+        db.create_all()
+        admin = User(username="cleanup_adm", email="cleanup_adm@x", role="admin",
+                     password_hash=generate_password_hash("pw"))
+        db.session.add(admin)
+        db.session.flush()
+        before = Submission(user_id=admin.id, report_type="illegal_dumping", lat=LAT, lon=LON,
+                            image_path=_photo(tmp / "before.jpg", True), relevance_score=0.9,
+                            created_at=now - timedelta(days=3))
+        afters = [Submission(user_id=admin.id, report_type=cleanup.AFTER_TYPE, lat=LAT + i * 1e-4, lon=LON,
+                             image_path=_photo(tmp / f"after{i}.jpg", False), relevance_score=0.2,
+                             created_at=now - timedelta(hours=i)) for i in range(2)]
+        db.session.add_all([before, *afters])
+        db.session.commit()
+        ids = [s.id for s in afters]
+
+    c = app.test_client()
+    assert c.post("/login", data={"identifier": "cleanup_adm", "password": "pw"}).status_code == 302
+    return c, ids
+
+def _stored(app, after_ids):
+    from models import CleanupComparison
+    with app.app_context():
+        return (CleanupComparison.query.filter(CleanupComparison.after_id.in_(after_ids))
+                .order_by(CleanupComparison.after_id, CleanupComparison.rank).all())
+
+def test_get_views_store_nothing(app, seeded):
+    c, ids = seeded
+    r = c.get("/admin/cleanup")
+    assert r.status_code == 200 and b"2 report(s) not compared yet" in r.data
+    r = c.get(f"/api/v1/cleanup/{ids[0]}")
+    assert r.status_code == 200 and r.json["pending"] and r.json["comparisons"] == []
+    assert _stored(app, ids) == []
+
+def test_compute_stores_one_batch(app, seeded):
+    c, ids = seeded
+    assert c.post("/admin/cleanup/compute").status_code == 302
+    rows = _stored(app, ids)
+    assert {r.after_id for r in rows} == set(ids)
+    assert all(r.rank == 1 and r.before_id is not None for r in rows)
+    assert b"not compared yet" not in c.get("/admin/cleanup").data
+
+def test_recompute_keeps_review(app, seeded):
+    c, ids = seeded
+    row = _stored(app, ids[:1])[0]
+    c.post(f"/admin/cleanup/{row.id}/confirm")
+
+    r = c.post(f"/api/v1/cleanup/{ids[0]}")
+    assert r.status_code == 200 and not r.json["pending"]
+    (again,) = _stored(app, ids[:1])
+    assert again.id != row.id                      # the rows were replaced ...
+    assert again.before_id == row.before_id and again.human_state == "confirmed"   # ... the decision kept
+
+def test_after_method_rank_is_unique(app, seeded):
+    from models import db, CleanupComparison
+    _, ids = seeded
+    with app.app_context():
+        db.session.add(CleanupComparison(after_id=ids[1], method=cleanup.METHOD, rank=1, verdict="no_prior"))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
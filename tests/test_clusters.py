@@ -0,0 +1,119 @@
+# tests/test_clusters.py — IncrementalDBSCAN against a brute-force DBSCAN
+import math, random
+from datetime import datetime, timedelta
+
+import pytest
+
+from geo.clusters import ClusterCache, IncrementalDBSCAN, haversine_m
+
+def brute_force(points, eps_m, min_pts):
+    """-> (core ids, partition of the core ids as frozensets, border ids)"""
+    ids = list(points)
+    nbrs = {p: [q for q in ids if q != p and haversine_m(*points[p], *points[q]) <= eps_m] for p in ids}
+    core = {p for p in ids if len(nbrs[p]) + 1 >= min_pts}
+    parts, seen = set(), set()
+    for c in core:
+        if c in seen:
+            continue
+        comp, stack = set(), [c]
+        while stack:
+            x = stack.pop()
+            if x in comp:
+                continue
+            comp.add(x)
+            stack.extend(q for q in nbrs[x] if q in core and q not in comp)
+        seen |= comp
+        parts.add(frozenset(comp))
+    border = {p for p in ids if p not in core and any(q in core for q in nbrs[p])}
+    return core, parts, border
+
+def engine_result(engine):
+    labels = engine.labels()
+    groups = {}
+    for pid, root in labels.items():
+        if pid in engine.core:
+            groups.setdefault(root, set()).add(pid)
+    return set(engine.core), {frozenset(g) for g in groups.values()}, set(labels) - engine.core
+
+def offset(lat, lon, d_m, bearing):
+    dlat = d_m * math.cos(bearing) / 111_195.0
+    dlon = d_m * math.sin(bearing) / (111_195.0 * math.cos(math.radians(lat)))
+    return lat + dlat, lon + dlon
+
+def random_sites(rng, lat, lon, n_sites=25, per_site=25, spread_m=120):
+    points, pid = {}, 0
+    for _ in range(n_sites):
+        c = offset(lat, lon, rng.uniform(0, 3000), rng.uniform(0, 2 * math.pi))
+        for _ in range(rng.randint(1, per_site)):
+            pid += 1
+            points[pid] = offset(*c, rng.uniform(0, spread_m), rng.uniform(0, 2 * math.pi))
+    return points
+
+@pytest.mark.parametrize("lat, lon, seed", [
+    (27.47, 89.64, 1),    # Thimphu
+    (28.30, 91.20, 2),    # north of the old fixed 27.5° grid latitude
+    (26.80, 89.40, 3),
+    (61.00, 10.00, 4),    # well outside Bhutan: the grid has to re-size itself
+])
+def test_matches_brute_force_in_any_insert_order(lat, lon, seed):
+    rng = random.Random(seed)
+    points = random_sites(rng, lat, lon)
+    order = list(points)
+    rng.shuffle(order)
+    engine = IncrementalDBSCAN(eps_m=75, min_pts=3)
+    for pid in order:
+        engine.add(pid, *points[pid])
+    assert engine_result(engine) == brute_force(points, 75, 3)
+
+def test_east_west_neighbours_just_inside_eps_north_of_grid_latitude():
+    # pairs 0.999·eps apart along a parallel at 28.3°N: the old grid (sized at
+    # 27.5°) had cells narrower than eps there and missed some of them
+    rng = random.Random(7)
+    eps = 75.0
+    engine = IncrementalDBSCAN(eps_m=eps, min_pts=2)
+    for i in range(2000):
+        lat, lon = 28.3, 90.0 + rng.uniform(0, 2.0)
+        other = offset(lat, lon, 0.999 * eps, math.pi / 2)
+        engine.add(2 * i + 1, lat, lon)
+        engine.add(2 * i + 2, *other)
+        assert haversine_m(lat, lon, *other) <= eps
+    labels = engine.labels()
+    assert all(labels.get(2 * i + 1) is not None and labels.get(2 * i + 1) == labels.get(2 * i + 2)
+               for i in range(2000))
+
+@pytest.mark.parametrize("seed", [11, 12, 13])
+def test_matches_brute_force_after_expiry(seed):
+    rng = random.Random(seed)
+    points = random_sites(rng, 27.47, 89.64)
+    created = {pid: datetime(2026, 1, 1) + timedelta(hours=rng.uniform(0, 24 * 14)) for pid in points}
+    engine = IncrementalDBSCAN(eps_m=75, min_pts=3)
+    for pid in points:
+        engine.add(pid, *points[pid], {"created_at": created[pid]})
+    for day in (3, 7, 10, 13):
+        since = datetime(2026, 1, 1) + timedelta(days=day)
+        engine.expire(since)
+        window = {pid: p for pid, p in points.items() if created[pid] >= since}
+        assert set(engine.pts) == set(window)
+        assert engine_result(engine) == brute_force(window, 75, 3)
+
+def test_expiring_the_bridge_splits_the_cluster():
+    # two groups joined only through the middle report; once it ages out they are two clusters
+    t0 = datetime(2026, 1, 1)
+    engine = IncrementalDBSCAN(eps_m=75, min_pts=2)
+    engine.add(1, 27.4700, 89.64, {"created_at": t0})                       # the bridge
+    engine.add(2, *offset(27.47, 89.64, 60, 0), {"created_at": t0 + timedelta(days=1)})
+    engine.add(3, *offset(27.47, 89.64, 60, math.pi), {"created_at": t0 + timedelta(days=1)})
+    engine.add(4, *offset(27.47, 89.64, 110, 0), {"created_at": t0 + timedelta(days=1)})
+    engine.add(5, *offset(27.47, 89.64, 110, math.pi), {"created_at": t0 + timedelta(days=1)})
+    assert len(engine.clusters()) == 1
+    assert engine.expire(t0 + timedelta(hours=1)) == 1
+    assert sorted(c["count"] for c in engine.clusters()) == [2, 2]
+
+def test_cache_expires_points_between_rebuilds():
+    t0 = datetime(2026, 1, 1)
+    rows = [(i, *offset(27.47, 89.64, 10 * i, 0), {"created_at": t0 + timedelta(days=i)}) for i in range(1, 6)]
+    fetch = lambda after_id: [r for r in rows if r[0] > after_id]
+    cache = ClusterCache(rebuild_s=1e9)
+    assert len(cache.get("k", fetch, eps_m=75, min_pts=3, since=t0)) == 5
+    engine = cache.get("k", fetch, eps_m=75, min_pts=3, since=t0 + timedelta(days=3))
+    assert sorted(engine.pts) == [3, 4, 5]
@@ -0,0 +1,63 @@
+# tests/test_dzongkhags.py — point-in-polygon dzongkhag lookup and the bounding-box fallback
+import json
+
+import pytest
+
+from geo.dzongkhags import FALLBACK_BBOX, Resolver
+
+def _square(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+
+def _feature(props, geom_type, coords):
+    return {"type": "Feature", "properties": props, "geometry": {"type": geom_type, "coordinates": coords}}
+
+@pytest.fixture
+def resolver(tmp_path):
+    # "Wangdue Phodrang" is an L over lon 90.0-90.2 / lat 27.0-27.2 with the north-east quarter cut away;
+    # "Thimphu" is a square with a hole plus a separate island; "Paro" overlaps Thimphu's corner.
+    ell = [[90.0, 27.0], [90.2, 27.0], [90.2, 27.1], [90.1, 27.1], [90.1, 27.2], [90.0, 27.2], [90.0, 27.0]]
+    dz = {"type": "FeatureCollection", "features": [
+        _feature({"ADM1_EN": "Wangdue Phodrang Dzongkhag"}, "Polygon", [ell]),
+        _feature({"name": "Thimphu"}, "MultiPolygon", [
+            [_square(89.5, 27.4, 89.7, 27.6), _square(89.55, 27.45, 89.6, 27.5)],
+            [_square(89.9, 27.9, 89.95, 27.95)],
+        ]),
+        _feature({"dzongkhag": "Paro"}, "Polygon", [_square(89.3, 27.3, 89.52, 27.42)]),
+        _feature({}, "Polygon", [_square(0, 0, 1, 1)]),                 # unnamed: skipped
+    ]}
+    zones = {"type": "FeatureCollection", "features": [
+        _feature({"zone": " Bajo "}, "Polygon", [_square(90.0, 27.0, 90.05, 27.05)]),
+    ]}
+    dz_path, zones_path = tmp_path / "dz.geojson", tmp_path / "zones.geojson"
+    dz_path.write_text(json.dumps(dz))
+    zones_path.write_text(json.dumps(zones))
+    return Resolver(str(dz_path), str(zones_path))
+
+def test_polygon_beats_its_bounding_box(resolver):
+    assert resolver.lookup(27.05, 90.15) == ("wangdue", None)
+    assert resolver.lookup(27.15, 90.05) == ("wangdue", None)
+    assert resolver.lookup(27.15, 90.15) == (None, None)          # inside the bbox, outside the L
+
+def test_holes_and_multipolygons(resolver):
+    assert resolver.lookup(27.55, 89.65)[0] == "thimphu"
+    assert resolver.lookup(27.47, 89.57)[0] is None               # the hole
+    assert resolver.lookup(27.92, 89.92)[0] == "thimphu"          # the island
+
+def test_overlap_goes_to_the_nearest_centre(resolver):
+    # in both Paro and Thimphu; Paro's centre (89.41, 27.36) is nearer
+    assert resolver.lookup(27.41, 89.51)[0] == "paro"
+
+def test_zones_and_names(resolver):
+    assert resolver.source.endswith("dz.geojson")
+    assert resolver.lookup(27.01, 90.01) == ("wangdue", "Bajo")
+    assert resolver.names() == ["paro", "thimphu", "wangdue"]
+    assert resolver.lookup(None, 90.0) == (None, None)
+
+def test_missing_file_falls_back_to_the_old_rectangles(tmp_path):
+    r = Resolver(str(tmp_path / "missing.geojson"), str(tmp_path / "missing_zones.geojson"))
+    assert r.source == "fallback-bbox" and r.zones is None
+    assert r.names() == sorted(FALLBACK_BBOX)
+    assert r.lookup(27.15, 90.15) == (None, None)
+    # the rectangles overlap around Thimphu; the nearer centre wins there too
+    assert r.lookup(27.50, 89.55) == ("thimphu", None)
+    assert r.lookup(27.10, 89.50) == ("chukha", None)
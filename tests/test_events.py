@@ -0,0 +1,113 @@
+# tests/test_events.py — camera event ingest (routes/events_api.py)
+import io
+
+import pytest
+
+TOKEN = "test-token"
+
+@pytest.fixture
+def client(app, monkeypatch):
+    from models import db
+    monkeypatch.setenv("API_TOKEN", TOKEN)
+    with app.app_context():
+        db.create_all()
+    return app.test_client()
+
+class CountingStream(io.BytesIO):
+    def __init__(self, size):
+        super().__init__(b"x" * size)
+        self.bytes_read = 0
+
+    def read(self, *args):
+        data = super().read(*args)
+        self.bytes_read += len(data)
+        return data
+
+    def readline(self, *args):
+        data = super().readline(*args)
+        self.bytes_read += len(data)
+        return data
+
+@pytest.mark.parametrize("headers", [{}, {"X-API-TOKEN": "wrong"}])
+def test_batch_rejects_before_reading_the_body(client, headers):
+    body = CountingStream(1 << 20)
+    r = client.post("/events/batch", input_stream=body, content_length=1 << 20,
+                    content_type="multipart/form-data; boundary=xyz", headers=headers)
+    assert r.status_code == 401
+    assert body.bytes_read == 0
+
+def test_batch_form_token_is_not_accepted(client):
+    r = client.post("/events/batch", data={"api_token": TOKEN, "events": "{}"})
+    assert r.status_code == 401
+
+@pytest.fixture
+def ingest(client, monkeypatch, tmp_path):
+    import routes.events_api as events_api
+    monkeypatch.setattr(events_api, "_events_dir", lambda: str(tmp_path))
+    return client
+
+def _jpeg():
+    return io.BytesIO(b"\xff\xd8\xff\xe0 not really a jpeg")
+
+def _batch(client, lines, files):
+    data = {"events": "\n".join(lines)}
+    data.update({name: (_jpeg(), f"{name}.jpg") for name in files})
+    return client.post("/events/batch", data=data, headers={"X-API-TOKEN": TOKEN},
+                       content_type="multipart/form-data")
+
+def test_single_event_retry_is_a_duplicate(ingest):
+    send = lambda: ingest.post("/events", data={"meta": '{"camera_id": "cam-1"}', "image": (_jpeg(), "a.jpg")},
+                               headers={"X-API-TOKEN": TOKEN, "Idempotency-Key": "evt-1"},
+                               content_type="multipart/form-data")
+    first, again = send(), send()
+    assert first.status_code == 201
+    assert again.status_code == 200 and again.json == {"ok": True, "id": first.json["id"], "duplicate": True}
+
+def test_batch_dedups_stored_and_repeated_keys(ingest):
+    stored = _batch(ingest, ['{"camera_id": "cam-2", "idempotency_key": "k1", "image": "i1"}'], ["i1"])
+    assert stored.status_code == 201
+    stored_id = stored.json["results"][0]["id"]
+
+    r = _batch(ingest, [
+        '{"camera_id": "cam-2", "idempotency_key": "k1", "image": "i1"}',   # already stored
+        '{"camera_id": "cam-2", "idempotency_key": "k2", "image": "i2"}',
+        '{"camera_id": "cam-2", "idempotency_key": "k2", "image": "i2"}',   # repeated in this batch
+        '{"camera_id": "cam-3", "idempotency_key": "k1", "image": "i3"}',   # same key, other camera
+        'not json',
+    ], ["i1", "i2", "i3"])
+    res = r.json["results"]
+    assert (r.json["created"], r.json["duplicates"], r.json["failed"]) == (2, 2, 1)
+    assert res[0] == {"index": 0, "ok": True, "id": stored_id, "duplicate": True}
+    assert res[2]["duplicate"] and res[2]["id"] == res[1]["id"]
+    assert not res[3]["duplicate"] and res[3]["id"] not in (stored_id, res[1]["id"])
+
+def test_batch_race_with_a_concurrent_retry(ingest, monkeypatch):
+    import routes.events_api as events_api
+    first = _batch(ingest, ['{"camera_id": "cam-4", "idempotency_key": "r1", "image": "a"}'], ["a"])
+    raced_id = first.json["results"][0]["id"]
+
+    # the lookup runs before the other request committed r1; the commit then hits the unique key
+    real, calls = events_api._existing_keys, []
+    def lookup(keys):
+        calls.append(keys)
+        return {} if len(calls) == 1 else real(keys)
+    monkeypatch.setattr(events_api, "_existing_keys", lookup)
+
+    r = _batch(ingest, ['{"camera_id": "cam-4", "idempotency_key": "r1", "image": "a"}',
+                        '{"camera_id": "cam-4", "idempotency_key": "r2", "image": "b"}'], ["a", "b"])
+    res = r.json["results"]
+    assert r.status_code == 201 and len(calls) == 2
+    assert res[0] == {"index": 0, "ok": True, "id": raced_id, "duplicate": True}
+    assert res[1]["ok"] and not res[1]["duplicate"]
+
+def test_single_event_race_with_a_concurrent_retry(ingest, monkeypatch):
+    import routes.events_api as events_api
+    send = lambda: ingest.post("/events", data={"meta": '{"camera_id": "cam-5"}', "image": (_jpeg(), "a.jpg")},
+                               headers={"X-API-TOKEN": TOKEN, "Idempotency-Key": "evt-5"},
+                               content_type="multipart/form-data")
+    first_id = send().json["id"]
+    real, calls = events_api._existing_keys, []
+    monkeypatch.setattr(events_api, "_existing_keys",
+                        lambda keys: calls.append(keys) or ({} if len(calls) == 1 else real(keys)))
+    r = send()
+    assert r.status_code == 200 and r.json["id"] == first_id and r.json["duplicate"]
@@ -0,0 +1,50 @@
+# tests/test_hotspots.py — /api/v1/heat_points: purged history follows the same bbox and type filters
+from datetime import datetime, timedelta
+
+import pytest
+
+LAT, LON = 27.00, 90.50   # away from the other modules' seed data
+BBOX = f"{LON - 0.01},{LAT - 0.01},{LON + 0.01},{LAT + 0.01}"
+
+@pytest.fixture(scope="module")
+def client(app):
+    from werkzeug.security import generate_password_hash
+    from models import db, User, Submission, HotspotRollup
+
+    day = (datetime.utcnow() - timedelta(days=2)).date()
+    with app.app_context():
+        db.create_all()
+        admin = User(username="hot_adm", email="hot_adm@x", role="admin",
+                     password_hash=generate_password_hash("pw"))
+        db.session.add(admin)
+        db.session.flush()
+        db.session.add_all([
+            Submission(user_id=admin.id, report_type="dirty_area", image_path="x.jpg", lat=LAT, lon=LON,
+                       status="AUTO_OK", ai_label="valid_report", created_at=datetime.utcnow() - timedelta(hours=1)),
+            Submission(user_id=admin.id, report_type="illegal_dumping", image_path="y.jpg", lat=LAT, lon=LON,
+                       status="AUTO_OK", ai_label="valid_report", created_at=datetime.utcnow() - timedelta(hours=1)),
+            HotspotRollup(day=day, tile_lat=LAT + 0.002, tile_lon=LON + 0.002, report_type="dirty_area", count=3),
+            HotspotRollup(day=day, tile_lat=LAT + 0.003, tile_lon=LON, report_type="illegal_dumping", count=5),
+            HotspotRollup(day=day, tile_lat=LAT + 0.5, tile_lon=LON + 0.5, report_type="dirty_area", count=7),
+        ])
+        db.session.commit()
+
+    c = app.test_client()
+    assert c.post("/login", data={"identifier": "hot_adm", "password": "pw"}).status_code == 302
+    return c
+
+def _weights(client, **params):
+    r = client.get("/api/v1/heat_points", query_string={"days": 7, **params})
+    assert r.status_code == 200
+    return sorted(w for lat, lon, w in r.json["points"] if abs(lat - LAT) < 1 and abs(lon - LON) < 1)
+
+def test_bbox_limits_rolled_up_tiles(client):
+    assert _weights(client) == [1.0, 1.0, 3.0, 5.0, 7.0]
+    assert _weights(client, bbox=BBOX) == [1.0, 1.0, 3.0, 5.0]
+
+def test_dirty_area_filters_live_and_rolled_up(client):
+    assert _weights(client, type="dirty_area") == [1.0, 3.0, 7.0]
+    assert _weights(client, type="dirty_area", bbox=BBOX) == [1.0, 3.0]
+
+def test_malformed_bbox_is_ignored(client):
+    assert _weights(client, bbox="1,2,3") == _weights(client)
@@ -0,0 +1,87 @@
+# tests/test_incidents.py — tools/analyse_incidents.py retries unreadable incidents with backoff
+import os, shutil, tempfile
+from datetime import datetime, timedelta
+
+import pytest
+from PIL import Image
+
+REL_DIR = "static/uploads/_test_incidents"
+
+@pytest.fixture(scope="module")
+def tool(app):
+    from tools import analyse_incidents
+    from models import db
+    base = os.path.join(app.root_path, REL_DIR)
+    os.makedirs(base, exist_ok=True)
+    Image.new("RGB", (64, 48), (90, 90, 90)).save(os.path.join(base, "snap.jpg"))
+    with app.app_context():
+        db.create_all()
+        analyse_incidents.migrate(db)
+    yield analyse_incidents
+    shutil.rmtree(base, ignore_errors=True)
+    events = os.path.join(app.root_path, "static/uploads/events")
+    for name in os.listdir(events):
+        if name.startswith("incident_") and name.endswith("_thumb.jpg"):
+            os.remove(os.path.join(events, name))
+    try:
+        os.removedirs(events)   # and static/uploads, if the tests created them
+    except OSError:
+        pass
+
+def _incident(**kw):
+    from models import db, Incident
+    inc = Incident(camera_id="test-cam", event_type="dumping", **kw)
+    db.session.add(inc)
+    db.session.commit()
+    return inc
+
+def test_unreadable_clip_is_retried_later(app, tool):
+    from models import db, Incident
+    with app.app_context():
+        inc = _incident(video_path=f"/{REL_DIR}/missing.mp4", image_path=f"/{REL_DIR}/snap.jpg")
+        tool.run_pass(limit=10)
+        inc = db.session.get(Incident, inc.id)
+        assert inc.analysed_at is None
+        assert inc.analysis_attempts == 1 and inc.analysis_error
+        assert inc.next_analysis_at > datetime.utcnow()
+        assert inc.ai_score is not None and inc.frames_scored == 1   # the image is triaged meanwhile
+
+        tool.run_pass(limit=10)                                       # still backing off
+        assert db.session.get(Incident, inc.id).analysis_attempts == 1
+
+def test_retry_succeeds_once_the_clip_can_be_read(app, tool, monkeypatch):
+    from models import db, Incident
+    snap = os.path.join(app.root_path, REL_DIR, "snap.jpg")
+
+    def keyframes(path):
+        out = tempfile.mkdtemp(prefix="pv_kf_test_")
+        frame = os.path.join(out, "kf_000.jpg")
+        shutil.copy(snap, frame)
+        return [frame], out
+
+    with app.app_context():
+        inc = _incident(video_path=f"/{REL_DIR}/clip.mp4", image_path=f"/{REL_DIR}/snap.jpg",
+                        analysis_attempts=3, analysis_error="clip not found",
+                        next_analysis_at=datetime.utcnow() - timedelta(seconds=1))
+        monkeypatch.setattr(tool, "sample_keyframes", keyframes)
+        tool.run_pass(limit=10)
+        inc = db.session.get(Incident, inc.id)
+        assert inc.analysed_at is not None and inc.analysis_error is None
+        assert inc.frames_scored == 2
+
+def test_backoff_doubles_and_gives_up(app, tool):
+    from models import db, Incident
+    with app.app_context():
+        inc = _incident(image_path=f"/{REL_DIR}/not_uploaded_yet.jpg")
+        delays = []
+        for _ in range(3):
+            inc.next_analysis_at = None
+            t0 = datetime.utcnow()
+            tool.analyse_one(inc)
+            delays.append((inc.next_analysis_at - t0).total_seconds())
+        assert delays[1] == pytest.approx(2 * delays[0], rel=0.05)
+        assert delays[2] == pytest.approx(4 * delays[0], rel=0.05)
+
+        inc.analysis_attempts, inc.next_analysis_at = tool.MAX_ATTEMPTS, None
+        db.session.commit()
+        assert inc.id not in {i.id for i in tool.due_query().all()}
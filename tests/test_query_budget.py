@@ -0,0 +1,69 @@
+# tests/test_query_budget.py — N+1 regressions fail here (db_profile.install_query_counter)
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from db_profile import QueryBudgetExceeded
+
+BUDGET = int(os.environ["PV_QUERY_BUDGET"])
+
+def _register_over_budget_view():
+    """A view with a deliberate N+1; registered at collection, before any test module sends a request."""
+    from app import app
+    from models import User
+    if "test_over_budget" not in app.view_functions:
+        @app.route("/_test/over_budget")
+        def test_over_budget():
+            return str(sum(User.query.filter_by(id=u.id).one().points or 0 for u in User.query.all()))
+
+_register_over_budget_view()
+
+@pytest.fixture(scope="module")
+def client(app):
+    from werkzeug.security import generate_password_hash
+    from models import db, User, Submission, SupwPlace, SupwAssignment
+
+    with app.app_context():
+        db.create_all()
+        admin = User(username="adm", email="adm@x", role="admin",
+                     password_hash=generate_password_hash("pw"))
+        users = [User(username=f"u{i}", email=f"u{i}@x", points=i * 10,
+                      password_hash="x") for i in range(30)]
+        db.session.add_all([admin, *users])
+        db.session.flush()
+        now = datetime.utcnow()
+        states = ["unreviewed", "approved", "rejected"]
+        db.session.add_all(Submission(
+            user_id=users[i % len(users)].id, report_type="illegal_dumping",
+            image_path=f"static/uploads/t{i}.jpg", lat=27.47 + i * 1e-4, lon=89.63,
+            status="AUTO_OK" if i % 2 else "RECHECK", human_state=states[i % 3],
+            reviewed_by=admin.id if i % 3 else None, created_at=now - timedelta(minutes=i),
+        ) for i in range(60))
+        places = [SupwPlace(name=f"place {i}", lat=27.47, lon=89.63 + i * 1e-3) for i in range(6)]
+        db.session.add_all(places)
+        db.session.flush()
+        db.session.add_all(SupwAssignment(place_id=places[i % 6].id, user_id=u.id)
+                           for i, u in enumerate(users))
+        db.session.commit()
+
+    c = app.test_client()
+    r = c.post("/login", data={"identifier": "adm", "password": "pw"})
+    assert r.status_code == 302
+    return c
+
+@pytest.mark.parametrize("url", [
+    "/leaderboard",
+    "/admin/review",
+    "/admin/review?tab=accepted",
+    "/admin/review?tab=rejected",
+    "/admin/supw",
+])
+def test_fixed_views_stay_within_budget(client, url):
+    r = client.get(url)
+    assert r.status_code == 200
+    assert 0 < int(r.headers["X-Query-Count"]) <= BUDGET
+
+def test_over_budget_view_raises(client):
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/_test/over_budget")
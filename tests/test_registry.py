@@ -0,0 +1,109 @@
+# tests/test_registry.py — one model file, one version, in every process (ai/registry.py)
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import ai.verifier as verifier_mod
+from ai.registry import ModelRegistry
+from ai.verifier import Verifier, auto_version
+
+class FakeSession:
+    """Stands in for onnxruntime.InferenceSession: valid class prob 0.9 for every image."""
+    def __init__(self, path, sess_options=None, providers=None):
+        self.path = path
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input")]
+
+    def run(self, outputs, feed):
+        n = next(iter(feed.values())).shape[0]
+        return [np.tile(np.log([0.9, 0.1]), (n, 1))]
+
+@pytest.fixture
+def fake_ort(monkeypatch):
+    monkeypatch.setattr(verifier_mod, "ort", SimpleNamespace(SessionOptions=SimpleNamespace,
+                                                             InferenceSession=FakeSession))
+    monkeypatch.setattr(verifier_mod, "_ort_tried", True)
+
+@pytest.fixture
+def model_dir(tmp_path):
+    (tmp_path / "model.onnx").write_bytes(b"model one")
+    (tmp_path / "model.json").write_text('{"0": "dirty_places", "1": "invalid"}')
+    Image.new("RGB", (64, 48), (90, 120, 60)).save(tmp_path / "photo.jpg")
+    return tmp_path
+
+def make_verifier(model_dir, **kw):
+    kw.setdefault("score_cache", "")
+    return Verifier(inference_socket="", model_path=str(model_dir / "model.onnx"),
+                    class_map_path=str(model_dir / "model.json"), **kw)
+
+def test_standalone_and_registry_versions_match(fake_ort, model_dir):
+    standalone = make_verifier(model_dir).load()
+
+    served = make_verifier(model_dir)
+    ModelRegistry(served, model_dir=str(model_dir), watch_s=0).start()
+    served.load()
+
+    assert standalone.model_kind == served.model_kind == "onnx"
+    assert standalone.model_version == served.model_version == auto_version(str(model_dir / "model.onnx"))
+    assert standalone.score(str(model_dir / "photo.jpg"))["model_version"] == \
+        served.score(str(model_dir / "photo.jpg"))["model_version"]
+
+def test_tools_and_app_share_cache_entries(fake_ort, model_dir):
+    cache = str(model_dir / "scores.sqlite")
+    photo = str(model_dir / "photo.jpg")
+    make_verifier(model_dir, score_cache=cache).score(photo)
+
+    served = make_verifier(model_dir, score_cache=cache)
+    ModelRegistry(served, model_dir=str(model_dir), watch_s=0).start()
+    served.load()
+    served._infer = lambda paths: pytest.fail("cache miss for an image scored by the same model file")
+    served.score(photo)
+    assert served.cache_stats()["hits"] == 1
+
+def test_heuristic_fallback_is_not_hash_stamped(model_dir, monkeypatch):
+    monkeypatch.setattr(verifier_mod, "ort", None)
+    monkeypatch.setattr(verifier_mod, "_ort_tried", True)
+    v = make_verifier(model_dir)
+    ModelRegistry(v, model_dir=str(model_dir), watch_s=0).start()
+    v.load()
+    assert v.model_kind == "heuristic"
+    assert v.model_version == verifier_mod.MODEL_VERSION
+
+def test_explicit_version_is_kept(fake_ort, model_dir):
+    assert make_verifier(model_dir, model_version="candidate").load().model_version == "candidate"
+
+def test_reload_picks_up_changed_file(fake_ort, model_dir):
+    v = make_verifier(model_dir).load()
+    registry = ModelRegistry(v, model_dir=str(model_dir), watch_s=0)
+    before = v.model_version
+    (model_dir / "model.onnx").write_bytes(b"model two")
+    result = registry.reload(reason="test")
+    assert result["ok"] and result["previous"] == f"{before}_onnx"
+    assert v.model_version == auto_version(str(model_dir / "model.onnx")) != before
+
+def test_respawned_worker_adopts_reload_token(fake_ort, model_dir):
+    (model_dir / "model_b.onnx").write_bytes(b"model b")
+    first = make_verifier(model_dir).load()
+    ModelRegistry(first, model_dir=str(model_dir), watch_s=0).reload_all(model_path="model_b.onnx",
+                                                                         model_version="v2")
+    assert os.path.isfile(model_dir / ".reload")
+
+    respawned = make_verifier(model_dir)
+    registry = ModelRegistry(respawned, model_dir=str(model_dir), watch_s=0).start()
+    assert respawned.model_path == str(model_dir / "model_b.onnx")
+    assert respawned.model_version == "v2"
+    assert registry.history[0]["reason"] == "startup (.reload token)"
+    assert registry.check() is None   # the token is already applied
+
+def test_reload_refuses_unloadable_model(fake_ort, model_dir, monkeypatch):
+    v = make_verifier(model_dir).load()
+    registry = ModelRegistry(v, model_dir=str(model_dir), watch_s=0)
+    (model_dir / "broken.onnx").write_bytes(b"")
+    monkeypatch.setattr(verifier_mod, "ort", None)
+    result = registry.reload(model_path="broken.onnx")
+    assert not result["ok"]
+    assert v.model_kind == "onnx" and v.model_path == str(model_dir / "model.onnx")
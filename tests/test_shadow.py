@@ -0,0 +1,74 @@
+# tests/test_shadow.py — shadow scoring: running agreement totals and Cohen's kappa (ai/shadow.py)
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from ai import shadow
+
+def _stat(both_ok, prod_only_ok, shadow_only_ok, both_recheck):
+    n = both_ok + prod_only_ok + shadow_only_ok + both_recheck
+    return SimpleNamespace(prod_model_version="p", model_version="s", n=n, both_ok=both_ok,
+                           prod_only_ok=prod_only_ok, shadow_only_ok=shadow_only_ok,
+                           both_recheck=both_recheck, sum_diff=0.0, sum_abs_diff=0.0,
+                           sum_sq_diff=0.0, sum_latency_ms=0.0, first_at=None, last_at=None)
+
+def test_kappa_discounts_chance_agreement():
+    # agree 35/50; AUTO_OK rates 0.5 and 0.6 would agree 0.5 by chance -> (0.7 - 0.5) / 0.5
+    s = shadow.summary(_stat(20, 5, 10, 15))
+    assert (s["agreement"], s["prod_ok_rate"], s["shadow_ok_rate"]) == (0.7, 0.5, 0.6)
+    assert s["kappa"] == pytest.approx(0.4)
+
+def test_kappa_edge_cases():
+    assert shadow.summary(_stat(10, 0, 0, 10))["kappa"] == 1.0
+    assert shadow.summary(_stat(0, 10, 10, 0))["kappa"] == -1.0
+    assert shadow.summary(_stat(25, 25, 25, 25))["kappa"] == 0.0
+    # both models always say AUTO_OK: every agreement is by chance, kappa is undefined
+    assert shadow.summary(_stat(12, 0, 0, 0))["kappa"] is None
+    empty = shadow.summary(_stat(0, 0, 0, 0))
+    assert empty["kappa"] is None and empty["mean_diff"] is None
+
+def _res(status, action, version="test-shadow"):
+    return {"status": status, "action_score": action, "relevance_score": action, "model_version": version}
+
+def test_record_folds_scores_into_one_stat_row(app):
+    from models import db, ShadowScore, ShadowStat
+    prod_ok = {"status": "AUTO_OK", "action_score": 0.8, "model_version": "test-prod"}
+    prod_no = {"status": "RECHECK", "action_score": 0.2, "model_version": "test-prod"}
+    with app.app_context():
+        db.create_all()
+        for i, (prod, res) in enumerate([(prod_ok, _res("AUTO_OK", 0.9)), (prod_ok, _res("RECHECK", 0.4)),
+                                         (prod_no, _res("RECHECK", 0.1)), (prod_no, _res("RECHECK", 0.3))]):
+            shadow.record(db, 900000 + i, prod, res, latency_ms=10.0 * (i + 1))
+        db.session.commit()
+
+        (st,) = ShadowStat.query.filter_by(prod_model_version="test-prod", model_version="test-shadow").all()
+        s = shadow.summary(st)
+        assert s["confusion"] == {"both_ok": 1, "prod_only_ok": 1, "shadow_only_ok": 0, "both_recheck": 2}
+        # p_prod 0.5, p_shadow 0.25: chance 0.5, agreement 0.75
+        assert s["kappa"] == pytest.approx(0.5)
+        assert s["mean_diff"] == pytest.approx((0.1 - 0.4 - 0.1 + 0.1) / 4)
+        assert s["mean_abs_diff"] == pytest.approx(0.7 / 4)
+        assert s["mean_latency_ms"] == 25.0
+        agree = [r.agree for r in ShadowScore.query.filter_by(prod_model_version="test-prod")
+                 .order_by(ShadowScore.submission_id)]
+        assert agree == [True, False, True, True]
+
+def test_runner_scores_in_the_background_and_drops_when_full(app, tmp_path):
+    from models import db, ShadowScore
+    img = tmp_path / "up.jpg"
+    Image.new("RGB", (64, 48), (120, 110, 100)).save(img)
+    prod = {"status": "RECHECK", "action_score": 0.1, "relevance_score": 0.1, "model_version": "test-prod-bg"}
+
+    runner = shadow.ShadowRunner(app, db, model_path="", ensemble_w="0.5")
+    assert runner.enabled and runner.submit(910001, str(img), prod)
+    assert runner.wait()
+    assert runner.status()["done"] == 1 and runner.status()["errors"] == 0
+    with app.app_context():
+        (row,) = ShadowScore.query.filter_by(submission_id=910001).all()
+        assert row.prod_model_version == "test-prod-bg" and row.prod_status == "RECHECK"
+
+    full = shadow.ShadowRunner(app, db, model_path="", ensemble_w="0.5", max_pending=0)
+    assert not full.submit(910002, str(img), prod)
+    assert full.status()["dropped"] == 1
+    assert not shadow.ShadowRunner(app, db, model_path="", ensemble_w="").submit(910003, str(img), prod)
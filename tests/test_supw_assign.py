@@ -0,0 +1,90 @@
+# tests/test_supw_assign.py — set-based SUPW assignment (supw_assign.py)
+import itertools, random
+from collections import Counter
+
+import pytest
+
+import supw_assign
+
+_names = itertools.count()
+
+@pytest.fixture
+def ctx(app):
+    from models import db
+    with app.app_context():
+        db.create_all()
+        yield db
+        db.session.rollback()
+
+def _users(db, n):
+    from models import User
+    users = []
+    for _ in range(n):
+        i = next(_names)
+        users.append(User(username=f"supw_t{i}", email=f"supw_t{i}@x", password_hash="x"))
+    db.session.add_all(users)
+    db.session.flush()
+    return [u.id for u in users]
+
+def _places(db, specs):
+    """specs: [(lat, lon, capacity)]"""
+    from models import SupwPlace
+    places = [SupwPlace(name=f"supw test place {next(_names)}", lat=la, lon=lo, capacity=cap)
+              for la, lo, cap in specs]
+    db.session.add_all(places)
+    db.session.flush()
+    return [p.id for p in places]
+
+def test_insert_skips_existing_pairs_in_the_database(ctx):
+    uids = _users(ctx, 3)
+    (pid,) = _places(ctx, [(None, None, None)])
+    assert supw_assign.insert_assignments([(pid, u) for u in uids[:2]]) == 2
+    # known=set(): the pre-filter is bypassed, so ON CONFLICT DO NOTHING has to drop the two
+    assert supw_assign.insert_assignments([(pid, u) for u in uids], known=set()) == 1
+    assert supw_assign.place_loads([pid]) == {pid: 3}
+
+def test_balanced_fills_the_emptiest_places_first(ctx):
+    pids = _places(ctx, [(None, None, None)] * 3)
+    supw_assign.insert_assignments([(pids[0], u) for u in _users(ctx, 3)])
+
+    uids = _users(ctx, 7)
+    assert supw_assign.assign_balanced(uids, pids, rng=random.Random(1)) == 7
+    assert sorted(supw_assign.place_loads(pids).values()) == [3, 3, 4]
+    # users already in one of the places are left alone
+    assert supw_assign.assign_balanced(uids, pids) == 0
+
+def test_plan_balanced_is_even_and_skips_placed_users():
+    plan = supw_assign.plan_balanced(range(10), [1, 2, 3], {1: 0, 2: 0, 3: 0}, already={(2, 0)},
+                                     rng=random.Random(3))
+    assert 0 not in {u for _, u in plan} and len(plan) == 9
+    assert sorted(Counter(p for p, _ in plan).values()) == [3, 3, 3]
+
+def test_nearest_overflows_to_the_next_place_with_room():
+    places = [("near", 27.0, 90.0, 1), ("full", 27.0, 90.002, 2), ("far", 27.1, 90.0, None)]
+    points = {"a": (27.0, 90.0), "b": (27.0, 90.001), "c": (27.0, 90.0025)}
+    plan, unplaced = supw_assign.plan_nearest(points, places, {"full": 2})
+    assert unplaced == []
+    # a takes the only seat at "near"; "full" has none, so b and c go on to "far"
+    assert {u: p for p, u, _ in plan} == {"a": "near", "b": "far", "c": "far"}
+    assert all(km > 10 for p, _, km in plan if p == "far")
+
+def test_nearest_leaves_users_unplaced_when_every_place_is_full():
+    places = [(1, 27.0, 90.0, 1), (2, 27.2, 90.2, 1)]
+    points = {u: (27.0, 90.0 + u * 1e-3) for u in range(4)}
+    plan, unplaced = supw_assign.plan_nearest(points, places, {}, already={(2, 3)})
+    assert sorted(p for p, _, _ in plan) == [1, 2]
+    assert {u for _, u, _ in plan} == {0, 1}            # the closest users are served first
+    assert unplaced == [2]                              # 3 was already placed, so it is not counted
+
+def test_assign_nearest_uses_report_locations(ctx):
+    from models import Submission
+    pids = _places(ctx, [(26.70, 89.20, 1), (26.80, 89.20, None)])
+    located, near_first, nowhere = _users(ctx, 3)
+    for uid, lat in ((located, 26.701), (near_first, 26.7001)):
+        ctx.session.add(Submission(user_id=uid, report_type="illegal_dumping", image_path="x.jpg",
+                                   lat=lat, lon=89.20))
+    ctx.session.flush()
+
+    res = supw_assign.assign_nearest([located, near_first, nowhere], place_ids=pids)
+    assert (res["inserted"], res["unlocated"], res["unplaced"]) == (2, 1, 0)
+    assert supw_assign.existing_pairs([located, near_first]) == {(pids[0], near_first), (pids[1], located)}
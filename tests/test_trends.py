@@ -0,0 +1,98 @@
+# tests/test_trends.py — decayed hotspot trend scores and the weekly z-score (geo/trends.py)
+import math, random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from geo import trends
+
+DAY = trends.DAY_S
+T0 = 3000 * trends.WEEK_S      # the start of a week
+
+def _row(**kw):
+    return SimpleNamespace(ref_ts=None, tile_lat=27.0, tile_lon=90.0, dzongkhag=None,
+                           total=0, last_seen_at=None, **kw)
+
+def _fold(times, weights=None):
+    t = _row()
+    for ts, w in zip(times, weights or [1] * len(times)):
+        trends.apply_event(t, ts, w)
+    return t
+
+def test_decayed_score_matches_the_closed_form_in_any_order():
+    rng = random.Random(4)
+    times = [T0 + rng.uniform(0, 20 * DAY) for _ in range(50)]
+    end = max(times)
+    shuffled = _fold(rng.sample(times, len(times)))
+    for t in (_fold(sorted(times)), shuffled):
+        assert t.ref_ts == end and t.total == 50
+        assert t.score_fast == pytest.approx(sum(0.5 ** ((end - x) / (trends.FAST_HL_DAYS * DAY)) for x in times))
+        assert t.score_slow == pytest.approx(sum(0.5 ** ((end - x) / (trends.SLOW_HL_DAYS * DAY)) for x in times))
+
+def test_negative_weight_undoes_an_event():
+    t = _fold([T0, T0 + DAY, T0 + 2 * DAY, T0 + DAY], [1, 1, 1, -1])
+    ref = _fold([T0, T0 + 2 * DAY])
+    assert (t.score_fast, t.score_slow) == pytest.approx((ref.score_fast, ref.score_slow))
+    assert (t.week_count, t.total) == (ref.week_count, ref.total) == (2, 2)
+
+def test_week_counts_roll_over():
+    t = _fold([T0 + DAY] * 3 + [T0 + trends.WEEK_S + DAY] * 5)
+    assert (t.week_no, t.week_count, t.prev_week_count) == (trends.week_of(T0) + 1, 5, 3)
+    trends.apply_event(t, T0 + 2 * DAY)                         # a late report for last week
+    assert (t.week_count, t.prev_week_count) == (5, 4)
+    trends.apply_event(t, T0 + 3 * trends.WEEK_S)               # a gap: both weeks start over
+    assert (t.week_count, t.prev_week_count) == (1, 0)
+
+def test_rates_decay_to_now():
+    t = _fold([T0])
+    assert trends.metrics(t, T0)["rate_fast"] == pytest.approx(math.log(2) / trends.FAST_HL_DAYS, abs=1e-4)
+    later = trends.metrics(t, T0 + trends.FAST_HL_DAYS * DAY)
+    assert later["rate_fast"] == pytest.approx(math.log(2) / trends.FAST_HL_DAYS / 2, abs=1e-4)
+
+def test_z_score_is_pro_rated_for_the_week_so_far():
+    t = _fold([T0 - 6 * DAY] * 8 + [T0 + DAY] * 6)               # last week 8, this week 6
+    now = T0 + 3.5 * DAY                                         # half the week gone: 4 expected
+    m = trends.metrics(t, now)
+    assert (m["this_week"], m["last_week"]) == (6, 8)
+    assert m["z"] == pytest.approx((6 - 4) / math.sqrt(4 + 1), abs=1e-3)
+    assert m["growth"] == pytest.approx(7 / 5, abs=1e-3)
+    # a week later the same row has nothing this week, and the 6 count as last week's
+    m = trends.metrics(t, now + trends.WEEK_S)
+    assert (m["this_week"], m["last_week"]) == (0, 6)
+
+def test_emerging_ranks_by_z_and_drops_small_or_flat_tiles():
+    now = T0 + 3.5 * DAY
+    rows = {
+        "surging": _fold([T0 + DAY] * 9),
+        "rising": _fold([T0 - 6 * DAY] * 2 + [T0 + DAY] * 6),
+        "flat": _fold([T0 - 6 * DAY] * 12 + [T0 + DAY] * 6),
+        "tiny": _fold([T0 + DAY] * 2),
+    }
+    for i, (name, t) in enumerate(rows.items()):
+        t.dzongkhag, t.tile_lat = name, 27.0 + i / 1000
+    assert [r["dzongkhag"] for r in trends.emerging(rows.values(), now_ts=now)] == ["surging", "rising"]
+    assert [r["dzongkhag"] for r in trends.emerging(rows.values(), limit=1, now_ts=now)] == ["surging"]
+
+def test_record_keeps_one_row_per_tile(app):
+    from models import db, HotspotTrend
+    lat, lon = 26.9505, 89.9505  # away from the other modules' seed data
+    when = datetime.utcnow() - timedelta(hours=2)
+    with app.app_context():
+        db.create_all()
+        trends.record(lat, lon, when=when, dzongkhag="chukha")
+        trends.record(lat + 0.0003, lon + 0.0003, when=when + timedelta(hours=1))   # same tile
+        trends.record(lat + 0.01, lon, weight=-1)            # undoing on an unseen tile adds nothing
+        trends.record(None, lon)
+        db.session.commit()
+
+        rows = HotspotTrend.query.filter(HotspotTrend.tile_lat.between(lat - 0.001, lat + 0.02),
+                                         HotspotTrend.tile_lon.between(lon - 0.001, lon + 0.001)).all()
+        assert len(rows) == 1
+        t = rows[0]
+        assert (t.tile_lat, t.tile_lon, t.dzongkhag, t.total) == (*trends.tile_of(lat, lon), "chukha", 2)
+        assert t.last_seen_at == when + timedelta(hours=1)
+
+        trends.record(lat, lon, when=when, weight=-1)
+        db.session.commit()
+        assert db.session.get(HotspotTrend, t.id).total == 1
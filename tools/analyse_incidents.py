@@ -0,0 +1,177 @@
+# tools/analyse_incidents.py
+# Background stage for camera incidents: sample keyframes from each clip, score
+# them with the Verifier in one batch and store the best frame's score plus a
+# thumbnail, so moderators can triage by score instead of watching clips.
+#
+# It reads the clips from static/uploads, so it must run where the web process
+# stores them (same machine or a shared volume). An incident whose clip or
+# image can't be read yet (no decoder installed, upload not there) or whose
+# scoring fails stays un-analysed and is retried after PV_INCIDENT_RETRY_S,
+# doubling per attempt, up to PV_INCIDENT_MAX_ATTEMPTS; its image score, if
+# any, is stored meanwhile. Each run also adds the retry columns to an
+# existing database.
+#
+# Usage:
+#   python tools/analyse_incidents.py                 # one pass over un-analysed incidents
+#   python tools/analyse_incidents.py --loop --interval 30
+import argparse, os, shutil, sys, time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from PIL import Image
+
+# Ensure project root is on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app import app, db, verifier, init_db
+from models import Incident
+from ai.keyframes import sample_keyframes, decoder_name
+
+THUMB_SIZE   = (320, 320)
+RETRY_S      = float(os.getenv("PV_INCIDENT_RETRY_S", "60"))        # first retry; doubles per attempt
+RETRY_MAX_S  = float(os.getenv("PV_INCIDENT_RETRY_MAX_S", "21600"))
+MAX_ATTEMPTS = int(os.getenv("PV_INCIDENT_MAX_ATTEMPTS", "10"))
+
+NEW_COLUMNS = [
+    ("analysis_attempts", "INTEGER DEFAULT 0"),
+    ("analysis_error", "VARCHAR(200)"),
+    ("next_analysis_at", "TIMESTAMP"),
+]
+
+def migrate(db):
+    from sqlalchemy import inspect, text
+    insp = inspect(db.engine)
+    if "incident" not in insp.get_table_names():
+        return
+    have = {c["name"] for c in insp.get_columns("incident")}
+    for name, coldef in NEW_COLUMNS:
+        if name not in have:
+            db.session.execute(text(f"ALTER TABLE incident ADD COLUMN {name} {coldef}"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_incident_next_analysis_at ON incident (next_analysis_at)"))
+    db.session.commit()
+
+def _abs(rel):
+    return os.path.join(app.root_path, rel.lstrip("/")) if rel else None
+
+def _write_thumb(frame_path, incident):
+    name = f"incident_{incident.id}_thumb.jpg"
+    out_dir = os.path.join(app.root_path, "static", "uploads", "events")
+    os.makedirs(out_dir, exist_ok=True)
+    img = Image.open(frame_path).convert("RGB")
+    img.thumbnail(THUMB_SIZE)
+    img.save(os.path.join(out_dir, name), "JPEG", quality=85)
+    return f"/static/uploads/events/{name}"
+
+def _retry_later(incident, error):
+    n = (incident.analysis_attempts or 0) + 1
+    delay = min(RETRY_MAX_S, RETRY_S * 2 ** (n - 1))
+    incident.analysis_attempts = n
+    incident.analysis_error = error[:200]
+    incident.next_analysis_at = datetime.utcnow() + timedelta(seconds=delay)
+    then = f"retrying in {delay:.0f}s" if n < MAX_ATTEMPTS else "giving up"
+    print(f"[INCIDENT {incident.id}] attempt {n}: {error}; {then}")
+
+def analyse_one(incident):
+    """
+    Score every frame we can get for one incident; returns number of frames scored.
+    analysed_at is only set once the clip and image were both read and scored.
+    """
+    tmp_dir = None
+    frames, problems = [], []
+    try:
+        if incident.video_path:
+            clip = _abs(incident.video_path)
+            kf, tmp_dir = sample_keyframes(clip)
+            frames.extend(kf)
+            if not kf:
+                problems.append("no video decoder (install PyAV or ffmpeg)" if decoder_name() is None
+                                else "clip not found" if not os.path.isfile(clip)
+                                else "no frames decoded from clip")
+        img = _abs(incident.image_path)
+        if img and os.path.isfile(img):
+            frames.append(img)
+        elif incident.image_path:
+            problems.append("image not found")
+
+        scores = []
+        if frames:
+            try:
+                scores = verifier.score_batch(frames)
+            except Exception as e:
+                print(f"[INCIDENT {incident.id}] scoring failed:", repr(e))
+                problems.append(f"scoring failed: {e!r}")
+
+        if problems:
+            _retry_later(incident, "; ".join(problems))
+        else:
+            incident.analysed_at = datetime.utcnow()
+            incident.analysis_error = incident.next_analysis_at = None
+        if not scores:
+            return 0
+
+        incident.frames_scored = len(scores)
+        best_i = max(range(len(scores)), key=lambda i: scores[i]["action_score"])
+        best = scores[best_i]
+        incident.ai_score = best["action_score"]
+        incident.ai_label = best["ai_label"]
+        incident.relevance_score = best["relevance_score"]
+        incident.model_version = best["model_version"]
+        incident.thumb_path = _write_thumb(frames[best_i], incident)
+        return len(scores)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def due_query(now=None):
+    """Incidents not analysed yet, still under MAX_ATTEMPTS and past their backoff."""
+    from sqlalchemy import or_
+    now = now or datetime.utcnow()
+    return Incident.query.filter(
+        Incident.analysed_at.is_(None),
+        or_(Incident.analysis_attempts.is_(None), Incident.analysis_attempts < MAX_ATTEMPTS),
+        or_(Incident.next_analysis_at.is_(None), Incident.next_analysis_at <= now),
+    )
+
+def run_pass(limit):
+    done = frames = 0
+    last = 0
+    now = datetime.utcnow()
+    while True:
+        batch = (due_query(now)
+                 .filter(Incident.id > last)
+                 .order_by(Incident.id.asc())
+                 .limit(limit)
+                 .all())
+        if not batch:
+            break
+        for inc in batch:
+            frames += analyse_one(inc)
+            done += 1
+        last = batch[-1].id
+        db.session.commit()
+    return done, frames
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=int, default=50, help="incidents per commit")
+    parser.add_argument("--loop", action="store_true", help="keep polling for new incidents")
+    parser.add_argument("--interval", type=float, default=30.0, help="seconds between polls with --loop")
+    args = parser.parse_args()
+
+    init_db()
+    print(f"[INFO] keyframe decoder: {decoder_name() or 'none (clips retried until one is installed)'}")
+    with app.app_context():
+        migrate(db)
+        while True:
+            t0 = time.time()
+            done, frames = run_pass(args.limit)
+            if done:
+                print(f"Analysed {done} incident(s), {frames} frame(s) in {time.time() - t0:.1f}s.")
+            if not args.loop:
+                break
+            time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
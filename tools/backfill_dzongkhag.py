@@ -0,0 +1,92 @@
+# tools/backfill_dzongkhag.py
+# Add Submission.dzongkhag / zone (+ HotspotRollup.dzongkhag) to an existing
+# database and fill them from lat/lon with geo/dzongkhags.py.
+#
+# New uploads get these at ingest; run this once after deploying, and again
+# with --all whenever the GeoJSON polygons change.
+#
+# Usage:
+#   python tools/backfill_dzongkhag.py
+#   python tools/backfill_dzongkhag.py --all --chunk 5000
+import argparse, sys
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.batch_utils import iter_id_chunks, Progress
+
+NEW_COLUMNS = [
+    ("submission", "dzongkhag", "VARCHAR(32)"),
+    ("submission", "zone", "VARCHAR(64)"),
+    ("hotspot_rollup", "dzongkhag", "VARCHAR(32)"),
+]
+NEW_INDEXES = [
+    ("ix_submission_dzongkhag", "submission", "dzongkhag"),
+    ("ix_submission_zone", "submission", "zone"),
+    ("ix_hotspot_rollup_dzongkhag", "hotspot_rollup", "dzongkhag"),
+]
+
+def migrate(db):
+    from sqlalchemy import inspect, text
+    insp = inspect(db.engine)
+    tables = set(insp.get_table_names())
+    for table, col, coltype in NEW_COLUMNS:
+        if table not in tables:
+            continue
+        if col in {c["name"] for c in insp.get_columns(table)}:
+            continue
+        db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {col} {coltype}"))
+        print(f"Column {table}.{col} added.")
+    for name, table, col in NEW_INDEXES:
+        if table in tables:
+            db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({col})"))
+    db.session.commit()
+
+def backfill(db, model, lat_col, lon_col, fields, resolve, chunk, only_missing):
+    from sqlalchemy import update
+    where = [lat_col.isnot(None), lon_col.isnot(None)]
+    if only_missing:
+        where.append(getattr(model, fields[0]).is_(None))
+    total = db.session.query(model.id).filter(*where).count()
+    prog = Progress(total, label=model.__tablename__)
+    tally = Counter()
+    for rows in iter_id_chunks(db.session, model, [lat_col, lon_col], chunk=chunk, where=where):
+        updates = []
+        for rid, lat, lon in rows:
+            values = resolve(lat, lon)
+            tally[values[0] or "(outside)"] += 1
+            updates.append({"id": rid, **dict(zip(fields, values))})
+        db.session.execute(update(model), updates)  # bulk UPDATE by primary key
+        db.session.commit()
+        prog.update(len(rows))
+    prog.finish()
+    return tally
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--all", action="store_true", help="recompute every row, not only unset ones")
+    parser.add_argument("--chunk", type=int, default=2000)
+    args = parser.parse_args()
+
+    from app import app, db, init_db
+    from models import Submission, HotspotRollup
+    from geo.dzongkhags import get_resolver
+
+    resolver = get_resolver()
+    with app.app_context():
+        init_db()
+        migrate(db)
+        tally = backfill(db, Submission, Submission.lat, Submission.lon, ("dzongkhag", "zone"),
+                         resolver.lookup, args.chunk, not args.all)
+        backfill(db, HotspotRollup, HotspotRollup.tile_lat, HotspotRollup.tile_lon, ("dzongkhag",),
+                 lambda la, lo: resolver.lookup(la, lo)[:1], args.chunk, not args.all)
+
+    for name, n in tally.most_common():
+        print(f"  {name}: {n}")
+    print(f"Backfilled dzongkhag for {sum(tally.values())} submission(s) using {resolver.source}.")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,16 @@
 # tools/backfill_phash.py
+# Fill Submission.phash for rows that don't have one yet.
+#
+# Streams ids in keyset-paginated chunks (constant memory), hashes images in a
+# process pool and commits every --commit-every rows, so a crash loses at most
+# one batch; rerun with --resume-from-id (printed as it goes) to continue.
+#
+# Usage:
+#   python tools/backfill_phash.py
+#   python tools/backfill_phash.py --workers 8 --chunk 2000 --resume-from-id 150000
+import argparse, os, sys
+from multiprocessing import Pool
 from pathlib import Path
-import sys, os
 from PIL import Image
 import imagehash
 
@@ -9,23 +19,65 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-# IMPORTANT: this assumes your main file is app.py.
-# If your file is named apps.py, change next line to: from apps import app, db
-from app import app, db
-from models import Submission
-
-with app.app_context():
-    updated = 0
-    rows = Submission.query.all()
-    for s in rows:
-        if not s.phash and s.image_path:
-            abs_path = os.path.join(app.root_path, s.image_path)
-            if os.path.exists(abs_path):
-                try:
-                    ph = imagehash.phash(Image.open(abs_path))
-                    s.phash = str(ph)
-                    updated += 1
-                except Exception:
-                    pass
-    db.session.commit()
-    print(f"Backfilled {updated} phash values.")
+from tools.batch_utils import iter_id_chunks, Progress
+
+def _hash_one(item):
+    """(id, abs_path) -> (id, phash hex | None); runs in a pool worker."""
+    sid, abs_path = item
+    if not abs_path or not os.path.exists(abs_path):
+        return sid, None
+    try:
+        return sid, str(imagehash.phash(Image.open(abs_path)))
+    except Exception:
+        return sid, None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--chunk", type=int, default=1000, help="rows read per query")
+    parser.add_argument("--commit-every", type=int, default=1000, help="rows per UPDATE/commit")
+    parser.add_argument("--resume-from-id", type=int, default=0, help="only rows with id > this")
+    args = parser.parse_args()
+
+    from sqlalchemy import or_, update
+    from app import app, db
+    from models import Submission
+
+    missing = (or_(Submission.phash.is_(None), Submission.phash == ""), Submission.image_path.isnot(None))
+
+    with app.app_context(), Pool(args.workers) as pool:
+        total = (db.session.query(Submission.id)
+                 .filter(Submission.id > args.resume_from_id, *missing)
+                 .count())
+        print(f"[INFO] {total} row(s) without phash after id {args.resume_from_id}; {args.workers} worker(s)")
+
+        prog = Progress(total, label="phash")
+        pending, updated, last_committed = [], 0, args.resume_from_id
+
+        def flush(upto_id):
+            nonlocal pending, updated, last_committed
+            if pending:
+                db.session.execute(update(Submission), pending)  # bulk UPDATE by primary key
+                db.session.commit()
+                updated += len(pending)
+                pending = []
+            last_committed = upto_id
+            prog.label = f"phash, committed through id {upto_id}"
+
+        for rows in iter_id_chunks(db.session, Submission, [Submission.image_path],
+                                   chunk=args.chunk, start_after=args.resume_from_id, where=list(missing)):
+            items = [(sid, os.path.join(app.root_path, p)) for sid, p in rows]
+            # imap keeps input order, so every flushed id below is fully done
+            for sid, ph in pool.imap(_hash_one, items, chunksize=32):
+                if ph:
+                    pending.append({"id": sid, "phash": ph})
+                prog.update(1)
+                if len(pending) >= args.commit_every:
+                    flush(sid)
+            flush(rows[-1][0])
+        prog.finish()
+
+    print(f"Backfilled {updated} phash values. (resume with --resume-from-id {last_committed})")
+
+if __name__ == "__main__":
+    main()
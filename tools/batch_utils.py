@@ -0,0 +1,98 @@
+# tools/batch_utils.py — shared helpers for the long-running maintenance tools
+# (keyset-paginated reads, progress/ETA line, crash-safe checkpoints)
+import json, os, sys, time
+
+
+def iter_id_chunks(session, model, columns, chunk=1000, start_after=0, where=None):
+    """
+    Yield lists of rows (id first, then `columns`) in ascending id order,
+    `chunk` rows at a time, using keyset pagination (id > last) so every page is
+    an index range scan and nothing but the current page is held in memory.
+    """
+    last = start_after or 0
+    while True:
+        q = session.query(model.id, *columns).filter(model.id > last)
+        if where is not None:
+            q = q.filter(*where) if isinstance(where, (list, tuple)) else q.filter(where)
+        rows = q.order_by(model.id.asc()).limit(chunk).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+def chunked(seq, n):
+    for i in range(0, len(seq), n):
+        yield seq[i:i + n]
+
+
+def _fmt_secs(s):
+    s = int(max(0, s))
+    if s >= 3600:
+        return f"{s // 3600}h{(s % 3600) // 60:02d}m"
+    if s >= 60:
+        return f"{s // 60}m{s % 60:02d}s"
+    return f"{s}s"
+
+
+class Progress:
+    """One-line progress/ETA on stderr, redrawn at most every `every` seconds."""
+
+    def __init__(self, total, label="", every=0.5, stream=None):
+        self.total = total or 0
+        self.label = label
+        self.every = every
+        self.stream = stream or sys.stderr
+        self.done = 0
+        self.t0 = time.time()
+        self._last_draw = 0.0
+
+    @property
+    def elapsed(self):
+        return time.time() - self.t0
+
+    @property
+    def rate(self):
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def update(self, n=1, force=False):
+        self.done += n
+        now = time.time()
+        if force or now - self._last_draw >= self.every:
+            self._last_draw = now
+            self._draw()
+
+    def _draw(self):
+        rate = self.rate
+        if self.total:
+            pct = 100.0 * self.done / self.total
+            left = (self.total - self.done) / rate if rate > 0 else 0
+            msg = f"{self.done}/{self.total} ({pct:.1f}%) {rate:.1f}/s ETA {_fmt_secs(left)}"
+        else:
+            msg = f"{self.done} {rate:.1f}/s"
+        self.stream.write(f"\r[{self.label}] {msg}   ")
+        self.stream.flush()
+
+    def finish(self):
+        self._draw()
+        self.stream.write("\n")
+        self.stream.flush()
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, data):
+    """Write atomically so a crash mid-write never leaves a corrupt checkpoint."""
+    if not path:
+        return
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
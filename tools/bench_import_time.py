@@ -0,0 +1,92 @@
+# tools/bench_import_time.py
+# Measure what `import app` costs using `python -X importtime`, so regressions
+# (e.g. a heavy library imported at module level again) show up in CI/locally.
+#
+# Usage:
+#   python tools/bench_import_time.py                       # report, 5 runs
+#   python tools/bench_import_time.py --budget-ms 900       # exit 1 if the median is over budget
+#   python tools/bench_import_time.py --json import_time.json
+import argparse, json, os, statistics, subprocess, sys, tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Must never be imported just by importing the app (they load on first score()).
+DEFAULT_FORBIDDEN = "onnxruntime,tensorflow"
+
+def _parse_importtime(stderr: str):
+    """-> {module: (self_us, cumulative_us)}"""
+    mods = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # header row
+        mods[parts[2].strip()] = (self_us, cum_us)
+    return mods
+
+def run_once(module: str):
+    env = dict(os.environ)
+    # throwaway DB so the measurement never touches real data
+    env.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.gettempdir(), 'pv_importtime.db').as_posix()}")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(ROOT), env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return _parse_importtime(proc.stderr)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="show the N slowest modules (cumulative)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if median total exceeds this")
+    parser.add_argument("--forbid", default=DEFAULT_FORBIDDEN, help="comma list of modules that must not be imported")
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args()
+
+    totals, last = [], {}
+    for _ in range(max(1, args.runs)):
+        last = run_once(args.module)
+        totals.append(last.get(args.module, (0, 0))[1] / 1000.0)
+
+    median_ms = statistics.median(totals)
+    print(f"import {args.module}: median {median_ms:.1f} ms over {len(totals)} run(s) "
+          f"(min {min(totals):.1f}, max {max(totals):.1f})")
+
+    top = sorted(last.items(), key=lambda kv: kv[1][1], reverse=True)[:args.top]
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, (self_us, cum_us) in top:
+        print(f"{cum_us / 1000.0:14.1f} {self_us / 1000.0:9.1f}  {name}")
+
+    forbidden = [m.strip() for m in args.forbid.split(",") if m.strip()]
+    leaked = [m for m in forbidden if m in last]
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({
+                "module": args.module,
+                "runs_ms": totals,
+                "median_ms": median_ms,
+                "top": [{"module": n, "cumulative_ms": c / 1000.0, "self_ms": s / 1000.0} for n, (s, c) in top],
+                "forbidden_imported": leaked,
+            }, f, indent=2)
+
+    failed = False
+    if leaked:
+        print("FAIL: imported at startup but should be lazy:", ", ".join(leaked))
+        failed = True
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        print(f"FAIL: median {median_ms:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        failed = True
+    raise SystemExit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# tools/bench_uploads.py
+# Concurrency benchmark: many parallel POST /upload_api, reports throughput,
+# latency percentiles and how many requests failed (e.g. "database is locked").
+#
+# In-process (default): spins up the Flask app against --db with one test client
+# per thread. Compare engine profiles (see db_profile.py) by running it twice:
+#   python tools/bench_uploads.py --db sqlite:////tmp/bench.db --profile none
+#   python tools/bench_uploads.py --db sqlite:////tmp/bench.db --profile auto
+#
+# Against a running server (e.g. gunicorn with several workers):
+#   python tools/bench_uploads.py --url http://127.0.0.1:8000 --user alice --password secret
+import argparse, io, json, os, random, sys, threading, time, uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+def _jpeg(seed, size=640):
+    from PIL import Image
+    rnd = random.Random(seed)
+    img = Image.new("RGB", (size, size), (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+    px = img.load()
+    for _ in range(400):  # some texture so phashes differ
+        x, y = rnd.randrange(size), rnd.randrange(size)
+        px[x, y] = (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+def _form(i):
+    return {
+        "lat": f"{27.47 + random.uniform(-0.02, 0.02):.6f}",
+        "lon": f"{89.63 + random.uniform(-0.02, 0.02):.6f}",
+        "reporter_location": "at_place",
+        "report_type": "illegal_dumping",
+        "message": f"bench {i}",
+    }
+
+def _pct(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+# ---- in-process client ----
+class _LocalClient:
+    def __init__(self, app, username, password):
+        self.c = app.test_client()
+        r = self.c.post("/login", data={"identifier": username, "password": password})
+        if r.status_code not in (200, 302):
+            raise RuntimeError(f"login failed: {r.status_code}")
+
+    def upload(self, i, jpeg):
+        data = dict(_form(i))
+        data["photo"] = (io.BytesIO(jpeg), f"bench_{i}.jpg")
+        r = self.c.post("/upload_api", data=data, content_type="multipart/form-data")
+        return r.status_code, r.get_data(as_text=True)[:200]
+
+# ---- HTTP client (stdlib only) ----
+class _HttpClient:
+    def __init__(self, base, username, password):
+        import urllib.request, urllib.parse, http.cookiejar
+        self.base = base.rstrip("/")
+        self.urlreq = urllib.request
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        body = urllib.parse.urlencode({"identifier": username, "password": password}).encode()
+        self.opener.open(self.base + "/login", data=body, timeout=30).read()
+
+    def upload(self, i, jpeg):
+        boundary = uuid.uuid4().hex
+        parts = []
+        for k, v in _form(i).items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode())
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="photo"; filename="bench_{i}.jpg"\r\n'
+                     f"Content-Type: image/jpeg\r\n\r\n".encode() + jpeg + b"\r\n")
+        parts.append(f"--{boundary}--\r\n".encode())
+        req = self.urlreq.Request(self.base + "/upload_api", data=b"".join(parts), method="POST",
+                                  headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        try:
+            with self.opener.open(req, timeout=60) as r:
+                return r.status, r.read(200).decode("utf-8", "replace")
+        except self.urlreq.HTTPError as e:
+            return e.code, e.read(200).decode("utf-8", "replace")
+
+def _local_setup(args):
+    os.environ["DATABASE_URL"] = args.db
+    os.environ["PV_DB_PROFILE"] = args.profile
+    os.environ["RATELIMIT_ENABLED"] = "0"
+    from werkzeug.security import generate_password_hash
+    from app import app, db, init_db
+    import db_profile
+    from models import User
+
+    init_db()
+    with app.app_context():
+        if not User.query.filter_by(username=args.user).first():
+            db.session.add(User(username=args.user, email=f"{args.user}@bench.local",
+                                password_hash=generate_password_hash(args.password)))
+            db.session.commit()
+    print("[BENCH] engines:", json.dumps(db_profile.describe(app, db)))
+    return lambda: _LocalClient(app, args.user, args.password)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--db", default="sqlite:////tmp/pv_bench.db", help="in-process DATABASE_URL")
+    parser.add_argument("--profile", default="auto", help="in-process PV_DB_PROFILE (auto|sqlite|postgres|none)")
+    parser.add_argument("--user", default="bench")
+    parser.add_argument("--password", default="bench-pass")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    if args.url:
+        make_client = lambda: _HttpClient(args.url, args.user, args.password)
+    else:
+        make_client = _local_setup(args)
+
+    images = [_jpeg(i) for i in range(min(args.requests, 32))]
+    tls = threading.local()
+
+    def one(i):
+        client = getattr(tls, "client", None)
+        if client is None:
+            client = tls.client = make_client()
+        t0 = time.perf_counter()
+        try:
+            status, body = client.upload(i, images[i % len(images)])
+        except Exception as e:
+            status, body = "exc", repr(e)
+        return status, body, time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - t0
+
+    statuses = Counter(str(s) for s, _, _ in results)
+    ok_lat = sorted(dt for s, _, dt in results if s == 200)
+    locked = sum(1 for s, b, _ in results if s != 200 and "locked" in b)
+    summary = {
+        "target": args.url or f"in-process {args.db} (profile={args.profile})",
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "ok": len(ok_lat),
+        "errors": args.requests - len(ok_lat),
+        "database_locked": locked,
+        "statuses": dict(statuses),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(ok_lat) / wall, 2) if wall else 0.0,
+        "p50_ms": round(_pct(ok_lat, 50) * 1000, 1),
+        "p95_ms": round(_pct(ok_lat, 95) * 1000, 1),
+        "p99_ms": round(_pct(ok_lat, 99) * 1000, 1),
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{summary['target']}: {summary['ok']}/{args.requests} ok ({summary['database_locked']} locked) "
+              f"at concurrency {args.concurrency} in {wall:.1f}s -> {summary['throughput_rps']} uploads/s, "
+              f"p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms")
+        if len(statuses) > 1 or "200" not in statuses:
+            print("  statuses:", dict(statuses))
+            bad = next((b for s, b, _ in results if s != 200), "")
+            print("  first error:", bad)
+
+if __name__ == "__main__":
+    main()
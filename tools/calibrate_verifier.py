@@ -0,0 +1,327 @@
+# tools/calibrate_verifier.py
+# Tune PV_ACTION_CUTOFF, PV_HEURISTIC_BIAS, PV_DUP_PENALTY / PV_DUP_DISTANCE and
+# the action-score weights (PV_ACTION_W_REL, PV_ACTION_W_AUTH,
+# PV_ACTION_EXIF_BONUS) against a labeled image folder.
+#
+# Images are scored once and their raw features cached in an .npz next to the
+# folder (model relevance, raw heuristic, EXIF state, phash); later runs only
+# score new or changed files. The sweep then recomputes ai/verifier.py's
+# action_score for every weight combination at once in NumPy and finds the best
+# cutoff for each, so trying thousands of settings takes well under a second.
+#
+# Folder layout: <dir>/valid/*.jpg and <dir>/invalid/*.jpg (see --positive /
+# --negative for other names), or --labels file.csv with "path,label" rows.
+# Duplicates are judged within the set: an image counts as a duplicate when an
+# earlier one (by file name) is within the phash distance being tried.
+#
+# Usage:
+#   python tools/calibrate_verifier.py data/labeled
+#   python tools/calibrate_verifier.py data/labeled --min-precision 0.9 --out calib.json
+#   python tools/calibrate_verifier.py data/labeled --w-rel 0.4:0.8:0.02 --rel heuristic
+import argparse, csv, json, os, sys, time
+from itertools import product
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.batch_utils import chunked, Progress
+
+IMAGE_EXT = {".jpg", ".jpeg", ".png", ".webp"}
+POSITIVE = "valid,valid_report,positive,1"
+NEGATIVE = "invalid,negative,0"
+
+def _env_defaults():
+    # same model defaults as app.py / tools/rescore_submissions.py
+    os.environ.setdefault("PV_MODEL_PATH", str(ROOT / "ai" / "waste_v1" / "validity_classifier.onnx"))
+    os.environ.setdefault("PV_CLASS_MAP_PATH", str(ROOT / "ai" / "waste_v1" / "class_map.json"))
+    os.environ.setdefault("PV_MODEL_VERSION", "waste_v1_onnx")
+
+def _grid(spec):
+    """"0.3:0.8:0.05" -> array of steps (inclusive); "0.1,0.2" -> those values."""
+    import numpy as np
+    if ":" in spec:
+        lo, hi, step = (float(x) for x in spec.split(":"))
+        return np.round(np.arange(lo, hi + step / 2, step), 6)
+    return np.array([float(x) for x in spec.split(",")])
+
+# -------------------------
+# Labeled set + feature cache
+# -------------------------
+def load_labels(args):
+    """-> [(abs path, 0/1)] sorted by path"""
+    items = []
+    if args.labels:
+        base = Path(args.labels).resolve().parent
+        with open(args.labels, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if len(row) < 2 or row[0].strip().lower() == "path":
+                    continue
+                items.append((str((base / row[0].strip()).resolve()), 1 if row[1].strip() in ("1", "true", "valid") else 0))
+    else:
+        pos = set(args.positive.split(","))
+        neg = set(args.negative.split(","))
+        for sub in sorted(Path(args.folder).iterdir()):
+            if not sub.is_dir() or sub.name not in pos | neg:
+                continue
+            label = 1 if sub.name in pos else 0
+            items += [(str(p.resolve()), label) for p in sub.rglob("*") if p.suffix.lower() in IMAGE_EXT]
+    return sorted(items)
+
+def extract_features(items, cache_path, batch=32, rel_mode="auto"):
+    """Score every image once; reuse cached rows whose file digest (and model) is unchanged."""
+    import numpy as np
+    from ai.score_cache import file_digest
+    from ai.verifier import Verifier, compute_phash, exif_code, exif_time_okay, heuristic_raw
+
+    verifier = Verifier(score_cache="", inference_socket="").load()
+    use_model = verifier.model_kind != "heuristic" and rel_mode != "heuristic"
+    model_tag = f"{verifier.model_version}_{verifier.model_kind}" if use_model else "heuristic"
+
+    cached = {}
+    if cache_path and os.path.exists(cache_path):
+        z = np.load(cache_path, allow_pickle=False)
+        if str(z["model_tag"]) == model_tag:
+            for i, d in enumerate(z["digest"]):
+                cached[str(d)] = (float(z["rel_model"][i]), float(z["raw_heur"][i]), int(z["exif"][i]), int(z["phash"][i]))
+
+    digests = [file_digest(p) for p, _ in items]
+    todo = [i for i, d in enumerate(digests) if d not in cached]
+    if todo:
+        prog = Progress(len(todo), label="scoring")
+        for part in chunked(todo, batch):
+            paths = [items[i][0] for i in part]
+            rels = [s["relevance_score"] for s in verifier.score_batch(paths)] if use_model else [np.nan] * len(paths)
+            for i, p, rel in zip(part, paths, rels):
+                cached[digests[i]] = (rel, heuristic_raw(p), exif_code(exif_time_okay(p)),
+                                      int(compute_phash(p), 16))
+            prog.update(len(part))
+        prog.finish()
+
+    rows = [cached[d] for d in digests]
+    feats = {
+        "digest": np.array(digests),
+        "path": np.array([p for p, _ in items]),
+        "label": np.array([y for _, y in items], dtype=np.int8),
+        "rel_model": np.array([r[0] for r in rows], dtype=np.float64),
+        "raw_heur": np.array([r[1] for r in rows], dtype=np.float64),
+        "exif": np.array([r[2] for r in rows], dtype=np.int8),
+        "phash": np.array([r[3] for r in rows], dtype=np.uint64),
+        "model_tag": np.array(model_tag),
+    }
+    if cache_path:
+        np.savez_compressed(cache_path, **feats)
+    return feats, len(todo)
+
+def min_earlier_distance(phash):
+    """Hamming distance from each phash to the nearest earlier one (64 for the first)."""
+    import numpy as np
+    n = len(phash)
+    popcnt = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    out = np.full(n, 64, dtype=np.int16)
+    for start in range(0, n, 256):
+        rows = phash[start:start + 256]
+        x = rows[:, None] ^ phash[None, :]                              # (r, n) uint64
+        dist = popcnt[x.view(np.uint8).reshape(len(rows), n, 8)].sum(axis=2, dtype=np.int16)
+        earlier = np.arange(n)[None, :] < (start + np.arange(len(rows)))[:, None]
+        dist = np.where(earlier, dist, 64)
+        out[start:start + len(rows)] = dist.min(axis=1)
+    return out
+
+# -------------------------
+# Vectorized sweep
+# -------------------------
+def curve_metrics(S, y, min_precision=None):
+    """
+    S (configs, n) scores, y (n,) labels. For every row: ROC AUC and the cutoff
+    maximising F1 (or recall at precision >= min_precision). Score >= cutoff
+    means AUTO_OK.
+    """
+    import numpy as np
+    P = int(y.sum())
+    N = len(y) - P
+    order = np.argsort(-S, axis=1)
+    Ss = np.take_along_axis(S, order, axis=1)
+    ys = y[order]
+    tp = np.cumsum(ys, axis=1)
+    fp = np.cumsum(1 - ys, axis=1)
+    # a threshold only exists where the next score is lower (ties move together)
+    valid = np.ones_like(Ss, dtype=bool)
+    valid[:, :-1] = Ss[:, :-1] > Ss[:, 1:]
+    precision = tp / np.maximum(tp + fp, 1)
+    recall = tp / max(P, 1)
+    f1 = 2 * precision * recall / np.maximum(precision + recall, 1e-12)
+    if min_precision is None:
+        objective = f1
+    else:
+        objective = np.where(precision >= min_precision, recall + 1e-6 * precision, -1.0)
+    objective = np.where(valid, objective, -2.0)
+    k = objective.argmax(axis=1)
+    rows = np.arange(len(S))
+
+    # AUC: each invalid image counts the valid ones above it, plus half of those tied with it
+    n = S.shape[1]
+    pos = np.arange(n)
+    group_end = np.minimum.accumulate(np.where(valid, pos, n - 1)[:, ::-1], axis=1)[:, ::-1]
+    before = np.maximum.accumulate(np.where(valid, pos, -1), axis=1)
+    prev = np.full_like(before, -1)
+    prev[:, 1:] = before[:, :-1]
+    tp_end = np.take_along_axis(tp, group_end, axis=1)
+    tp_start = np.where(prev >= 0, np.take_along_axis(tp, np.maximum(prev, 0), axis=1), 0)
+    auc = ((tp_start + tp_end) * (1 - ys)).sum(axis=1) / 2 / max(P * N, 1)
+    return {
+        "cutoff": Ss[rows, k], "precision": precision[rows, k], "recall": recall[rows, k],
+        "f1": f1[rows, k], "auc": auc, "feasible": objective[rows, k] > -1.0,
+        "tp": tp[rows, k], "fp": fp[rows, k],
+    }
+
+def sweep(feats, dup_dist, grids, rel_source, min_precision=None):
+    """Every combination in `grids` -> (params list, metrics dict of arrays)."""
+    import numpy as np
+    from ai.verifier import action_score, heuristic_from_raw
+    y = feats["label"].astype(np.int64)
+    exif = feats["exif"]
+    w_rel, w_auth, bonus, pen = (a.ravel() for a in np.meshgrid(
+        grids["w_rel"], grids["w_auth"], grids["exif_bonus"], grids["dup_penalty"], indexing="ij"))
+
+    params, parts = [], []
+    biases = grids["bias"] if rel_source == "heuristic" else [0.0]
+    for bias, dd in product(biases, grids["dup_distance"]):
+        rel = heuristic_from_raw(feats["raw_heur"], bias=bias) if rel_source == "heuristic" else feats["rel_model"]
+        is_dup = (dup_dist <= dd).astype(np.float64)
+        S = action_score(rel[None, :], exif[None, :], is_dup[None, :], w_rel=w_rel[:, None],
+                         w_auth=w_auth[:, None], exif_bonus=bonus[:, None], dup_penalty=pen[:, None])
+        parts.append(curve_metrics(S, y, min_precision))
+        params += [{"w_rel": float(a), "w_auth": float(b), "exif_bonus": float(c), "dup_penalty": float(d),
+                    "bias": float(bias), "dup_distance": int(dd)} for a, b, c, d in zip(w_rel, w_auth, bonus, pen)]
+    metrics = {k: np.concatenate([m[k] for m in parts]) for k in parts[0]}
+    return params, metrics
+
+def config_scores(feats, dup_dist, p, rel_source):
+    import numpy as np
+    from ai.verifier import action_score, heuristic_from_raw
+    rel = heuristic_from_raw(feats["raw_heur"], bias=p["bias"]) if rel_source == "heuristic" else feats["rel_model"]
+    return action_score(rel, feats["exif"], (dup_dist <= p["dup_distance"]).astype(np.float64),
+                        w_rel=p["w_rel"], w_auth=p["w_auth"], exif_bonus=p["exif_bonus"],
+                        dup_penalty=p["dup_penalty"])
+
+def curves(scores, y, points=101):
+    """PR and ROC points at `points` evenly spaced cutoffs."""
+    import numpy as np
+    cut = np.linspace(0.0, 1.0, points)
+    pred = scores[None, :] >= cut[:, None]
+    tp = (pred & (y == 1)).sum(axis=1)
+    fp = (pred & (y == 0)).sum(axis=1)
+    P, N = max(int(y.sum()), 1), max(int((y == 0).sum()), 1)
+    prec = np.where(tp + fp > 0, tp / np.maximum(tp + fp, 1), 1.0)
+    return {"cutoff": cut.round(3).tolist(), "precision": prec.round(4).tolist(),
+            "recall": (tp / P).round(4).tolist(), "fpr": (fp / N).round(4).tolist()}
+
+def at_cutoff(scores, y, cutoff):
+    import numpy as np
+    pred = scores >= cutoff
+    tp, fp = int((pred & (y == 1)).sum()), int((pred & (y == 0)).sum())
+    fn, tn = int((~pred & (y == 1)).sum()), int((~pred & (y == 0)).sum())
+    prec = tp / (tp + fp) if tp + fp else 0.0
+    rec = tp / (tp + fn) if tp + fn else 0.0
+    return {"cutoff": round(float(cutoff), 4), "precision": round(prec, 4), "recall": round(rec, 4),
+            "f1": round(2 * prec * rec / (prec + rec), 4) if prec + rec else 0.0,
+            "tp": tp, "fp": fp, "fn": fn, "tn": tn}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder", nargs="?", help="labeled folder (<dir>/valid, <dir>/invalid)")
+    parser.add_argument("--labels", help="CSV of path,label (1/0) instead of a folder")
+    parser.add_argument("--positive", default=POSITIVE, help="sub-folder names that are valid reports")
+    parser.add_argument("--negative", default=NEGATIVE, help="sub-folder names that are not")
+    parser.add_argument("--cache", help="feature cache (.npz); default <folder>/.verifier_features.npz")
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--rel", choices=("auto", "model", "heuristic"), default="auto",
+                        help="relevance source; heuristic also sweeps PV_HEURISTIC_BIAS")
+    parser.add_argument("--w-rel", default="0.30:0.80:0.05")
+    parser.add_argument("--w-auth", default="0.00:0.50:0.05")
+    parser.add_argument("--exif-bonus", default="0,0.04,0.08,0.12")
+    parser.add_argument("--dup-penalty", default="0,0.2,0.4,0.6")
+    parser.add_argument("--dup-distance", default="3,5,8")
+    parser.add_argument("--bias", default="-0.10:0.10:0.02")
+    parser.add_argument("--min-precision", type=float, help="maximise recall at this precision instead of F1")
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--out", help="write metrics, recommendation and PR/ROC curves as JSON")
+    args = parser.parse_args()
+    if not (args.folder or args.labels):
+        parser.error("give a labeled folder or --labels")
+
+    _env_defaults()
+    import numpy as np
+    from ai import verifier as V
+
+    items = load_labels(args)
+    if not items or len({y for _, y in items}) < 2:
+        raise SystemExit("need both valid and invalid images")
+    cache = args.cache or str(Path(args.folder or Path(args.labels).parent) / ".verifier_features.npz")
+    t0 = time.time()
+    feats, scored = extract_features(items, cache, batch=args.batch, rel_mode=args.rel)
+    print(f"{len(items)} image(s) ({int(feats['label'].sum())} valid), {scored} scored, "
+          f"{len(items) - scored} from cache ({time.time() - t0:.1f}s)")
+
+    rel_source = "heuristic" if args.rel == "heuristic" or np.isnan(feats["rel_model"]).any() else "model"
+    dup_dist = min_earlier_distance(feats["phash"])
+    y = feats["label"].astype(np.int64)
+    grids = {"w_rel": _grid(args.w_rel), "w_auth": _grid(args.w_auth), "exif_bonus": _grid(args.exif_bonus),
+             "dup_penalty": _grid(args.dup_penalty), "dup_distance": _grid(args.dup_distance).astype(int),
+             "bias": _grid(args.bias)}
+
+    current = {"w_rel": V.ACTION_W_REL, "w_auth": V.ACTION_W_AUTH, "exif_bonus": V.ACTION_EXIF_BONUS,
+               "dup_penalty": 0.0 if V.DISABLE_DUP_PENALTY else V.DUP_PENALTY_VALUE,
+               "bias": V.HEURISTIC_BIAS, "dup_distance": V.DUP_DISTANCE}
+    cur_scores = config_scores(feats, dup_dist, current, rel_source)
+    cur = at_cutoff(cur_scores, y, V.PV_ACTION_CUTOFF)
+
+    t0 = time.perf_counter()
+    params, m = sweep(feats, dup_dist, grids, rel_source, args.min_precision)
+    sweep_ms = (time.perf_counter() - t0) * 1000
+    key = m["recall"] if args.min_precision is not None else m["f1"]
+    rank = np.lexsort((-m["auc"], -np.where(m["feasible"], key, -1.0)))
+    print(f"swept {len(params)} setting(s) x {len(items)} image(s) in {sweep_ms:.0f} ms "
+          f"(relevance from {rel_source})")
+
+    print(f"current : cutoff {cur['cutoff']:.2f}  P {cur['precision']:.3f}  R {cur['recall']:.3f}  "
+          f"F1 {cur['f1']:.3f}  ({json.dumps(current)})")
+    top = []
+    for i in rank[:args.top]:
+        row = {**params[i], "cutoff": round(float(m["cutoff"][i]), 4), "precision": round(float(m["precision"][i]), 4),
+               "recall": round(float(m["recall"][i]), 4), "f1": round(float(m["f1"][i]), 4),
+               "auc": round(float(m["auc"][i]), 4), "feasible": bool(m["feasible"][i])}
+        top.append(row)
+        print(f"candidate: cutoff {row['cutoff']:.3f}  P {row['precision']:.3f}  R {row['recall']:.3f}  "
+              f"F1 {row['f1']:.3f}  AUC {row['auc']:.3f}  w_rel {row['w_rel']} w_auth {row['w_auth']} "
+              f"exif {row['exif_bonus']} dup {row['dup_penalty']}@{row['dup_distance']}"
+              + (f" bias {row['bias']}" if rel_source == "heuristic" else ""))
+    if args.min_precision is not None and not top[0]["feasible"]:
+        print(f"no setting reaches precision {args.min_precision}; showing the best F1 instead")
+
+    best = top[0]
+    env = {"PV_ACTION_CUTOFF": best["cutoff"], "PV_ACTION_W_REL": best["w_rel"], "PV_ACTION_W_AUTH": best["w_auth"],
+           "PV_ACTION_EXIF_BONUS": best["exif_bonus"], "PV_DUP_PENALTY": best["dup_penalty"],
+           "PV_DUP_DISTANCE": best["dup_distance"]}
+    if rel_source == "heuristic":
+        env["PV_HEURISTIC_BIAS"] = best["bias"]
+    print("recommended:\n" + "\n".join(f"  {k}={v}" for k, v in env.items()))
+
+    if args.out:
+        best_scores = config_scores(feats, dup_dist, best, rel_source)
+        doc = {
+            "images": len(items), "valid": int(y.sum()), "relevance_source": rel_source,
+            "model_tag": str(feats["model_tag"]), "sweep_ms": round(sweep_ms, 1), "settings": len(params),
+            "current": {"params": current, "at_cutoff": cur, "curves": curves(cur_scores, y)},
+            "best": {"params": best, "at_cutoff": at_cutoff(best_scores, y, best["cutoff"]),
+                     "curves": curves(best_scores, y)},
+            "top": top, "recommended_env": env,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        print(f"Wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
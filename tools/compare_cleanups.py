@@ -0,0 +1,88 @@
+# tools/compare_cleanups.py
+# Compare volunteer_works reports with earlier dumping reports nearby
+# (ai/cleanup.py) and store the results for /admin/cleanup.
+#
+# The admin page only shows stored results (its "Compare next" button does one
+# batch); run this after deploying, from cron for new reports, and with --all
+# after changing the PV_CLEANUP_* knobs. Thumbnails are kept in the verifier's
+# score cache (PV_SCORE_CACHE_PATH), so a re-run decodes no images it has seen
+# before.
+#
+# Usage:
+#   python tools/compare_cleanups.py
+#   python tools/compare_cleanups.py --days 30 --all --chunk 200
+import argparse, os, sys, time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.batch_utils import iter_id_chunks, Progress
+
+NEW_INDEXES = [
+    ("ix_submission_lat_lon", "submission", "lat, lon", ""),
+    ("uq_cleanup_after_rank", "cleanup_comparison", "after_id, method, rank", "UNIQUE "),
+]
+
+def migrate(db):
+    from sqlalchemy import inspect, text
+    tables = set(inspect(db.engine).get_table_names())
+    if "cleanup_comparison" in tables:
+        # rows duplicated by concurrent page loads before the unique index existed
+        db.session.execute(text(
+            "DELETE FROM cleanup_comparison WHERE id NOT IN "
+            "(SELECT MIN(id) FROM cleanup_comparison GROUP BY after_id, method, rank)"))
+    for name, table, cols, kind in NEW_INDEXES:
+        if table in tables:
+            db.session.execute(text(f"CREATE {kind}INDEX IF NOT EXISTS {name} ON {table} ({cols})"))
+    db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--all", action="store_true", help="recompare reports that already have results")
+    parser.add_argument("--days", type=int, default=0, help="only reports from the last N days (0 = all)")
+    parser.add_argument("--chunk", type=int, default=200)
+    args = parser.parse_args()
+
+    from app import app, db, init_db
+    from models import Submission, CleanupComparison
+    from ai import cleanup
+    from ai.score_cache import ScoreCache
+
+    cache_path = os.getenv("PV_SCORE_CACHE_PATH", "")
+    cache = ScoreCache(cache_path) if cache_path else None
+    with app.app_context():
+        init_db()
+        migrate(db)
+        where = [Submission.report_type == cleanup.AFTER_TYPE,
+                 Submission.lat.isnot(None), Submission.lon.isnot(None)]
+        if args.days:
+            where.append(Submission.created_at >= datetime.utcnow() - timedelta(days=args.days))
+        if not args.all:
+            done = db.session.query(CleanupComparison.after_id).filter(CleanupComparison.method == cleanup.METHOD)
+            where.append(~Submission.id.in_(done))
+
+        total = db.session.query(Submission.id).filter(*where).count()
+        prog = Progress(total, label="cleanup")
+        tally = Counter()
+        t0 = time.time()
+        for rows in iter_id_chunks(db.session, Submission, [], chunk=args.chunk, where=where):
+            afters = Submission.query.filter(Submission.id.in_([r[0] for r in rows])).all()
+            results = cleanup.compare_many(afters, app.root_path, cache=cache)
+            if not cleanup.save(db, results):
+                print(f"\n[CLEANUP] ids {rows[0][0]}..{rows[-1][0]} were stored by another run meanwhile; skipped")
+                prog.update(len(rows))
+                continue
+            tally.update(res[0]["verdict"] for res in results.values())
+            prog.update(len(rows))
+        prog.finish()
+
+    for verdict, n in tally.most_common():
+        print(f"  {verdict}: {n}")
+    print(f"Compared {sum(tally.values())} volunteer_works report(s) in {time.time() - t0:.1f}s.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# tools/db_add_supw_geo.py
+# One-time migration: add lat / lon / capacity to supw_place (SQLite or Postgres).
+# Usage:
+#   python tools/db_add_supw_geo.py
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import inspect, text
+from app import app, db
+
+COLUMNS = [
+    ("lat", "FLOAT"),
+    ("lon", "FLOAT"),
+    ("capacity", "INTEGER"),
+]
+
+def main():
+    print("Applying migration: add supw_place lat/lon/capacity...")
+    with app.app_context():
+        have = {c["name"] for c in inspect(db.engine).get_columns("supw_place")}
+        for name, coltype in COLUMNS:
+            if name in have:
+                print(f"Column supw_place.{name} already exists; nothing to do.")
+                continue
+            db.session.execute(text(f"ALTER TABLE supw_place ADD COLUMN {name} {coltype}"))
+            print(f"Column supw_place.{name} added.")
+        db.session.commit()
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,167 @@
 # tools/purge_submissions.py
+# Retention engine for submissions (and their chat Messages + uploaded files).
+#
+# Deletes in bounded batches with set-based DELETE ... WHERE id IN (...): each
+# batch is one short transaction (messages, then submissions), so it is safe to
+# run under live traffic. Before a batch is deleted its approved (AUTO_OK) rows
+# are rolled up into HotspotRollup, so the hotspot maps keep their history.
+# Files are unlinked in a thread pool after the batch has committed.
+#
+# Usage:
+#   python tools/purge_submissions.py --older-than-days 365
+#   python tools/purge_submissions.py --rejected-after-days 30 --older-than-days 365
+#   python tools/purge_submissions.py --older-than-days 365 --loop --interval 3600
+#   python tools/purge_submissions.py --older-than-days 365 --dry-run
+#   python tools/purge_submissions.py --all          # old behaviour: wipe everything
+import argparse, sys, time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from math import floor
 from pathlib import Path
-import sys, os
 
 # --- Ensure we can import app/models from the project root ---
 ROOT = Path(__file__).resolve().parents[1]   # .../PhotoVerifierApp_2(0)
-sys.path.insert(0, str(ROOT))
-
-from app import app, db                 # your Flask app + DB
-from models import Submission, Message  # your models
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
 
 UPLOAD_DIR = (ROOT / "static" / "uploads").resolve()
 
-def main():
-    with app.app_context():
-        # Gather file paths first (so we can delete after DB rows are gone)
-        paths = []
-        for s in Submission.query.all():
-            if s.image_path:
-                p = (Path(app.root_path) / s.image_path).resolve()
-                paths.append(p)
-
-        # Delete child rows first, then submissions
-        Message.query.delete()
-        db.session.commit()
-
-        Submission.query.delete()
-        db.session.commit()
-
-    # Remove files from disk (safety: only inside uploads/)
-    deleted = 0
-    for p in paths:
+def _tile(x):
+    # same 4-decimal flooring as routes/hotspots.py::_round_coord
+    return floor(x * 10_000) / 10_000
+
+def _unlink(p: Path) -> bool:
+    # safety: only inside uploads/
+    try:
+        if p.is_relative_to(UPLOAD_DIR) and p.exists():
+            p.unlink()
+            return True
+    except Exception as e:
+        print("Could not delete:", p, e)
+    return False
+
+def _criteria(args, Submission, or_):
+    now = datetime.utcnow()
+    conds = []
+    if args.all:
+        return []
+    if args.older_than_days is not None:
+        conds.append(Submission.created_at < now - timedelta(days=args.older_than_days))
+    if args.rejected_after_days is not None:
+        conds.append((Submission.human_state == "rejected") &
+                     (Submission.created_at < now - timedelta(days=args.rejected_after_days)))
+    return [or_(*conds)]
+
+def _rollup(db, HotspotRollup, rows):
+    """Add this batch's AUTO_OK rows to the per-day tile counts (same transaction as the delete)."""
+    counts = defaultdict(int)
+    dz_of = {}
+    for r in rows:
+        if r.status != "AUTO_OK" or r.lat is None or r.lon is None or r.created_at is None:
+            continue
+        key = (r.created_at.date(), _tile(r.lat), _tile(r.lon), r.report_type or "")
+        counts[key] += 1
+        dz_of.setdefault(key, r.dzongkhag)
+    if not counts:
+        return 0
+
+    days = {k[0] for k in counts}
+    existing = {
+        (e.day, e.tile_lat, e.tile_lon, e.report_type): e
+        for e in HotspotRollup.query.filter(HotspotRollup.day.in_(days)).all()
+    }
+    for key, n in counts.items():
+        e = existing.get(key)
+        if e is not None:
+            e.count += n
+        else:
+            day, lat, lon, rtype = key
+            db.session.add(HotspotRollup(day=day, tile_lat=lat, tile_lon=lon, report_type=rtype,
+                                         dzongkhag=dz_of.get(key), count=n))
+    return sum(counts.values())
+
+def purge_once(args, app, db, pool):
+    """One pass over everything currently matching; returns (submissions, messages, files, rolled_up)."""
+    from sqlalchemy import delete, or_
+    from models import Submission, Message, HotspotRollup
+
+    where = _criteria(args, Submission, or_)
+    cols = (Submission.id, Submission.image_path, Submission.status, Submission.lat,
+            Submission.lon, Submission.created_at, Submission.report_type, Submission.dzongkhag)
+
+    subs = msgs = files = rolled = 0
+    last_id = 0
+    while True:
+        rows = (db.session.query(*cols)
+                .filter(Submission.id > last_id, *where)
+                .order_by(Submission.id.asc())
+                .limit(args.batch_size)
+                .all())
+        if not rows:
+            break
+        last_id = rows[-1].id
+        ids = [r.id for r in rows]
+        paths = [(Path(app.root_path) / r.image_path).resolve() for r in rows if r.image_path]
+
+        if args.dry_run:
+            subs += len(ids)
+            msgs += db.session.query(Message.id).filter(Message.submission_id.in_(ids)).count()
+            files += len(paths)
+            db.session.rollback()
+            continue
+
         try:
-            if str(p).startswith(str(UPLOAD_DIR)) and p.exists():
-                p.unlink()
-                deleted += 1
-        except Exception as e:
-            print("Could not delete:", p, e)
+            rolled += _rollup(db, HotspotRollup, rows)
+            msgs += db.session.execute(
+                delete(Message).where(Message.submission_id.in_(ids))
+                .execution_options(synchronize_session=False)).rowcount or 0
+            subs += db.session.execute(
+                delete(Submission).where(Submission.id.in_(ids))
+                .execution_options(synchronize_session=False)).rowcount or 0
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # rows are gone, so a crash from here on only leaves orphan files
+        files += sum(pool.map(_unlink, paths))
+        print(f"[PURGE] batch up to id {last_id}: {len(ids)} submission(s)")
+        if args.sleep:
+            time.sleep(args.sleep)  # let live traffic in between batches
+
+    return subs, msgs, files, rolled
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--older-than-days", type=int, help="delete submissions older than N days")
+    parser.add_argument("--rejected-after-days", type=int, help="delete rejected submissions after M days")
+    parser.add_argument("--all", action="store_true", help="delete every submission")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--sleep", type=float, default=0.2, help="pause between batches (seconds)")
+    parser.add_argument("--workers", type=int, default=8, help="threads unlinking files")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be deleted")
+    parser.add_argument("--loop", action="store_true", help="keep running, one pass every --interval")
+    parser.add_argument("--interval", type=int, default=3600)
+    args = parser.parse_args()
+
+    if not (args.all or args.older_than_days is not None or args.rejected_after_days is not None):
+        parser.error("give --older-than-days and/or --rejected-after-days (or --all)")
+
+    from app import app, db, init_db
 
-    print(f"Done. Deleted {deleted} uploaded files and all submissions/messages.")
+    with app.app_context(), ThreadPoolExecutor(max_workers=args.workers) as pool:
+        init_db()  # makes sure hotspot_rollup exists
+        while True:
+            t0 = time.time()
+            subs, msgs, files, rolled = purge_once(args, app, db, pool)
+            verb = "Would delete" if args.dry_run else "Deleted"
+            print(f"{verb} {subs} submission(s), {msgs} message(s), {files} uploaded file(s); "
+                  f"{rolled} approved report(s) rolled up into hotspot history "
+                  f"({time.time() - t0:.1f}s).")
+            if not args.loop:
+                break
+            time.sleep(args.interval)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,80 @@
+# tools/rebuild_hotspot_trends.py
+# Recompute the hotspot_trend table (geo/trends.py) from every AUTO_OK submission.
+#
+# The app keeps these rows current on its own (one O(1) update per approved
+# report); run this once after deploying, after changing
+# PV_TREND_FAST_HL_DAYS / PV_TREND_SLOW_HL_DAYS, or after bulk status edits.
+# Submissions are streamed by id and folded in memory (one small state per
+# tile), then the table is replaced in one transaction.
+#
+# Usage:
+#   python tools/rebuild_hotspot_trends.py
+#   python tools/rebuild_hotspot_trends.py --days 90 --chunk 5000
+import argparse, sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.batch_utils import iter_id_chunks, chunked, Progress
+
+def fold(rows, states):
+    from geo import trends
+    for _, lat, lon, created_at, dz in rows:
+        if created_at is None:
+            continue
+        key = trends.tile_of(lat, lon)
+        t = states.get(key)
+        if t is None:
+            t = states[key] = SimpleNamespace(
+                tile_lat=key[0], tile_lon=key[1], dzongkhag=dz, ref_ts=None, score_fast=0.0,
+                score_slow=0.0, week_no=0, week_count=0, prev_week_count=0, total=0,
+                first_seen_at=created_at, last_seen_at=created_at)
+        trends.apply_event(t, trends._epoch(created_at))
+        t.first_seen_at = min(t.first_seen_at, created_at)
+        t.last_seen_at = max(t.last_seen_at, created_at)
+        t.dzongkhag = t.dzongkhag or dz
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=None,
+                        help="only fold the last N days (older reports have decayed to ~0 anyway)")
+    parser.add_argument("--chunk", type=int, default=2000)
+    args = parser.parse_args()
+
+    from sqlalchemy import delete, insert
+    from app import app, db, init_db
+    from models import Submission, HotspotTrend
+
+    with app.app_context():
+        init_db()  # makes sure hotspot_trend exists
+        where = [Submission.status == "AUTO_OK", Submission.lat.isnot(None), Submission.lon.isnot(None)]
+        if args.days:
+            where.append(Submission.created_at >= datetime.utcnow() - timedelta(days=args.days))
+
+        total = db.session.query(Submission.id).filter(*where).count()
+        prog = Progress(total, label="submissions")
+        states = {}
+        cols = [Submission.lat, Submission.lon, Submission.created_at, Submission.dzongkhag]
+        for rows in iter_id_chunks(db.session, Submission, cols, chunk=args.chunk, where=where):
+            fold(rows, states)
+            prog.update(len(rows))
+        prog.finish()
+
+        fields = [c.name for c in HotspotTrend.__table__.columns if c.name != "id"]
+        try:
+            db.session.execute(delete(HotspotTrend))
+            for part in chunked(list(states.values()), 1000):
+                db.session.execute(insert(HotspotTrend), [{f: getattr(t, f) for f in fields} for t in part])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    print(f"Rebuilt {len(states)} tile trend(s) from {total} approved report(s).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# tools/rescore_submissions.py
+# Re-score historical submissions after shipping a new ai/waste_v1 model.
+#
+# Streams submission ids in chunks, fans decoding + inference out to a process
+# pool (each worker loads the model once and scores images in model batches),
+# writes results back with one bulk UPDATE per chunk and checkpoints the last
+# finished id, so a crash resumes where it stopped. With --update-status, rows
+# that gain or lose AUTO_OK also update their hotspot trend tile (geo/trends.py)
+# in the same commit, like an admin decision does.
+#
+# Usage:
+#   python tools/rescore_submissions.py --workers 4
+#   python tools/rescore_submissions.py --resume                  # continue after a crash
+#   python tools/rescore_submissions.py --only-stale              # skip rows already on this model
+#   python tools/rescore_submissions.py --update-status           # also re-derive AUTO_OK/RECHECK
+import argparse, os, sys, time
+from multiprocessing import Pool
+from pathlib import Path
+
+# Ensure project root is on sys.path (also in spawned workers)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.batch_utils import iter_id_chunks, chunked, Progress, load_checkpoint, save_checkpoint
+
+DEFAULT_CHECKPOINT = str(ROOT / "instance" / "rescore.checkpoint.json")
+
+# ---- worker side (no Flask app here: workers only need the verifier) ----
+_verifier = None
+
+def _env_defaults():
+    # the app's PV_* defaults live in app.py; mirror the ones the verifier reads
+    # (set before ai.verifier is first imported, in this process or a worker)
+    os.environ.setdefault("PV_MODEL_PATH", str(ROOT / "ai" / "waste_v1" / "validity_classifier.onnx"))
+    os.environ.setdefault("PV_CLASS_MAP_PATH", str(ROOT / "ai" / "waste_v1" / "class_map.json"))
+    os.environ.setdefault("PV_MODEL_VERSION", "waste_v1_onnx")
+    os.environ.setdefault("PV_ORT_THREADS", "1")  # one core per process; the pool gives parallelism
+
+def _init_worker():
+    global _verifier
+    _env_defaults()
+    from ai.verifier import Verifier
+    _verifier = Verifier(inference_socket="").load()
+
+def _score_items(items):
+    """items: [(id, abs_path)] -> [(id, fields | None, error | None)]"""
+    ok = [(sid, p) for sid, p in items if p and os.path.isfile(p)]
+    out = [(sid, None, "missing file") for sid, p in items if not (p and os.path.isfile(p))]
+    if not ok:
+        return out
+    try:
+        scores = _verifier.score_batch([p for _, p in ok])
+        out.extend((sid, sc, None) for (sid, _), sc in zip(ok, scores))
+    except Exception:
+        # a bad image spoils the whole batch; retry one by one to isolate it
+        for sid, p in ok:
+            try:
+                out.append((sid, _verifier.score(p), None))
+            except Exception as e:
+                out.append((sid, None, repr(e)))
+    return out
+
+# ---- main process ----
+def _row_update(sid, sc, update_status):
+    row = {
+        "id": sid,
+        "ai_label": sc["ai_label"],
+        "ai_score": sc["action_score"],
+        "action_score": sc["action_score"],
+        "auth_score": sc["auth_score"],
+        "relevance_score": sc["relevance_score"],
+        "exif_time_ok": sc["exif_time_ok"],
+        "model_version": sc["model_version"],
+    }
+    if update_status:
+        row["status"] = sc["status"]
+    return row
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--chunk", type=int, default=512, help="ids read, scored and committed per round")
+    parser.add_argument("--batch", type=int, default=16, help="images per model call inside a worker")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--resume", action="store_true", help="continue after the checkpointed id")
+    parser.add_argument("--start-after-id", type=int, default=0)
+    parser.add_argument("--only-stale", action="store_true",
+                        help="skip rows whose model_version already matches the current model")
+    parser.add_argument("--update-status", action="store_true",
+                        help="also overwrite status (AUTO_OK/RECHECK) and update hotspot trends; "
+                             "points are not touched")
+    parser.add_argument("--dry-run", action="store_true", help="score but don't write")
+    args = parser.parse_args()
+
+    _env_defaults()
+    from sqlalchemy import update, or_
+    from app import app, db
+    from models import Submission
+    from geo import trends
+
+    ckpt = load_checkpoint(args.checkpoint) if args.resume else {}
+    start_after = max(args.start_after_id, int(ckpt.get("last_id", 0)))
+
+    with app.app_context(), Pool(args.workers, initializer=_init_worker) as pool:
+        where = [Submission.id > start_after]
+        current_version = None
+        if args.only_stale:
+            current_version = pool.apply(_probe_version)
+            where.append(or_(Submission.model_version.is_(None), Submission.model_version != current_version))
+            print(f"[INFO] skipping rows already scored by {current_version}")
+
+        total = db.session.query(Submission.id).filter(*where).count()
+        print(f"[INFO] {total} submission(s) to re-score with {args.workers} worker(s); "
+              f"starting after id {start_after}")
+
+        prog = Progress(total, label="rescore")
+        scored = failed = flipped = 0
+        infer_t0 = time.time()
+        columns = [Submission.image_path]
+        if args.update_status:
+            columns += [Submission.status, Submission.lat, Submission.lon,
+                        Submission.created_at, Submission.dzongkhag]
+        for rows in iter_id_chunks(db.session, Submission, columns,
+                                   chunk=args.chunk, start_after=start_after, where=where[1:]):
+            items = [(r[0], os.path.join(app.root_path, r[1]) if r[1] else None) for r in rows]
+            updates = []
+            for results in pool.imap_unordered(_score_items, chunked(items, args.batch)):
+                for sid, sc, err in results:
+                    if sc is None:
+                        failed += 1
+                    else:
+                        updates.append(_row_update(sid, sc, args.update_status))
+                prog.update(len(results))
+
+            if updates and not args.dry_run:
+                db.session.execute(update(Submission), updates)  # bulk UPDATE by primary key
+                if args.update_status:
+                    before = {r[0]: r for r in rows}
+                    for u in updates:
+                        _, _, prev, lat, lon, created_at, dz = before[u["id"]]
+                        if (prev == "AUTO_OK") != (u["status"] == "AUTO_OK"):
+                            trends.record(lat, lon, created_at, dz, weight=1 if u["status"] == "AUTO_OK" else -1)
+                            flipped += 1
+                db.session.commit()
+            scored += len(updates)
+
+            last_id = rows[-1][0]
+            if not args.dry_run:
+                save_checkpoint(args.checkpoint, {
+                    "last_id": last_id, "scored": scored + int(ckpt.get("scored", 0)),
+                    "failed": failed + int(ckpt.get("failed", 0)), "updated_at": time.time(),
+                })
+        prog.finish()
+
+    secs = max(1e-9, time.time() - infer_t0)
+    rate = scored / secs
+    print(f"Re-scored {scored} submission(s), {failed} failed/missing, in {secs:.1f}s: "
+          f"{rate:.1f} images/s total, {rate / max(1, args.workers):.2f} images/s per core "
+          f"({args.workers} worker(s), batch {args.batch}).")
+    if args.update_status:
+        print(f"{flipped} submission(s) gained or lost AUTO_OK; their hotspot trend tiles were updated.")
+
+def _probe_version():
+    """Model version string the workers will stamp (runs inside a worker)."""
+    return _verifier.model_version + f"_{_verifier._out_kind()}"
+
+if __name__ == "__main__":
+    main()